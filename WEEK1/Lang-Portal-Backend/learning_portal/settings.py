@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    "portal.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -78,6 +81,12 @@ WSGI_APPLICATION = "learning_portal.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# PORTAL_DB_PROFILE=production tunes SQLite for concurrent use: WAL and the
+# other pragmas in portal.db.PRODUCTION_PRAGMAS, connection health checks
+# and a read-only "replica" connection that the dashboard reads go through.
+
+PORTAL_DB_PROFILE = os.getenv("PORTAL_DB_PROFILE", "development")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
@@ -85,6 +94,84 @@ DATABASES = {
     }
 }
 
+if PORTAL_DB_PROFILE == "production":
+    DATABASES["default"].update({
+        # Seconds to keep connections open between requests. Off unless
+        # asked for: async views (and ASGI) can't reuse them, and idle
+        # SQLite handles hold up the chunked resets. Worth setting under
+        # WSGI with sync views only.
+        "CONN_MAX_AGE": int(os.getenv("PORTAL_CONN_MAX_AGE", "0")),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Take the write lock when the transaction starts, so concurrent
+            # writers queue on busy_timeout instead of failing to upgrade.
+            "transaction_mode": "IMMEDIATE",
+        },
+    })
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        "CONN_MAX_AGE": DATABASES["default"]["CONN_MAX_AGE"],
+        "CONN_HEALTH_CHECKS": True,
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["portal.db.ReadReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# PORTAL_CACHE_BACKEND picks the store behind the dashboard response cache:
+# "locmem", "file" or "redis" (PORTAL_REDIS_URL). locmem is per process, so
+# a write in one worker doesn't invalidate what the others cached and they
+# serve stale responses for up to PORTAL_CACHE_TIMEOUT; it is only the
+# default with DEBUG on. Use "file" for several workers on one host and
+# "redis" across hosts.
+
+PORTAL_CACHE_BACKEND = os.getenv("PORTAL_CACHE_BACKEND", "locmem" if DEBUG else "file")
+
+if PORTAL_CACHE_BACKEND == "file":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": BASE_DIR / ".cache",
+        }
+    }
+elif PORTAL_CACHE_BACKEND == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("PORTAL_REDIS_URL", "redis://127.0.0.1:6379"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a cached dashboard response lives, writes invalidate it sooner
+PORTAL_CACHE_TIMEOUT = 300
+
+# /api/metrics/ answers scrapers that send "Authorization: Bearer
+# <PORTAL_METRICS_TOKEN>", or that connect from PORTAL_METRICS_ALLOWED_IPS,
+# without a user account. Neither is set by default, so scrapers are
+# refused. Behind a reverse proxy on the same host every client connects
+# from the proxy's address (127.0.0.1), so only allow addresses that reach
+# the app directly, and prefer the token.
+PORTAL_METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.getenv("PORTAL_METRICS_ALLOWED_IPS", "").split(",")
+    if ip.strip()
+]
+PORTAL_METRICS_TOKEN = os.getenv("PORTAL_METRICS_TOKEN", "")
+
+# History and full resets run in a background thread and report their
+# progress at /api/reset_jobs/<id>/. Archives of the deleted rows, when
+# asked for, are written to PORTAL_ARCHIVE_DIR.
+PORTAL_RESET_IN_BACKGROUND = True
+PORTAL_ARCHIVE_DIR = Path(os.getenv("PORTAL_ARCHIVE_DIR", BASE_DIR / "archives"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -0,0 +1,537 @@
+"""
+Benchmark scenarios for the portal, run with ``manage.py benchmark <name>``.
+
+Every scenario seeds its own data inside a transaction that is rolled back
+afterwards, so it is safe to run against a development database.
+"""
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext, suppress
+from urllib.parse import parse_qs, urlparse
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, transaction
+from django.test.utils import override_settings
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .cache import invalidate_on_write
+from .counters import counters_suspended, rebuild_counters, record_reviews, record_sessions
+from .db import REPLICA_ALIAS
+from .models import (
+    Study_Activities,
+    Word_Review,
+    WordGroup,
+    Words,
+    Study_Sessions)
+from . import views
+from .reset import reset_models, reset_portal
+from .scheduler import rebuild_schedules, schedule_reviews
+from .search import WordSearchFilter
+from .seeding import random_word
+from .serializers import (
+    WordReviewBatchSerializer,
+    WordsSerializer,
+    WordsValuesSerializer)
+
+SCENARIOS = {}
+# word_search fails from this many words if the index is no faster than a scan
+INDEX_BEATS_SCAN_AT = 200000
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def measure():
+    """Collects the query count and wall time of the wrapped block."""
+    result = {'queries': 0}
+
+    def count_query(execute, sql, params, many, context):
+        result['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        start = time.perf_counter()
+        yield result
+        result['ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def call_view(view_class, path='/', method='get', data=None, **kwargs):
+    factory = APIRequestFactory(SERVER_NAME='localhost')
+    request = getattr(factory, method)(path, data, format='json')
+    force_authenticate(request, user=User(username='benchmark'))
+    view = view_class.as_view()
+    if iscoroutinefunction(view):
+        view = async_to_sync(view)
+    response = view(request, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def seed_groups(count, words_per_group=5, reviews_per_group=10):
+    """Creates ``count`` groups, each with its own words, a session and reviews."""
+    groups = WordGroup.objects.bulk_create(
+        [WordGroup(name=f'Group {i}') for i in range(count)])
+    words = Words.objects.bulk_create([
+        Words(Swahili=f'neno {i}', Pronounciation=f'neh-no {i}', English=f'word {i}')
+        for i in range(count * words_per_group)
+    ])
+    WordGroup.words.through.objects.bulk_create([
+        WordGroup.words.through(wordgroup_id=group.id, words_id=word.id)
+        for index, group in enumerate(groups)
+        for word in words[index * words_per_group:(index + 1) * words_per_group]
+    ])
+    sessions = Study_Sessions.objects.bulk_create([
+        Study_Sessions(Group=group, study_activity_id=1) for group in groups
+    ])
+    record_sessions(sessions)
+    reviews = Word_Review.objects.bulk_create([
+        Word_Review(
+            word_id=words[index * words_per_group + i % words_per_group],
+            study_session_id=session,
+            correct=i % 3 != 0)
+        for index, session in enumerate(sessions)
+        for i in range(reviews_per_group)
+    ])
+    record_reviews(reviews)
+    schedule_reviews(reviews)
+    invalidate_on_write()
+    return groups
+
+
+@scenario('progress_stats')
+def progress_stats(sizes):
+    """Per-group progress stats against the bulk API and the dashboard view."""
+    rows = []
+    for size in sizes:
+        with rolled_back():
+            groups = seed_groups(size)
+            with measure() as per_group:
+                for group in groups:
+                    group.get_progress_stats()
+            with measure() as bulk:
+                WordGroup.bulk_progress_stats(groups)
+            with measure() as dashboard:
+                call_view(views.StudyProgressView, '/dashboard/study_progress/')
+        rows.append({
+            'groups': size,
+            'per_group_queries': per_group['queries'],
+            'per_group_ms': per_group['ms'],
+            'bulk_queries': bulk['queries'],
+            'bulk_ms': bulk['ms'],
+            'dashboard_queries': dashboard['queries'],
+            'dashboard_ms': dashboard['ms'],
+        })
+    return rows
+
+
+@scenario('review_ingest')
+def review_ingest(sizes):
+    """Per-item Word_Review inserts against the batch review endpoint."""
+    rows = []
+    for size in sizes:
+        with rolled_back():
+            group, = seed_groups(1, words_per_group=50, reviews_per_group=0)
+            word_ids = list(group.words.values_list('id', flat=True))
+            answers = [
+                {'word_id': word_ids[i % len(word_ids)], 'correct': i % 4 != 0}
+                for i in range(size)
+            ]
+
+            session = Study_Sessions.objects.create(Group=group, study_activity_id=1)
+            with measure() as per_item:
+                for answer in answers:
+                    Word_Review.objects.create(
+                        word_id_id=answer['word_id'],
+                        study_session_id=session,
+                        correct=answer['correct'])
+
+            session = Study_Sessions.objects.create(Group=group, study_activity_id=1)
+            with measure() as batch:
+                for start in range(0, size, WordReviewBatchSerializer.MAX_REVIEWS):
+                    response = call_view(
+                        views.SessionReviewBatchView,
+                        method='post',
+                        data={'reviews': answers[start:start + WordReviewBatchSerializer.MAX_REVIEWS]},
+                        id=session.id)
+                    assert response.status_code == 201, response.data
+        rows.append({
+            'reviews': size,
+            'per_item_queries': per_item['queries'],
+            'per_item_ms': per_item['ms'],
+            'per_item_reviews_per_s': round(size / per_item['ms'] * 1000),
+            'batch_queries': batch['queries'],
+            'batch_ms': batch['ms'],
+            'batch_reviews_per_s': round(size / batch['ms'] * 1000),
+        })
+    return rows
+
+
+@scenario('session_pages')
+def session_pages(sizes):
+    """Last page of /study_sessions/ by page number against a keyset cursor."""
+    rows = []
+    page_size = views.ResultsSetPagination.page_size
+    for size in sizes:
+        with rolled_back():
+            group, = seed_groups(1, words_per_group=1, reviews_per_group=0)
+            Study_Sessions.objects.bulk_create(
+                (Study_Sessions(Group=group, study_activity_id=1) for _ in range(size)),
+                batch_size=5000)
+
+            last_page = (size + page_size) // page_size
+            with measure() as by_page:
+                response = call_view(
+                    views.StudySessionListView, f'/study_sessions/?page={last_page}')
+            assert response.status_code == 200, response.data
+
+            # A cursor positioned just before the oldest page, the same
+            # rows the page-number request returned. With one page that
+            # is the first cursor page.
+            cursor_path = '/study_sessions/?pagination=cursor'
+            if last_page > 1:
+                boundary = Study_Sessions.objects.order_by(
+                    '-creation_time', '-id').values_list(
+                    'creation_time', flat=True)[(last_page - 1) * page_size - 1]
+                paginator = views.SessionCursorPagination()
+                paginator.base_url = '/study_sessions/'
+                cursor = parse_qs(urlparse(paginator.encode_cursor(
+                    Cursor(offset=0, reverse=False, position=str(boundary)))).query)['cursor'][0]
+                cursor_path = f'/study_sessions/?cursor={cursor}'
+            with measure() as by_cursor:
+                response = call_view(views.StudySessionListView, cursor_path)
+            assert response.status_code == 200, response.data
+        rows.append({
+            'sessions': size,
+            'page_number_queries': by_page['queries'],
+            'page_number_ms': by_page['ms'],
+            'cursor_queries': by_cursor['queries'],
+            'cursor_ms': by_cursor['ms'],
+        })
+    return rows
+
+
+@scenario('word_search')
+def word_search(sizes):
+    """First page of a word search: icontains scans against the search index."""
+    rows = []
+    search = WordSearchFilter()
+    factory = APIRequestFactory(SERVER_NAME='localhost')
+    for size in sizes:
+        rng = random.Random(size)
+        with rolled_back():
+            Words.objects.bulk_create((
+                Words(Swahili=random_word(rng), Pronounciation=random_word(rng),
+                      English=random_word(rng, 2))
+                for _ in range(size)
+            ), batch_size=5000)
+            term = random_word(rng)
+            typo = term[:2] + term[3:]
+
+            def first_page(query, filter_results):
+                request = Request(factory.get('/words/', query))
+                queryset = filter_results(request)
+                with measure() as result:
+                    queryset.count()
+                    list(queryset.values_list('id', flat=True)[:20])
+                return result
+
+            scan = first_page({}, lambda request: Words.objects.filter(
+                search._substring_lookup(term)).order_by('id'))
+            indexed = first_page({'search': term}, lambda request: search.filter_queryset(
+                request, Words.objects.all(), None))
+            fuzzy = first_page({'search': typo, 'fuzzy': '1'}, lambda request: search.filter_queryset(
+                request, Words.objects.all(), None))
+        if size >= INDEX_BEATS_SCAN_AT:
+            assert indexed['ms'] < scan['ms'], (
+                f"indexed search took {indexed['ms']}ms at {size} words, "
+                f"the icontains scan {scan['ms']}ms")
+        rows.append({
+            'words': size,
+            'icontains_ms': scan['ms'],
+            'indexed_ms': indexed['ms'],
+            'fuzzy_ms': fuzzy['ms'],
+        })
+    return rows
+
+
+@scenario('serialize_page')
+def serialize_page(sizes):
+    """One page of words through WordsSerializer against the values() fast path."""
+    rows = []
+    for size in sizes:
+        with rolled_back():
+            seed_groups(max(size // 5, 1), words_per_group=5, reviews_per_group=10)
+            queryset = Words.objects.order_by('id')[:size]
+
+            with measure() as model_serializer:
+                WordsSerializer(
+                    queryset.prefetch_related('categories', 'word_groups'), many=True).data
+            full = WordsValuesSerializer()
+            with measure() as values_full:
+                full.to_representation(full.values(Words.objects.order_by('id'))[:size])
+            sparse = WordsValuesSerializer(['id', 'Swahili', 'English'])
+            with measure() as values_sparse:
+                sparse.to_representation(sparse.values(Words.objects.order_by('id'))[:size])
+        rows.append({
+            'rows': size,
+            'serializer_queries': model_serializer['queries'],
+            'serializer_ms': model_serializer['ms'],
+            'values_queries': values_full['queries'],
+            'values_ms': values_full['ms'],
+            'sparse_queries': values_sparse['queries'],
+            'sparse_ms': values_sparse['ms'],
+        })
+    return rows
+
+
+@scenario('next_words')
+def next_words(sizes):
+    """Next-card selection for a group, at a given number of review rows."""
+    rows = []
+    for size in sizes:
+        rng = random.Random(size)
+        with rolled_back():
+            groups = seed_groups(10, words_per_group=1000, reviews_per_group=0)
+            sessions = list(Study_Sessions.objects.filter(Group__in=groups))
+            words = {
+                group.id: list(group.words.values_list('id', flat=True))
+                for group in groups
+            }
+            for start in range(0, size, 50000):
+                batch = []
+                for _ in range(min(50000, size - start)):
+                    session = rng.choice(sessions)
+                    batch.append(Word_Review(
+                        word_id_id=rng.choice(words[session.Group_id]),
+                        study_session_id=session,
+                        correct=rng.random() < 0.7))
+                schedule_reviews(Word_Review.objects.bulk_create(batch, batch_size=5000))
+
+            timings = []
+            for _ in range(20):
+                with measure() as selection:
+                    call_view(views.GroupNextWordsView, '/?n=20', id=groups[0].id)
+                timings.append(selection)
+        timings.sort(key=lambda timing: timing['ms'])
+        rows.append({
+            'reviews': size,
+            'queries': timings[0]['queries'],
+            'p50_ms': timings[len(timings) // 2]['ms'],
+            'max_ms': timings[-1]['ms'],
+        })
+    return rows
+
+
+def _collector_reset():
+    # What ResetHistoryView did before portal.reset
+    with transaction.atomic(), counters_suspended():
+        Word_Review.objects.all().delete()
+        Study_Sessions.objects.all().delete()
+        Study_Activities.objects.all().delete()
+        rebuild_counters()
+        rebuild_schedules()
+
+
+@scenario('history_reset')
+def history_reset(sizes):
+    """Study history reset through QuerySet.delete() against chunked raw deletes."""
+    rows = []
+    for size in sizes:
+        results = {}
+        for name, reset in (
+                ('collector', _collector_reset),
+                ('chunked', lambda: reset_portal(reset_models('history')))):
+            with rolled_back():
+                seed_groups(max(size // 100, 1), words_per_group=10, reviews_per_group=100)
+                with measure() as results[name]:
+                    reset()
+        rows.append({
+            'reviews': size,
+            'collector_queries': results['collector']['queries'],
+            'collector_ms': results['collector']['ms'],
+            'chunked_queries': results['chunked']['queries'],
+            'chunked_ms': results['chunked']['ms'],
+        })
+    return rows
+
+
+# Seconds each mixed_load run keeps its threads busy
+MIXED_LOAD_SECONDS = 5
+MIXED_LOAD_BATCH = 20
+
+
+@contextmanager
+def scratch_database(profile):
+    """
+    Points the default connection at a new, migrated database file with the
+    settings of database ``profile`` for the block, including the read-only
+    replica connection the production profile reads through. For the
+    scenarios that need writes committed from several connections at once,
+    which rolled_back() can't give them. Responses aren't cached in the block.
+    """
+    settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+    saved = {'NAME': settings_dict['NAME'], 'OPTIONS': settings_dict['OPTIONS']}
+    saved_replica = connections.settings.pop(REPLICA_ALIAS, None)
+
+    def close_connections():
+        connections.close_all()
+        # Dropped so the replica alias opens with its new settings
+        with suppress(AttributeError):
+            del connections[REPLICA_ALIAS]
+
+    close_connections()
+    with tempfile.TemporaryDirectory() as directory, override_settings(
+            PORTAL_DB_PROFILE=profile,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+        settings_dict['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        # As in the production profile in settings.py
+        settings_dict['OPTIONS'] = (
+            {'transaction_mode': 'IMMEDIATE'} if profile == 'production' else {})
+        try:
+            call_command('migrate', verbosity=0)
+            if profile == 'production':
+                connections.settings[REPLICA_ALIAS] = connections.configure_settings({
+                    DEFAULT_DB_ALIAS: settings_dict,
+                    REPLICA_ALIAS: {
+                        'ENGINE': 'django.db.backends.sqlite3',
+                        'NAME': f"file:{settings_dict['NAME']}?mode=ro",
+                        'CONN_HEALTH_CHECKS': True,
+                    },
+                })[REPLICA_ALIAS]
+            yield
+        finally:
+            close_connections()
+            connections.settings.pop(REPLICA_ALIAS, None)
+            if saved_replica is not None:
+                connections.settings[REPLICA_ALIAS] = saved_replica
+            settings_dict.update(saved)
+
+
+def _latency_summary(latencies, seconds):
+    latencies = sorted(latencies)
+    if not latencies:
+        return 0, 0, 0
+    return (
+        round(len(latencies) / seconds, 1),
+        round(latencies[len(latencies) // 2], 2),
+        round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)], 2),
+    )
+
+
+def _run_mixed(threads, sessions, word_ids):
+    deadline = time.perf_counter() + MIXED_LOAD_SECONDS
+    results = {'write': [], 'read': [], 'errors': 0, 'replica_queries': 0}
+    lock = threading.Lock()
+
+    def count_replica_query(execute, sql, params, many, context):
+        with lock:
+            results['replica_queries'] += 1
+        return execute(sql, params, many, context)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            session = rng.choice(sessions)
+            reviews = [
+                {'word_id': rng.choice(word_ids[session.Group_id]), 'correct': rng.random() < 0.7}
+                for _ in range(MIXED_LOAD_BATCH)
+            ]
+            yield lambda: call_view(
+                views.SessionReviewBatchView, method='post',
+                data={'reviews': reviews}, id=session.id)
+
+    def reader(seed):
+        while time.perf_counter() < deadline:
+            yield lambda: call_view(views.DashboardQuickStatsView)
+            yield lambda: call_view(views.StudyProgressView)
+
+    def run(kind, requests):
+        replica = (
+            connections[REPLICA_ALIAS].execute_wrapper(count_replica_query)
+            if REPLICA_ALIAS in connections.settings else nullcontext())
+        try:
+            with replica:
+                for request in requests:
+                    start = time.perf_counter()
+                    try:
+                        failed = request().status_code >= 400
+                    except OperationalError:
+                        failed = True
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        if failed:
+                            results['errors'] += 1
+                        else:
+                            results[kind].append(elapsed)
+        finally:
+            connections.close_all()
+
+    workers = [
+        threading.Thread(target=run, args=('write', writer(i))) for i in range(threads)
+    ] + [
+        threading.Thread(target=run, args=('read', reader(i))) for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - start
+
+    writes_per_s, write_p50, write_p99 = _latency_summary(results['write'], seconds)
+    reads_per_s, read_p50, read_p99 = _latency_summary(results['read'], seconds)
+    return {
+        'writes_per_s': writes_per_s,
+        'write_p50_ms': write_p50,
+        'write_p99_ms': write_p99,
+        'reads_per_s': reads_per_s,
+        'read_p50_ms': read_p50,
+        'read_p99_ms': read_p99,
+        'errors': results['errors'],
+        'replica_queries': results['replica_queries'],
+    }
+
+
+@scenario('mixed_load')
+def mixed_load(sizes):
+    """
+    Review batches and dashboard reads from concurrent threads, under the
+    development and the production database profile. A size is the number
+    of writer threads, run alongside as many reader threads.
+    """
+    rows = []
+    for profile in ('development', 'production'):
+        with scratch_database(profile):
+            groups = seed_groups(10, words_per_group=50, reviews_per_group=100)
+            sessions = list(Study_Sessions.objects.filter(Group__in=groups))
+            word_ids = {
+                group.id: list(group.words.values_list('id', flat=True))
+                for group in groups
+            }
+            for size in sizes:
+                rows.append({
+                    'profile': profile,
+                    'threads': size * 2,
+                    **_run_mixed(size, sessions, word_ids),
+                })
+    return rows
@@ -0,0 +1,143 @@
+"""
+Response cache for the dashboard endpoints.
+
+Cached responses are keyed on a data version that every write to the
+study data bumps (see portal.signals), so a write invalidates all of them
+at once without having to know which keys exist.
+"""
+import hashlib
+import inspect
+import json
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+DATA_VERSION_KEY = 'portal:data-version'
+CACHED_VIEWS = []
+
+
+def data_version():
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1 so responses cached under an
+        # evicted version can never be served again.
+        cache.add(DATA_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def bump_data_version():
+    try:
+        cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        cache.set(DATA_VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate_on_write():
+    """
+    Bumps the data version now and again once the current transaction
+    commits, so a response cached from a read that raced the write
+    doesn't outlive it.
+    """
+    bump_data_version()
+    transaction.on_commit(bump_data_version)
+
+
+def _stats_key(view_name, outcome):
+    return f'portal:cache-stats:{view_name}:{outcome}'
+
+
+def _count(view_name, outcome):
+    key = _stats_key(view_name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # The dummy cache stores nothing
+            pass
+
+
+def cache_stats():
+    stats = {}
+    for view_name in CACHED_VIEWS:
+        hits = cache.get(_stats_key(view_name, 'hits'), 0)
+        misses = cache.get(_stats_key(view_name, 'misses'), 0)
+        stats[view_name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses) * 100, 2) if hits + misses else 0
+        }
+    return stats
+
+
+def cached_response(view_name):
+    """
+    Caches the 200 responses of an APIView ``get`` under the current data
+    version, and answers a matching If-None-Match with a 304. ``get`` may
+    be a coroutine function.
+    """
+    CACHED_VIEWS.append(view_name)
+
+    def decorator(get):
+        if inspect.iscoroutinefunction(get):
+            # The file and redis backends block on I/O, so the cache calls
+            # run in a worker thread, one hop for each of lookup and store.
+            @wraps(get)
+            async def async_wrapper(self, request, *args, **kwargs):
+                key, cached = await sync_to_async(_lookup)(view_name, request)
+                if cached is None:
+                    response = await get(self, request, *args, **kwargs)
+                    cached = await sync_to_async(_store)(key, response)
+                    if cached is None:
+                        return response
+                return _respond(request, cached)
+            return async_wrapper
+
+        @wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            key, cached = _lookup(view_name, request)
+            if cached is None:
+                response = get(self, request, *args, **kwargs)
+                cached = _store(key, response)
+                if cached is None:
+                    return response
+            return _respond(request, cached)
+        return wrapper
+    return decorator
+
+
+def _lookup(view_name, request):
+    key = f'portal:response:{view_name}:{data_version()}:{request.get_full_path()}'
+    cached = cache.get(key)
+    _count(view_name, 'misses' if cached is None else 'hits')
+    return key, cached
+
+
+def _store(key, response):
+    if response.status_code != status.HTTP_200_OK:
+        return None
+    body = json.dumps(response.data, cls=JSONEncoder, sort_keys=True)
+    etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+    cached = (response.data, etag)
+    cache.set(key, cached, settings.PORTAL_CACHE_TIMEOUT)
+    return cached
+
+
+def _respond(request, cached):
+    data, etag = cached
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    return response
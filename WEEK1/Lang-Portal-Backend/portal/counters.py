@@ -0,0 +1,334 @@
+"""
+Maintains the denormalized counters: WordReviewCounter,
+WordGroupReviewCounter, GroupReviewSummary, the DailyActivity rollup and
+the counts of the StudyRollup rollups (see portal.rollups).
+
+Creating or deleting a single Word_Review or Study_Sessions row updates
+them through the signal handlers in portal.signals. Code that writes with
+bulk_create, or deletes without going through the ORM collector, has to
+call record_reviews()/record_sessions() or rebuild_counters() itself.
+
+The signal path is the slow one: every review saved on its own costs
+about 23 queries to count and schedule, where record_reviews() and
+schedule_reviews() take about as many for a whole batch. Write reviews in
+bulk (the review batch endpoint) wherever there is more than one.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import (
+    DailyActivity,
+    GroupReviewSummary,
+    Study_Sessions,
+    StudyRollup,
+    Word_Review,
+    WordGroupReviewCounter,
+    WordReviewCounter)
+from .rollups import ROLLUP_COUNTS, ROLLUP_KEY, expected_rollups, mark_stale, rollup_keys
+
+BATCH_SIZE = 500
+
+WORD_COUNTS = ('correct_count', 'wrong_count')
+GROUP_COUNTS = ('words_studied', 'total_reviews', 'correct_reviews')
+DAILY_COUNTS = ('sessions_count', 'reviews_count', 'correct_reviews')
+
+_state = threading.local()
+
+
+@contextmanager
+def counters_suspended():
+    """
+    Skips the signal-driven counter updates inside the block, for bulk
+    deletes that rebuild the counters afterwards.
+    """
+    previous = counters_are_suspended()
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def counters_are_suspended():
+    return getattr(_state, 'suspended', False)
+
+
+def record_reviews(reviews, sign=1):
+    """
+    Adds ``reviews`` (Word_Review instances) to the counters, or takes
+    them away again when ``sign`` is -1.
+    """
+    reviews = list(reviews)
+    if not reviews:
+        return
+    sessions = {
+        session_id: rest for session_id, *rest in Study_Sessions.objects.filter(
+            id__in={review.study_session_id_id for review in reviews}
+        ).values_list('id', 'Group_id', 'study_activity_id', 'creation_time')
+    }
+
+    word_deltas = defaultdict(lambda: [0, 0])
+    pair_deltas = defaultdict(lambda: [0, 0])
+    day_deltas = defaultdict(lambda: [0, 0])
+    rollup_deltas = defaultdict(lambda: [0, 0])
+    for review in reviews:
+        column = 0 if review.correct else 1
+        word_deltas[(review.word_id_id,)][column] += sign
+        day = (_local_date(review.creation_time),)
+        day_deltas[day][0] += sign
+        if review.correct:
+            day_deltas[day][1] += sign
+        session = sessions.get(review.study_session_id_id)
+        if session is None:
+            continue
+        group_id, activity_id, started = session
+        pair_deltas[(review.word_id_id, group_id)][column] += sign
+        for key in rollup_keys(started, group_id, activity_id):
+            rollup_deltas[key][0] += sign
+            if review.correct:
+                rollup_deltas[key][1] += sign
+
+    with transaction.atomic():
+        _apply_deltas(WordReviewCounter, ('word_id',), WORD_COUNTS, word_deltas)
+        pair_totals = _apply_deltas(
+            WordGroupReviewCounter, ('word_id', 'group_id'), WORD_COUNTS, pair_deltas)
+
+        group_deltas = defaultdict(lambda: [0, 0, 0])
+        for (word_id, group_id), (correct, wrong) in pair_deltas.items():
+            before, after = pair_totals.get((word_id, group_id), (0, 0))
+            deltas = group_deltas[(group_id,)]
+            deltas[0] += (after > 0) - (before > 0)
+            deltas[1] += correct + wrong
+            deltas[2] += correct
+        _apply_deltas(GroupReviewSummary, ('group_id',), GROUP_COUNTS, group_deltas)
+        _apply_deltas(DailyActivity, ('date',), DAILY_COUNTS[1:], day_deltas)
+        _apply_deltas(StudyRollup, ROLLUP_KEY, ROLLUP_COUNTS[1:], rollup_deltas)
+        # The reviews may have changed the words studied
+        mark_stale(rollup_deltas)
+
+
+def record_sessions(sessions, sign=1):
+    """
+    Adds ``sessions`` (Study_Sessions instances) to the daily activity and
+    study rollups, or takes them away again when ``sign`` is -1, keeping
+    the streaks of the affected days current.
+    """
+    day_deltas = defaultdict(lambda: [0])
+    rollup_deltas = defaultdict(lambda: [0])
+    timed = []
+    for session in sessions:
+        day_deltas[(_local_date(session.creation_time),)][0] += sign
+        keys = rollup_keys(session.creation_time, session.Group_id, session.study_activity_id)
+        for key in keys:
+            rollup_deltas[key][0] += sign
+        if session.end_time:
+            timed += keys
+
+    with transaction.atomic():
+        totals = _apply_deltas(DailyActivity, ('date',), DAILY_COUNTS[:1], day_deltas)
+        for (day,), (before, after) in sorted(totals.items()):
+            if (before > 0) != (after > 0):
+                _refresh_streaks(day)
+        _apply_deltas(StudyRollup, ROLLUP_KEY, ROLLUP_COUNTS[:1], rollup_deltas)
+        # Their minutes are added when the rollups are compacted
+        mark_stale(timed)
+
+
+def record_finished_sessions(sessions):
+    """Marks the rollups of ``sessions``, whose end time was just set, for compaction."""
+    mark_stale(
+        key for session in sessions
+        for key in rollup_keys(session.creation_time, session.Group_id, session.study_activity_id))
+
+
+def _local_date(value):
+    return timezone.localdate(value) if value else timezone.localdate()
+
+
+def _refresh_streaks(day):
+    """
+    Recomputes the streak of ``day`` and of the run of consecutive days
+    after it, which is the only part of the rollup a change on ``day``
+    can affect.
+    """
+    streak = DailyActivity.objects.filter(
+        date=day - timedelta(days=1), sessions_count__gt=0
+    ).values_list('streak', flat=True).first() or 0
+
+    changed = []
+    expected_date = day
+    for activity in DailyActivity.objects.filter(date__gte=day).order_by('date').iterator():
+        if activity.date != expected_date:
+            break
+        streak = streak + 1 if activity.sessions_count > 0 else 0
+        if activity.streak == streak and activity.date != day:
+            break
+        activity.streak = streak
+        changed.append(activity)
+        expected_date += timedelta(days=1)
+    DailyActivity.objects.bulk_update(changed, ['streak'])
+
+
+def _apply_deltas(model, key_fields, count_fields, deltas):
+    """
+    Adds ``deltas`` ({key: [delta per count field]}) onto the rows of
+    ``model``, creating the rows that don't exist yet.
+
+    Returns {key: (total before, total after)} where the total is the sum
+    of the count fields.
+    """
+    totals = {}
+    keys = [key for key, delta in deltas.items() if any(delta)]
+    for start in range(0, len(keys), BATCH_SIZE):
+        batch = keys[start:start + BATCH_SIZE]
+        existing = _locked_counts(model, key_fields, count_fields, batch)
+        # Nothing to take away from a missing row, and the row may be
+        # missing because its word or group is being deleted.
+        missing = [
+            key for key in batch
+            if key not in existing and any(change > 0 for change in deltas[key])]
+        if missing:
+            # Created empty, skipping any a concurrent writer created
+            # meanwhile, then locked and counted onto like the rest
+            model.objects.bulk_create(
+                [model(**dict(zip(key_fields, key))) for key in missing],
+                ignore_conflicts=True)
+            existing.update(_locked_counts(model, key_fields, count_fields, missing))
+
+        changes = defaultdict(dict)
+        for key in batch:
+            if key not in existing:
+                totals[key] = (0, 0)
+                continue
+            pk, *counts = existing[key]
+            delta = deltas[key]
+            after = [max(count + change, 0) for count, change in zip(counts, delta)]
+            totals[key] = (sum(counts), sum(after))
+            for field, change in zip(count_fields, delta):
+                if change:
+                    changes[field][pk] = change
+
+        for field, field_changes in changes.items():
+            change = Case(
+                *[When(pk=pk, then=Value(value)) for pk, value in field_changes.items()],
+                default=Value(0),
+                output_field=IntegerField())
+            model.objects.filter(pk__in=list(field_changes)).update(
+                **{field: Greatest(F(field) + change, Value(0))})
+    return totals
+
+
+def _locked_counts(model, key_fields, count_fields, keys):
+    """{key: (pk, *counts)} of the rows of ``model`` for ``keys``, locked for update."""
+    lookups = {
+        f'{field}__in': {key[index] for key in keys}
+        for index, field in enumerate(key_fields)
+    }
+    return {
+        row[:len(key_fields)]: row[len(key_fields):]
+        for row in model.objects.select_for_update().filter(
+            **lookups).values_list(*key_fields, 'pk', *count_fields)
+    }
+
+
+def _expected_counts():
+    """Counts straight from Word_Review, in the shape of the counter tables."""
+    words = Word_Review.objects.values('word_id').annotate(
+        correct_count=Count('id', filter=Q(correct=True)),
+        wrong_count=Count('id', filter=Q(correct=False)),
+    ).order_by()
+    pairs = Word_Review.objects.values(
+        'word_id', group_id=F('study_session_id__Group')
+    ).annotate(
+        correct_count=Count('id', filter=Q(correct=True)),
+        wrong_count=Count('id', filter=Q(correct=False)),
+    ).order_by()
+    groups = Word_Review.objects.values(
+        group_id=F('study_session_id__Group')
+    ).annotate(
+        words_studied=Count('word_id', distinct=True),
+        total_reviews=Count('id'),
+        correct_reviews=Count('id', filter=Q(correct=True)),
+    ).order_by()
+    return (
+        (WordReviewCounter, ('word_id',), WORD_COUNTS, words),
+        (WordGroupReviewCounter, ('word_id', 'group_id'), WORD_COUNTS, pairs),
+        (GroupReviewSummary, ('group_id',), GROUP_COUNTS, groups),
+        (DailyActivity, ('date',), DAILY_COUNTS + ('streak',), _expected_daily_activity()),
+        (StudyRollup, ROLLUP_KEY, ROLLUP_COUNTS, expected_rollups()),
+    )
+
+
+def _expected_daily_activity():
+    days = defaultdict(lambda: dict.fromkeys(DAILY_COUNTS, 0))
+    sessions = Study_Sessions.objects.annotate(
+        date=TruncDate('creation_time')
+    ).values('date').annotate(sessions_count=Count('id')).order_by()
+    for row in sessions:
+        days[row['date']]['sessions_count'] = row['sessions_count']
+    reviews = Word_Review.objects.annotate(
+        date=TruncDate('creation_time')
+    ).values('date').annotate(
+        reviews_count=Count('id'),
+        correct_reviews=Count('id', filter=Q(correct=True)),
+    ).order_by()
+    for row in reviews:
+        days[row['date']]['reviews_count'] = row['reviews_count']
+        days[row['date']]['correct_reviews'] = row['correct_reviews']
+
+    rows = []
+    streak = 0
+    for day in sorted(days):
+        active = days[day]['sessions_count'] > 0
+        follows_previous = rows and rows[-1]['date'] == day - timedelta(days=1)
+        streak = (streak + 1 if follows_previous else 1) if active else 0
+        rows.append({'date': day, **days[day], 'streak': streak})
+    return rows
+
+
+def rebuild_counters():
+    """Recomputes every counter from the Word_Review table."""
+    with transaction.atomic():
+        for model, key_fields, count_fields, rows in _expected_counts():
+            model.objects.all().delete()
+            batch = []
+            if hasattr(rows, 'iterator'):
+                rows = rows.iterator(chunk_size=BATCH_SIZE)
+            for row in rows:
+                batch.append(model(**row))
+                if len(batch) >= BATCH_SIZE:
+                    model.objects.bulk_create(batch)
+                    batch = []
+            model.objects.bulk_create(batch)
+
+
+def verify_counters():
+    """
+    Compares the counters against Word_Review and returns a description of
+    every row that disagrees. An empty list means they are in sync.
+    """
+    problems = []
+    for model, key_fields, count_fields, rows in _expected_counts():
+        expected = {
+            tuple(row[field] for field in key_fields):
+                tuple(row[field] for field in count_fields)
+            for row in rows
+        }
+        stored = {
+            row[:len(key_fields)]: row[len(key_fields):]
+            for row in model.objects.values_list(*key_fields, *count_fields)
+            if any(row[len(key_fields):])
+        }
+        for key in expected.keys() | stored.keys():
+            if expected.get(key) != stored.get(key):
+                problems.append(
+                    f"{model.__name__} {dict(zip(key_fields, key))}: "
+                    f"expected {expected.get(key)}, stored {stored.get(key)}")
+    return problems
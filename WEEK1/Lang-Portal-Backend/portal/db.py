@@ -0,0 +1,91 @@
+"""
+SQLite tuning for the production database profile, and the router that
+sends dashboard reads to the read-only "replica" connection.
+
+Both are driven by settings.PORTAL_DB_PROFILE; in development the pragmas
+are left at SQLite's defaults and there is no replica to route to.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+
+PRODUCTION_PRAGMAS = {
+    # Readers don't block the writer and the writer doesn't block readers
+    'journal_mode': 'WAL',
+    # Safe with WAL: a power loss can lose the last commits, not corrupt
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative means KiB rather than pages
+    'cache_size': -64 * 1024,
+    # Milliseconds to wait for a lock before raising "database is locked"
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+# journal_mode is stored in the database file, and a read-only connection
+# can't change it
+READ_ONLY_SKIPPED_PRAGMAS = {'journal_mode'}
+
+_replica_reads = ContextVar('portal_replica_reads', default=False)
+
+
+def sqlite_pragmas(alias):
+    if settings.PORTAL_DB_PROFILE != 'production':
+        return {}
+    if alias == REPLICA_ALIAS:
+        return {
+            name: value for name, value in PRODUCTION_PRAGMAS.items()
+            if name not in READ_ONLY_SKIPPED_PRAGMAS
+        }
+    return PRODUCTION_PRAGMAS
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver that applies the profile's pragmas."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas(connection.alias).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def replica_reads():
+    """Routes the reads made inside the block to the replica, if there is one."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Sends reads made inside replica_reads() to the replica connection.
+    Everything else, and any read inside a transaction on the default
+    database (which has to see that transaction's writes), stays on the
+    default database.
+    """
+
+    def __init__(self, replica_alias=REPLICA_ALIAS):
+        self.replica_alias = replica_alias
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or self.replica_alias not in connections.settings:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return self.replica_alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is the same data as the default database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != self.replica_alias
@@ -0,0 +1,192 @@
+"""
+Times every GET endpoint in portal/urls.py, for ``manage.py
+benchmark_endpoints``.
+
+The command seeds a throwaway SQLite database (benchmark_database()) with
+the seeder's realistic volumes and times against that, so neither the
+numbers nor the development database depend on what someone last left
+in it; ``--current-database`` times the configured one instead. Requests
+go through the whole
+middleware stack in process, no server needed, and the report is JSON
+with a stable layout so two runs (before and after a change) can be
+diffed or compared with ``--compare``.
+"""
+import re
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import urls
+from .cache import invalidate_on_write
+from .db import REPLICA_ALIAS
+from .models import (
+    ResetJob,
+    Study_Activities,
+    Study_Sessions,
+    Word_Review,
+    WordCategory,
+    WordGroup,
+    Words)
+
+# The model whose id fills the <int:...> part of a path, by its first segment
+PATH_MODELS = {
+    'words': Words,
+    'groups': WordGroup,
+    'study_activities': Study_Activities,
+    'study_sessions': Study_Sessions,
+    'reset_jobs': ResetJob,
+}
+# Extra query strings to time besides the plain URL, by URL name
+VARIANTS = {
+    'word-list': [
+        'search=ka', 'search=kaba&fuzzy=1', 'pagination=cursor',
+        'fields=id,Swahili,English', 'page=last',
+    ],
+    'group-words': ['pagination=cursor', 'fields=id,Swahili,English'],
+    'group-sessions': ['pagination=cursor'],
+    'group-next-words': ['n=100'],
+    'session-list': ['pagination=cursor', 'fields=id,group_name,review_items_count', 'page=last'],
+    'study-progress': ['group_id={groups}'],
+    'timeseries': ['period=week&scope=group&id={groups}', 'scope=group'],
+}
+REPORTED_TABLES = (Words, WordCategory, WordGroup, Study_Sessions, Study_Activities, Word_Review)
+
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+@contextmanager
+def benchmark_database(path):
+    """
+    Points the default connection, and the read-only replica if there is
+    one, at a new SQLite database at ``path`` and migrates it. The
+    configured databases are back in place after the block.
+    """
+    names = {DEFAULT_DB_ALIAS: str(path)}
+    if REPLICA_ALIAS in connections.settings:
+        names[REPLICA_ALIAS] = f'file:{path}?mode=ro'
+    configured = {}
+    for alias, name in names.items():
+        connections[alias].close()
+        configured[alias] = connections[alias].settings_dict['NAME']
+        connections[alias].settings_dict['NAME'] = name
+    try:
+        call_command('migrate', verbosity=0, interactive=False)
+        yield
+    finally:
+        for alias, name in configured.items():
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = name
+
+
+def get_endpoints():
+    """(URL name, path) for every pattern whose view answers GET."""
+    ids = {}
+    endpoints = []
+    first_group = WordGroup.objects.order_by('pk').values_list('pk', flat=True).first()
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern):
+            continue
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if view_class is None or not hasattr(view_class, 'get'):
+            continue
+        kwargs = {}
+        if pattern.pattern.converters:
+            segment = str(pattern.pattern).split('/')[0]
+            if segment not in ids:
+                ids[segment] = PATH_MODELS[segment].objects.order_by('pk').values_list(
+                    'pk', flat=True).first()
+            if ids[segment] is None:
+                # Nothing to look up, the database is empty
+                continue
+            kwargs = {name: ids[segment] for name in pattern.pattern.converters}
+        path = reverse(pattern.name, kwargs=kwargs)
+        endpoints.append((pattern.name, path))
+        for query in VARIANTS.get(pattern.name, ()):
+            endpoints.append((pattern.name, f'{path}?{query.format(groups=first_group)}'))
+    return endpoints
+
+
+def _percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def time_endpoint(client, path, repeat, cached):
+    """Requests ``path`` once to warm up, then ``repeat`` times."""
+    latencies = []
+    db_queries = None
+    response = body = None
+    for attempt in range(repeat + 1):
+        if not cached:
+            invalidate_on_write()
+        start = time.perf_counter()
+        response = client.get(path)
+        # Streamed responses are only produced as they are read
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        elapsed = (time.perf_counter() - start) * 1000
+        if attempt:
+            latencies.append(elapsed)
+        match = _QUERIES.search(response.get('Server-Timing', ''))
+        if match:
+            db_queries = int(match.group(1))
+    latencies.sort()
+    return {
+        'status': response.status_code,
+        'bytes': len(body),
+        'queries': db_queries,
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(_percentile(latencies, 0.95), 2),
+        'max_ms': round(latencies[-1], 2),
+    }
+
+
+def run_endpoint_benchmarks(repeat=20, cached=False, only=None, log=None):
+    """The report: database size and the timings of each endpoint."""
+    log = log or (lambda message: None)
+    client = APIClient()
+    client.force_authenticate(User(username='benchmark'))
+    results = {}
+    # The test client's host, which the deployed settings won't list
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for name, path in get_endpoints():
+            if only and name not in only:
+                continue
+            results[path] = {'name': name, **time_endpoint(client, path, repeat, cached)}
+            log(f"{path}: {results[path]['p50_ms']}ms")
+    return {
+        'created': timezone.now().isoformat(timespec='seconds'),
+        'database': {
+            'vendor': connection.vendor,
+            'profile': settings.PORTAL_DB_PROFILE,
+        },
+        'rows': {model.__name__: model.objects.count() for model in REPORTED_TABLES},
+        'repeat': repeat,
+        'cached': cached,
+        'endpoints': results,
+    }
+
+
+def compare_reports(before, after):
+    """One row per endpoint in both reports, with the change in p50 and queries."""
+    rows = []
+    for path, new in after['endpoints'].items():
+        old = before['endpoints'].get(path)
+        if old is None:
+            continue
+        rows.append({
+            'path': path,
+            'before_ms': old['p50_ms'],
+            'after_ms': new['p50_ms'],
+            'change': f"{(new['p50_ms'] - old['p50_ms']) / old['p50_ms']:+.0%}" if old['p50_ms'] else 'n/a',
+            'before_queries': old['queries'],
+            'after_queries': new['queries'],
+        })
+    return rows
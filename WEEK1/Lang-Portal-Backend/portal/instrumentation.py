@@ -0,0 +1,246 @@
+"""
+Per-request query count, database time, serialization time, render time
+and latency.
+
+InstrumentationMiddleware reports them for every response in a
+Server-Timing header and adds them to the in-process histograms that the
+/api/metrics/ endpoint serves in the Prometheus text format, labelled with
+the URL name from portal/urls.py. Each server process keeps its own
+histograms, so scrape every worker.
+
+Queries are counted by a wrapper installed on every database connection
+(see portal.signals), which charges them to the request in the current
+context. That context follows the request into sync_to_async threads, so
+the async views are counted too.
+
+Serialization is the time serializers spend building ``data`` from model
+instances (TimedSerializerMixin) or value rows, queries they make
+included; rendering is encoding that data as JSON.
+"""
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('portal_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializing = False
+        self.serialize_seconds = 0.0
+        self.render_started = None
+        self.render_seconds = 0.0
+        self.total_seconds = None
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_seconds * 1000:.2f}',
+            f'render;dur={self.render_seconds * 1000:.2f}',
+            f'total;dur={self.total_seconds * 1000:.2f}',
+        ])
+
+
+def current_metrics():
+    """The RequestMetrics of the request being served, or None."""
+    return _current.get()
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Charges the time spent inside to the current request's serialization
+    time. Nested uses, like a list serializer's children, count once.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_seconds += time.perf_counter() - start
+        metrics.serializing = False
+
+
+class TimedSerializerMixin:
+    """Times building a serializer's ``data``, see timed_serialization()."""
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver that wraps the connection's queries."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    HISTOGRAMS = (
+        ('portal_request_duration_seconds', 'Time to produce the response', DURATION_BUCKETS),
+        ('portal_request_db_seconds', 'Time spent in database queries', DURATION_BUCKETS),
+        ('portal_request_serialize_seconds', 'Time spent serializing the response data',
+         DURATION_BUCKETS),
+        ('portal_request_render_seconds', 'Time spent rendering the response body', DURATION_BUCKETS),
+        ('portal_request_queries', 'Database queries per request', QUERY_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._responses = {}
+
+    def observe(self, view, status_code, metrics):
+        values = (metrics.total_seconds, metrics.db_seconds, metrics.serialize_seconds,
+                  metrics.render_seconds, metrics.queries)
+        with self._lock:
+            for (name, _, buckets), value in zip(self.HISTOGRAMS, values):
+                self._histograms.setdefault(
+                    (name, view), Histogram(buckets)).observe(value)
+            key = (view, status_code)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._responses.clear()
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = [
+            '# HELP portal_responses_total Responses by URL name and status code',
+            '# TYPE portal_responses_total counter',
+        ]
+        with self._lock:
+            for (view, status_code), count in sorted(self._responses.items()):
+                lines.append(
+                    f'portal_responses_total{{view="{view}",code="{status_code}"}} {count}')
+            for name, help_text, _ in self.HISTOGRAMS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (histogram_name, view), histogram in sorted(self._histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {histogram.total}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum:g}')
+                    lines.append(f'{name}_count{{view="{view}"}} {histogram.total}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class CanScrapeMetrics(BasePermission):
+    """
+    Lets a Prometheus scraper read /api/metrics/ without a user account:
+    with ``Authorization: Bearer <settings.PORTAL_METRICS_TOKEN>``, or from
+    an address in settings.PORTAL_METRICS_ALLOWED_IPS. Both are unset by
+    default, which refuses scrapers. Signed in users can read it too.
+    """
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return True
+        if request.META.get('REMOTE_ADDR') in settings.PORTAL_METRICS_ALLOWED_IPS:
+            return True
+        token = settings.PORTAL_METRICS_TOKEN
+        authorization = request.headers.get('Authorization', '')
+        return bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+
+
+class InstrumentationMiddleware:
+    """Measures each request and reports it, see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        # Called just before DRF responses are rendered
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: _render_finished(metrics))
+        return response
+
+    def _finish(self, request, response, metrics):
+        metrics.total_seconds = time.perf_counter() - metrics.started
+        response['Server-Timing'] = metrics.server_timing()
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        registry.observe(view, response.status_code, metrics)
+        return response
+
+
+def _render_finished(metrics):
+    metrics.render_seconds += time.perf_counter() - metrics.render_started
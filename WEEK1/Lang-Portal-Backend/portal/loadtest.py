@@ -0,0 +1,79 @@
+"""
+HTTP load test against a running portal, run with ``manage.py loadtest``.
+
+Unlike the scenarios in portal.benchmarks this goes through a real server,
+so it measures the deployment as well as the code: run it once against
+the WSGI server and once against the ASGI one to compare them.
+"""
+import http.client
+import threading
+import time
+from urllib.parse import urlparse
+
+DEFAULT_PATHS = [
+    '/api/dashboard/study_progress/',
+    '/api/dashboard/quick-stats/',
+    '/api/dashboard/last_study_session/',
+    '/api/words/',
+    '/api/study_sessions/',
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_load(base_url, path, requests, concurrency, headers=None):
+    """
+    Sends ``requests`` GETs for ``path`` from ``concurrency`` keep-alive
+    connections and summarises the latencies.
+    """
+    url = urlparse(base_url)
+    connection_class = (http.client.HTTPSConnection if url.scheme == 'https'
+                        else http.client.HTTPConnection)
+    target = url.path.rstrip('/') + path
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    latencies = []
+    errors = []
+
+    def worker():
+        connection = connection_class(url.netloc, timeout=30)
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    break
+            start = time.perf_counter()
+            try:
+                connection.request('GET', target, headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                failed = True
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                (errors if failed else latencies).append(elapsed)
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'path': path,
+        'requests': requests,
+        'errors': len(errors),
+        'rps': round(len(latencies) / wall, 1) if wall else 0,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+    }
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Run a portal benchmark scenario and print its results"
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', help=', '.join(sorted(SCENARIOS)))
+        parser.add_argument(
+            '--sizes', default='10,100,1000',
+            help='Comma separated data sizes to run the scenario at')
+        parser.add_argument(
+            '--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            run = SCENARIOS[options['scenario']]
+        except KeyError:
+            raise CommandError(
+                f"Unknown scenario '{options['scenario']}', "
+                f"choose from: {', '.join(sorted(SCENARIOS))}")
+
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        rows = run(sizes)
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        for row in rows:
+            self.stdout.write('  '.join(f'{key}={value}' for key, value in row.items()))
@@ -0,0 +1,77 @@
+import json
+import tempfile
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.endpoint_benchmarks import (
+    benchmark_database, compare_reports, run_endpoint_benchmarks)
+from portal.seeding import DEFAULT_VOLUMES, seed_portal
+
+
+class Command(BaseCommand):
+    help = "Time every GET endpoint against a freshly seeded database and write a JSON report"
+
+    def add_arguments(self, parser):
+        for table, count in DEFAULT_VOLUMES.items():
+            parser.add_argument(
+                f'--{table}', type=int, default=count,
+                help=f'Number of {table} to seed (default: {count})')
+        parser.add_argument(
+            '--seed', type=int, default=0, help='Random seed, for repeatable data')
+        parser.add_argument(
+            '--current-database', action='store_true',
+            help="Time the configured database as it is instead of seeding a new one")
+        parser.add_argument(
+            '--output', help='File to write the JSON report to (default: print it)')
+        parser.add_argument(
+            '--repeat', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument(
+            '--only', default='',
+            help='Comma separated URL names to time, e.g. word-list,group-words')
+        parser.add_argument(
+            '--cached', action='store_true',
+            help='Let the dashboard endpoints answer from the response cache')
+        parser.add_argument(
+            '--compare', help='An earlier report to compare the p50 latencies with')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        before = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as report:
+                    before = json.load(report)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read {options['compare']}: {e}")
+
+        only = {name for name in options['only'].split(',') if name}
+        with tempfile.TemporaryDirectory() as directory:
+            if options['current_database']:
+                database = nullcontext()
+            else:
+                database = benchmark_database(Path(directory) / 'benchmark.sqlite3')
+            with database:
+                if not options['current_database']:
+                    volumes = {table: options[table] for table in DEFAULT_VOLUMES}
+                    self.stderr.write("Seeding the benchmark database...")
+                    seed_portal(volumes, seed=options['seed'], log=self.stderr.write)
+                report = run_endpoint_benchmarks(
+                    repeat=options['repeat'],
+                    cached=options['cached'],
+                    only=only,
+                    log=self.stderr.write if options['output'] else None)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f"Timed {len(report['endpoints'])} endpoints, report written to {options['output']}"))
+        elif not before:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if before:
+            for row in compare_reports(before, report):
+                self.stdout.write('  '.join(f'{key}={value}' for key, value in row.items()))
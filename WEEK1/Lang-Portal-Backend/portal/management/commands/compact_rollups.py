@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from portal.rollups import compact_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the distinct words and minutes of the study rollups changed since the last run"
+
+    def handle(self, *args, **options):
+        compacted = compact_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} study rollups"))
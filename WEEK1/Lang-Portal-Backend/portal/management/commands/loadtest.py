@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.loadtest import DEFAULT_PATHS, run_load
+
+
+class Command(BaseCommand):
+    help = "Load test running portal servers and print p50/p99 latency and throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', dest='targets', metavar='NAME=URL',
+            help='Server to test, e.g. wsgi=http://127.0.0.1:8000 '
+                 '(repeat to compare deployments)')
+        parser.add_argument(
+            '--paths', default=','.join(DEFAULT_PATHS),
+            help='Comma separated paths to request')
+        parser.add_argument(
+            '--requests', type=int, default=500, help='Requests per path')
+        parser.add_argument(
+            '--concurrency', type=int, default=16, help='Concurrent connections')
+        parser.add_argument(
+            '--token', help='API token, sent as "Authorization: Token <token>"')
+        parser.add_argument(
+            '--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['targets'] or ['local=http://127.0.0.1:8000']:
+            name, separator, url = target.partition('=')
+            if not separator or not url:
+                raise CommandError(f"Expected NAME=URL, got '{target}'")
+            targets.append((name, url))
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f"Token {options['token']}"
+
+        rows = []
+        for path in [path for path in options['paths'].split(',') if path]:
+            for name, url in targets:
+                rows.append({'target': name, **run_load(
+                    url, path, options['requests'], options['concurrency'], headers)})
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        for row in rows:
+            self.stdout.write('  '.join(f'{key}={value}' for key, value in row.items()))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.counters import rebuild_counters, verify_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the review counters and daily activity rollup, then verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only', action='store_true',
+            help='Only compare the counters against Word_Review, without rebuilding')
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            rebuild_counters()
+            self.stdout.write("Review counters rebuilt")
+
+        problems = verify_counters()
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f"{len(problems)} review counters are out of sync")
+        self.stdout.write(self.style.SUCCESS("Review counters are in sync"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from portal.models import WordSchedule
+from portal.scheduler import rebuild_schedules
+
+
+class Command(BaseCommand):
+    help = "Rebuild the spaced-repetition schedules by replaying every review"
+
+    def handle(self, *args, **options):
+        rebuild_schedules()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {WordSchedule.objects.count()} word schedules"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from portal.seeding import DEFAULT_VOLUMES, clear_portal_data, seed_portal
+
+
+class Command(BaseCommand):
+    help = "Fill the database with random words, groups, sessions and reviews"
+
+    def add_arguments(self, parser):
+        for table, count in DEFAULT_VOLUMES.items():
+            parser.add_argument(
+                f'--{table}', type=int, default=count,
+                help=f'Number of {table} to create (default: {count})')
+        parser.add_argument(
+            '--seed', type=int, default=0, help='Random seed, for repeatable data')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete the existing words, groups and study history first')
+        parser.add_argument(
+            '--skip-schedules', action='store_true',
+            help="Don't replay the reviews into the spaced-repetition schedules "
+                 "(run rebuild_schedules later)")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write("Clearing existing data...")
+            clear_portal_data()
+
+        volumes = {table: options[table] for table in DEFAULT_VOLUMES}
+        timings = seed_portal(
+            volumes,
+            seed=options['seed'],
+            schedules=not options['skip_schedules'],
+            log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded ' + ', '.join(f'{count} {table}' for table, count in volumes.items()) +
+            f' in {round(sum(timings.values()), 1)}s'))
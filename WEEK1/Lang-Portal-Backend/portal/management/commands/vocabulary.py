@@ -0,0 +1,45 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.vocabulary import FORMATS, export_words, format_for, import_words
+
+
+class Command(BaseCommand):
+    help = "Import words from, or export them to, a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['import', 'export'])
+        parser.add_argument('path', help="The file to read or write, '-' for stdin/stdout")
+        parser.add_argument(
+            '--format', choices=sorted(FORMATS),
+            help='File format (default: from the file extension, else csv)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or format_for(path, 'csv')
+
+        if options['action'] == 'export':
+            if path == '-':
+                for text in export_words(file_format):
+                    self.stdout.write(text, ending='')
+                return
+            with open(path, 'w', encoding='utf-8', newline='') as output:
+                for text in export_words(file_format):
+                    output.write(text)
+            self.stdout.write(self.style.SUCCESS(f"Exported the words to {path}"))
+            return
+
+        if path == '-':
+            summary = import_words(sys.stdin, file_format)
+        else:
+            try:
+                with open(path, encoding='utf-8-sig', newline='') as source:
+                    summary = import_words(source, file_format)
+            except OSError as e:
+                raise CommandError(f"Can't read {path}: {e}")
+        for error in summary.pop('errors'):
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['error'])}")
+        self.stdout.write(self.style.SUCCESS(
+            '  '.join(f'{key}={value}' for key, value in summary.items())))
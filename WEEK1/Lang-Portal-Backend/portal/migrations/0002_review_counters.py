@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+
+BATCH_SIZE = 500
+
+
+def backfill_counters(apps, schema_editor):
+    """Counts the reviews already recorded, as rebuild_counters() does."""
+    Word_Review = apps.get_model('portal', 'Word_Review')
+    WordReviewCounter = apps.get_model('portal', 'WordReviewCounter')
+    WordGroupReviewCounter = apps.get_model('portal', 'WordGroupReviewCounter')
+    GroupReviewSummary = apps.get_model('portal', 'GroupReviewSummary')
+    answers = {
+        'correct_count': Count('id', filter=Q(correct=True)),
+        'wrong_count': Count('id', filter=Q(correct=False)),
+    }
+    counts = (
+        (WordReviewCounter, Word_Review.objects.values('word_id').annotate(**answers)),
+        (WordGroupReviewCounter, Word_Review.objects.values(
+            'word_id', group_id=F('study_session_id__Group')).annotate(**answers)),
+        (GroupReviewSummary, Word_Review.objects.values(
+            group_id=F('study_session_id__Group')).annotate(
+                words_studied=Count('word_id', distinct=True),
+                total_reviews=Count('id'),
+                correct_reviews=Count('id', filter=Q(correct=True)))),
+    )
+    for model, rows in counts:
+        model.objects.bulk_create(
+            (model(**row) for row in rows.order_by().iterator(chunk_size=BATCH_SIZE)),
+            batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupReviewSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('words_studied', models.PositiveIntegerField(default=0)),
+                ('total_reviews', models.PositiveIntegerField(default=0)),
+                ('correct_reviews', models.PositiveIntegerField(default=0)),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='review_summary', to='portal.wordgroup')),
+            ],
+            options={
+                'verbose_name_plural': 'Group Review Summaries',
+            },
+        ),
+        migrations.CreateModel(
+            name='WordReviewCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('wrong_count', models.PositiveIntegerField(default=0)),
+                ('word', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='review_counter', to='portal.words')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WordGroupReviewCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('wrong_count', models.PositiveIntegerField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='word_review_counters', to='portal.wordgroup')),
+                ('word', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_review_counters', to='portal.words')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('word', 'group'), name='unique_word_group_review_counter')],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
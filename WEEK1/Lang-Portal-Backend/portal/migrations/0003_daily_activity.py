@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:41
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_activity(apps, schema_editor):
+    """Rolls up the sessions and reviews already recorded, with their streaks."""
+    Study_Sessions = apps.get_model('portal', 'Study_Sessions')
+    Word_Review = apps.get_model('portal', 'Word_Review')
+    DailyActivity = apps.get_model('portal', 'DailyActivity')
+    days = defaultdict(dict)
+    sessions = Study_Sessions.objects.annotate(
+        date=TruncDate('creation_time')
+    ).values('date').annotate(sessions_count=Count('id')).order_by()
+    reviews = Word_Review.objects.annotate(
+        date=TruncDate('creation_time')
+    ).values('date').annotate(
+        reviews_count=Count('id'),
+        correct_reviews=Count('id', filter=Q(correct=True)),
+    ).order_by()
+    for rows in (sessions, reviews):
+        for row in rows:
+            days[row.pop('date')].update(row)
+
+    activity = []
+    streak = 0
+    for day in sorted(days):
+        if days[day].get('sessions_count'):
+            follows_previous = activity and activity[-1].date == day - timedelta(days=1)
+            streak = streak + 1 if follows_previous else 1
+        else:
+            streak = 0
+        activity.append(DailyActivity(date=day, streak=streak, **days[day]))
+    DailyActivity.objects.bulk_create(activity, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0002_review_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('sessions_count', models.PositiveIntegerField(default=0)),
+                ('reviews_count', models.PositiveIntegerField(default=0)),
+                ('correct_reviews', models.PositiveIntegerField(default=0)),
+                ('streak', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Activity',
+            },
+        ),
+        migrations.AlterField(
+            model_name='study_sessions',
+            name='creation_time',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='word_review',
+            name='creation_time',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.RunPython(backfill_daily_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0003_daily_activity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='study_sessions',
+            name='creation_time',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AddIndex(
+            model_name='study_sessions',
+            index=models.Index(fields=['-creation_time', '-id'], name='session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='study_sessions',
+            index=models.Index(fields=['Group', '-creation_time', '-id'], name='session_group_created_idx'),
+        ),
+    ]
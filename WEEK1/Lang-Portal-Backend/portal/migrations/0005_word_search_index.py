@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:45
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE portal_words_fts USING fts5(
+        Swahili, English, Pronounciation,
+        content='portal_words', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER portal_words_fts_insert AFTER INSERT ON portal_words BEGIN
+        INSERT INTO portal_words_fts(rowid, Swahili, English, Pronounciation)
+        VALUES (new.id, new.Swahili, new.English, new.Pronounciation);
+    END
+    """,
+    """
+    CREATE TRIGGER portal_words_fts_delete AFTER DELETE ON portal_words BEGIN
+        INSERT INTO portal_words_fts(portal_words_fts, rowid, Swahili, English, Pronounciation)
+        VALUES ('delete', old.id, old.Swahili, old.English, old.Pronounciation);
+    END
+    """,
+    """
+    CREATE TRIGGER portal_words_fts_update AFTER UPDATE ON portal_words BEGIN
+        INSERT INTO portal_words_fts(portal_words_fts, rowid, Swahili, English, Pronounciation)
+        VALUES ('delete', old.id, old.Swahili, old.English, old.Pronounciation);
+        INSERT INTO portal_words_fts(rowid, Swahili, English, Pronounciation)
+        VALUES (new.id, new.Swahili, new.English, new.Pronounciation);
+    END
+    """,
+    "INSERT INTO portal_words_fts(portal_words_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS portal_words_fts_update",
+    "DROP TRIGGER IF EXISTS portal_words_fts_delete",
+    "DROP TRIGGER IF EXISTS portal_words_fts_insert",
+    "DROP TABLE IF EXISTS portal_words_fts",
+]
+
+POSTGRES_FORWARD = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+    f'CREATE INDEX IF NOT EXISTS portal_words_{field.lower()}_trgm '
+    f'ON portal_words USING gin ("{field}" gin_trgm_ops)'
+    for field in ('Swahili', 'English', 'Pronounciation')
+]
+
+POSTGRES_BACKWARD = [
+    f'DROP INDEX IF EXISTS portal_words_{field.lower()}_trgm'
+    for field in ('Swahili', 'English', 'Pronounciation')
+]
+
+
+def run_for_vendor(sqlite_statements, postgres_statements):
+    def run(apps, schema_editor):
+        statements = {
+            'sqlite': sqlite_statements,
+            'postgresql': postgres_statements,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0004_session_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(SQLITE_FORWARD, POSTGRES_FORWARD),
+            run_for_vendor(SQLITE_BACKWARD, POSTGRES_BACKWARD),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from portal.scheduler import advance
+
+BATCH_SIZE = 1000
+
+
+def backfill_schedules(apps, schema_editor):
+    """Replays the reviews already recorded, oldest first, as rebuild_schedules() does."""
+    Word_Review = apps.get_model('portal', 'Word_Review')
+    WordSchedule = apps.get_model('portal', 'WordSchedule')
+    schedules = {}
+    reviews = Word_Review.objects.order_by('creation_time', 'id').values_list(
+        'word_id', 'study_session_id__Group_id', 'correct', 'creation_time')
+    for word_id, group_id, correct, reviewed_at in reviews.iterator(chunk_size=BATCH_SIZE * 10):
+        schedule = schedules.get((word_id, group_id))
+        if schedule is None:
+            schedule = schedules[(word_id, group_id)] = WordSchedule(
+                word_id=word_id, group_id=group_id)
+        advance(schedule, correct, reviewed_at)
+    WordSchedule.objects.bulk_create(schedules.values(), batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0005_word_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WordSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('repetitions', models.PositiveIntegerField(default=0)),
+                ('ease', models.FloatField(default=2.5)),
+                ('interval_days', models.PositiveIntegerField(default=0)),
+                ('due', models.DateTimeField()),
+                ('last_reviewed', models.DateTimeField()),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='word_schedules', to='portal.wordgroup')),
+                ('word', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='portal.words')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', 'due'], name='schedule_due_idx')],
+                'constraints': [models.UniqueConstraint(fields=('word', 'group'), name='unique_word_schedule')],
+            },
+        ),
+        migrations.RunPython(backfill_schedules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0006_word_schedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='study_sessions',
+            index=models.Index(fields=['study_activity_id', '-creation_time', '-id'], name='session_activity_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='word_review',
+            index=models.Index(fields=['word_id', 'correct'], name='review_word_correct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='word_review',
+            index=models.Index(fields=['study_session_id', 'word_id'], name='review_session_word_idx'),
+        ),
+        migrations.AlterField(
+            model_name='word_review',
+            name='study_session_id',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='portal.study_sessions'),
+        ),
+        migrations.AlterField(
+            model_name='word_review',
+            name='word_id',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='portal.words'),
+        ),
+    ]
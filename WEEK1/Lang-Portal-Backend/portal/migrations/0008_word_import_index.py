@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0007_review_access_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='words',
+            index=models.Index(fields=['Swahili', 'English'], name='word_swahili_english_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+from portal.rollups import expected_rollups
+
+
+def backfill_rollups(apps, schema_editor):
+    """Rolls up the sessions and reviews already recorded."""
+    StudyRollup = apps.get_model('portal', 'StudyRollup')
+    StudyRollup.objects.bulk_create(
+        (StudyRollup(**row) for row in expected_rollups()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0009_reset_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=5)),
+                ('start', models.DateField()),
+                ('scope', models.CharField(choices=[('all', 'All'), ('group', 'Group'), ('activity', 'Activity')], max_length=10)),
+                ('scope_id', models.IntegerField(default=0)),
+                ('sessions_count', models.PositiveIntegerField(default=0)),
+                ('reviews_count', models.PositiveIntegerField(default=0)),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('distinct_words', models.PositiveIntegerField(default=0)),
+                ('session_seconds', models.FloatField(default=0)),
+                ('stale', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('stale', True)), fields=['period'], name='rollup_stale_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'scope', 'scope_id', 'start'), name='unique_study_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
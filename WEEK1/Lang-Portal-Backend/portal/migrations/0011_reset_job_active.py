@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0010_study_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resetjob',
+            name='active',
+            field=models.BooleanField(default=None, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0011_reset_job_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WordSearchEntry',
+            fields=[
+                ('word', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='portal.words')),
+            ],
+            options={
+                'db_table': 'portal_words_fts',
+                'managed': False,
+            },
+        ),
+    ]
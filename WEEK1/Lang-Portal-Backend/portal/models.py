@@ -1,4 +1,8 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 # Create your models here.
@@ -33,35 +37,78 @@ class Words(models.Model):
 
     @property
     def review_stats(self):
-        reviews = self.word_review_set.all()
-        return {
-            'correct_count': reviews.filter(correct=True).count(),
-            'wrong_count': reviews.filter(correct=False).count(),
-            'by_group': self._get_group_stats()
+        return Words.bulk_review_stats([self])[self.id]
+
+    @classmethod
+    def bulk_review_stats(cls, words):
+        """
+        Review stats for a page of words, keyed by word id.
+
+        Reads the maintained review counters (see portal.counters) for the
+        whole page, so the cost doesn't grow with the number of reviews.
+        """
+        word_ids = [word.id for word in words]
+        stats = {
+            word_id: {'correct_count': 0, 'wrong_count': 0, 'by_group': {}}
+            for word_id in word_ids
         }
-
-    def _get_group_stats(self):
-        """Get review statistics per group"""
-        stats = {}
-        for group in self.word_groups.all():
-            group_reviews = self.word_review_set.filter(
-                study_session_id__Group=group
+        if all('word_groups' in getattr(word, '_prefetched_objects_cache', {})
+               for word in words):
+            memberships = {
+                (word.id, group.id)
+                for word in words for group in word.word_groups.all()
+            }
+        else:
+            memberships = set(
+                WordGroup.words.through.objects.filter(
+                    words_id__in=word_ids).values_list('words_id', 'wordgroup_id')
             )
-            if group_reviews.exists():
-                stats[group.id] = {
-                    'group_name': group.name,
-                    'correct_count': group_reviews.filter(correct=True).count(),
-                    'wrong_count': group_reviews.filter(correct=False).count()
+
+        for word_id, correct_count, wrong_count in WordReviewCounter.objects.filter(
+                word_id__in=word_ids).values_list('word_id', 'correct_count', 'wrong_count'):
+            stats[word_id]['correct_count'] = correct_count
+            stats[word_id]['wrong_count'] = wrong_count
+
+        rows = WordGroupReviewCounter.objects.filter(
+            word_id__in=word_ids
+        ).exclude(correct_count=0, wrong_count=0).values(
+            'word_id', 'group_id', 'group__name', 'correct_count', 'wrong_count')
+        for row in rows:
+            if (row['word_id'], row['group_id']) in memberships:
+                stats[row['word_id']]['by_group'][row['group_id']] = {
+                    'group_name': row['group__name'],
+                    'correct_count': row['correct_count'],
+                    'wrong_count': row['wrong_count']
                 }
         return stats
 
     class Meta:
         verbose_name_plural = "Words"
+        indexes = [
+            # Finds the existing copy of each imported word
+            models.Index(fields=['Swahili', 'English'],
+                         name='word_swahili_english_idx'),
+        ]
 
     def __str__(self):
         return f"{self.Swahili} ({self.English})"
 
 
+class WordSearchEntry(models.Model):
+    """
+    A word's row in the SQLite FTS5 search index, which migration 0005
+    creates and its triggers keep in step with Words. Mapped only so word
+    searches can join it (see portal.search); never written through.
+    """
+    word = models.OneToOneField(
+        Words, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_entry')
+
+    class Meta:
+        managed = False
+        db_table = 'portal_words_fts'
+
+
 class WordGroup(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -79,22 +126,105 @@ class WordGroup(models.Model):
         return self.study_sessions.count()
 
     def get_progress_stats(self):
-        total_words = self.words.count()
-        sessions = self.study_sessions.all()
-        reviews = Word_Review.objects.filter(study_session_id__in=sessions)
-        unique_words_studied = reviews.values('word_id').distinct().count()
-        total_reviews = reviews.count()
-        correct_reviews = reviews.filter(correct=True).count()
-
-        return {
-            'total_words': total_words,
-            'words_studied': unique_words_studied,
-            'progress_percentage': (unique_words_studied / total_words * 100) if total_words > 0 else 0,
-            'total_reviews': total_reviews,
-            'correct_reviews': correct_reviews,
-            'accuracy': (correct_reviews / total_reviews * 100) if total_reviews > 0 else 0
+        return WordGroup.bulk_progress_stats([self])[self.id]
+
+    @classmethod
+    def bulk_progress_stats(cls, groups=None):
+        """
+        Progress stats for many groups at once, keyed by group id.
+
+        Reads the maintained GroupReviewSummary rows alongside the word
+        counts in a single query, no matter how many groups are passed.
+        """
+        stats = {}
+        for group_id, *counts in cls._progress_rows(groups):
+            stats[group_id] = _progress_stats(*counts)
+        return stats
+
+    @classmethod
+    async def abulk_progress_stats(cls, groups=None):
+        """Async version of bulk_progress_stats()."""
+        stats = {}
+        async for group_id, *counts in cls._progress_rows(groups):
+            stats[group_id] = _progress_stats(*counts)
+        return stats
+
+    @classmethod
+    def _progress_rows(cls, groups):
+        rows = cls.objects.annotate(total_words=Count('words'))
+        if groups is not None:
+            rows = rows.filter(id__in=[group.id for group in groups])
+        return rows.values_list(
+            'id',
+            'total_words',
+            Coalesce('review_summary__words_studied', 0),
+            Coalesce('review_summary__total_reviews', 0),
+            Coalesce('review_summary__correct_reviews', 0))
+
+    @classmethod
+    def bulk_sessions_count(cls, groups):
+        """Number of study sessions of each group, keyed by group id."""
+        counts = dict.fromkeys((group.id for group in groups), 0)
+        counts.update(Study_Sessions.objects.filter(
+            Group__in=[group.id for group in groups]
+        ).values('Group').annotate(count=Count('id')).values_list('Group', 'count').order_by())
+        return counts
+
+    @classmethod
+    def bulk_category_distribution(cls, groups):
+        """
+        Number of words per category name for each group, keyed by group
+        id. Cached per group (portal.signals clears an entry when the
+        group's words or their categories change); the groups missing from
+        the cache are counted together in one grouped join.
+        """
+        keys = {group.id: category_distribution_key(group.id) for group in groups}
+        cached = cache.get_many(keys.values())
+        distributions = {
+            group_id: cached[key] for group_id, key in keys.items() if key in cached
         }
 
+        missing = [group_id for group_id in keys if group_id not in distributions]
+        if missing:
+            for group_id in missing:
+                distributions[group_id] = {}
+            rows = WordGroup.words.through.objects.filter(
+                wordgroup_id__in=missing, words__categories__isnull=False
+            ).values('wordgroup_id', 'words__categories__name').annotate(
+                word_count=Count('id'))
+            for row in rows:
+                distributions[row['wordgroup_id']][row['words__categories__name']] = row['word_count']
+            cache.set_many(
+                {keys[group_id]: distributions[group_id] for group_id in missing},
+                settings.PORTAL_CACHE_TIMEOUT)
+        return distributions
+
+
+def category_distribution_key(group_id):
+    return f'portal:category-distribution:{group_id}'
+
+
+def forget_category_distributions(group_ids):
+    """Drops the cached category distributions of ``group_ids``."""
+    cache.delete_many([category_distribution_key(group_id) for group_id in group_ids])
+
+
+def groups_of_words(word_ids):
+    """The ids of the groups that contain any of ``word_ids``."""
+    return set(WordGroup.words.through.objects.filter(
+        words_id__in=word_ids).values_list('wordgroup_id', flat=True))
+
+
+def _progress_stats(total_words, words_studied, total_reviews, correct_reviews):
+    return {
+        'total_words': total_words,
+        'words_studied': words_studied,
+        'progress_percentage': (words_studied / total_words * 100) if total_words > 0 else 0,
+        'total_reviews': total_reviews,
+        'correct_reviews': correct_reviews,
+        'accuracy': (correct_reviews / total_reviews * 100) if total_reviews > 0 else 0
+    }
+
 
 class Study_Sessions(models.Model):
     Group = models.ForeignKey(
@@ -106,16 +236,46 @@ class Study_Sessions(models.Model):
     end_time = models.DateTimeField(null=True, blank=True)
     study_activity_id = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the session lists, newest first
+            models.Index(fields=['-creation_time', '-id'],
+                         name='session_created_idx'),
+            models.Index(fields=['Group', '-creation_time', '-id'],
+                         name='session_group_created_idx'),
+            models.Index(fields=['study_activity_id', '-creation_time', '-id'],
+                         name='session_activity_created_idx'),
+        ]
+
     @property
     def review_items_count(self):
+        if hasattr(self, 'review_count'):
+            return self.review_count
         return self.word_review_set.count()
 
     @property
     def duration(self):
+        if hasattr(self, 'elapsed_time'):
+            return self.elapsed_time.total_seconds() if self.elapsed_time else None
         if self.end_time:
             return (self.end_time - self.creation_time).total_seconds()
         return None
 
+    @classmethod
+    def with_review_stats(cls, sessions=None):
+        """
+        ``sessions`` (all of them by default) with their group joined and
+        the review count and duration computed in the same query, so
+        listing them doesn't run a query per session.
+        """
+        sessions = cls.objects.all() if sessions is None else sessions
+        reviews = Word_Review.objects.filter(
+            study_session_id=OuterRef('pk')
+        ).order_by().values('study_session_id').annotate(count=Count('id')).values('count')
+        return sessions.select_related('Group').annotate(
+            review_count=Coalesce(Subquery(reviews), 0),
+            elapsed_time=F('end_time') - F('creation_time'))
+
     def finish_session(self):
         self.end_time = timezone.now()
         self.save()
@@ -142,11 +302,198 @@ class Study_Activities(models.Model):
 
 
 class Word_Review(models.Model):
-    word_id = models.ForeignKey(Words, on_delete=models.CASCADE)
+    # Both foreign keys lead the composite indexes below, which serve their
+    # lookups too, so they don't get single-column indexes of their own
+    word_id = models.ForeignKey(Words, on_delete=models.CASCADE, db_index=False)
     study_session_id = models.ForeignKey(
-        Study_Sessions, on_delete=models.CASCADE)
+        Study_Sessions, on_delete=models.CASCADE, db_index=False)
     correct = models.BooleanField()
-    creation_time = models.DateTimeField(auto_now_add=True)
+    creation_time = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['word_id', 'correct'],
+                         name='review_word_correct_idx'),
+            models.Index(fields=['study_session_id', 'word_id'],
+                         name='review_session_word_idx'),
+        ]
 
     def __str__(self) -> str:
         return f"word review for {self.word_id.Swahili} belonging to this word group {self.study_session_id.study_activity_id}"
+
+
+class WordReviewCounter(models.Model):
+    """
+    Running review totals for a word, kept in step with Word_Review by
+    portal.counters so stats reads don't have to recount reviews.
+    """
+    word = models.OneToOneField(
+        Words, on_delete=models.CASCADE, related_name='review_counter')
+    correct_count = models.PositiveIntegerField(default=0)
+    wrong_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"review counter for word {self.word_id}"
+
+
+class WordGroupReviewCounter(models.Model):
+    """
+    Running review totals for a word within the group of the sessions it
+    was reviewed in.
+    """
+    word = models.ForeignKey(
+        Words, on_delete=models.CASCADE, related_name='group_review_counters')
+    group = models.ForeignKey(
+        WordGroup, on_delete=models.CASCADE, related_name='word_review_counters')
+    correct_count = models.PositiveIntegerField(default=0)
+    wrong_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['word', 'group'], name='unique_word_group_review_counter'),
+        ]
+
+    def __str__(self) -> str:
+        return f"review counter for word {self.word_id} in group {self.group_id}"
+
+
+class GroupReviewSummary(models.Model):
+    """
+    Running review totals for a group, used by the progress stats.
+    """
+    group = models.OneToOneField(
+        WordGroup, on_delete=models.CASCADE, related_name='review_summary')
+    words_studied = models.PositiveIntegerField(default=0)
+    total_reviews = models.PositiveIntegerField(default=0)
+    correct_reviews = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Group Review Summaries"
+
+    def __str__(self) -> str:
+        return f"review summary for group {self.group_id}"
+
+
+class DailyActivity(models.Model):
+    """
+    Per-day rollup of study sessions and reviews, maintained by
+    portal.counters, along with the study streak ending on that day.
+    """
+    date = models.DateField(unique=True)
+    sessions_count = models.PositiveIntegerField(default=0)
+    reviews_count = models.PositiveIntegerField(default=0)
+    correct_reviews = models.PositiveIntegerField(default=0)
+    streak = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Daily Activity"
+
+    def __str__(self) -> str:
+        return f"activity on {self.date}"
+
+
+class StudyRollup(models.Model):
+    """
+    Sessions and reviews of one day or week, for one group, one activity
+    or everything ("all", scope_id 0). Maintained by portal.counters and
+    portal.rollups.
+    """
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+    ]
+    SCOPE_CHOICES = [
+        ('all', 'All'),
+        ('group', 'Group'),
+        ('activity', 'Activity'),
+    ]
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    # The day, or the Monday the week starts on
+    start = models.DateField()
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    scope_id = models.IntegerField(default=0)
+    sessions_count = models.PositiveIntegerField(default=0)
+    reviews_count = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    distinct_words = models.PositiveIntegerField(default=0)
+    session_seconds = models.FloatField(default=0)
+    # distinct_words and session_seconds wait for compact_rollups()
+    stale = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'scope', 'scope_id', 'start'],
+                name='unique_study_rollup'),
+        ]
+        indexes = [
+            # What compact_rollups() has left to do
+            models.Index(fields=['period'], condition=models.Q(stale=True),
+                         name='rollup_stale_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.period} of {self.start} for {self.scope} {self.scope_id}"
+
+
+class WordSchedule(models.Model):
+    """
+    Spaced-repetition state (SM-2) of a word within a group, advanced by
+    portal.scheduler each time the word is reviewed in one of the group's
+    sessions.
+    """
+    word = models.ForeignKey(
+        Words, on_delete=models.CASCADE, related_name='schedules')
+    group = models.ForeignKey(
+        WordGroup, on_delete=models.CASCADE, related_name='word_schedules')
+    repetitions = models.PositiveIntegerField(default=0)
+    ease = models.FloatField(default=2.5)
+    interval_days = models.PositiveIntegerField(default=0)
+    due = models.DateTimeField()
+    last_reviewed = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['word', 'group'], name='unique_word_schedule'),
+        ]
+        indexes = [
+            # The due queue of a group, read as a range scan
+            models.Index(fields=['group', 'due'], name='schedule_due_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"schedule for word {self.word_id} in group {self.group_id}"
+
+
+class ResetJob(models.Model):
+    """
+    A history or full reset run by portal.reset, usually in the background,
+    and how far it has got.
+    """
+    KIND_CHOICES = [
+        ('history', 'Study history'),
+        ('full', 'Everything'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('finished', 'Finished'),
+        ('failed', 'Failed'),
+    ]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    archive_path = models.CharField(max_length=500, blank=True)
+    # {table: {'deleted': rows, 'total': rows}}
+    progress = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # True while pending or running, NULL after. Unique, so the database
+    # itself refuses a second job while one is active.
+    active = models.BooleanField(null=True, default=None, unique=True)
+
+    def __str__(self) -> str:
+        return f"{self.kind} reset {self.id} ({self.status})"
@@ -0,0 +1,272 @@
+"""
+History and full resets that don't lock the database for their whole run.
+
+QuerySet.delete() collects every row it deletes, and its cascades, into
+memory and sends a signal per row, all in one transaction. Here each
+table is deleted by a plain DELETE over a bounded range of primary keys,
+one transaction per chunk, children before parents. Rows added after
+the reset started are left alone, unless they point at a row being
+deleted: each chunk also deletes the rows that reference it, the way a
+cascade would, so a review added to an old session meanwhile goes with
+the session instead of failing its foreign key. The counters and
+schedules are rebuilt from whatever history is left at the end, even if
+the reset failed part way.
+
+The views start a ResetJob in a background thread and the client polls
+/api/reset_jobs/<id>/ for its progress. With ``archive`` the rows are
+first written to a gzipped JSON Lines file, one {"table", "row"} object
+per line.
+"""
+import gzip
+import json
+import threading
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, connections, models, transaction
+from django.utils import timezone
+
+from .cache import invalidate_on_write
+from .counters import rebuild_counters
+from .models import (
+    DailyActivity,
+    GroupReviewSummary,
+    ResetJob,
+    Study_Activities,
+    Study_Sessions,
+    StudyRollup,
+    Word_Review,
+    WordGroup,
+    WordGroupReviewCounter,
+    WordReviewCounter,
+    WordSchedule,
+    Words)
+from .scheduler import rebuild_schedules
+
+RESET_CHUNK_SIZE = 10000
+# A running job that hasn't reported progress for this long died with its
+# process, and no longer stops a new reset
+RESET_STALE_AFTER = timedelta(minutes=10)
+
+# In delete order, each table before the ones it references
+HISTORY_MODELS = [Word_Review, Study_Activities, Study_Sessions]
+DERIVED_MODELS = [
+    WordReviewCounter, WordGroupReviewCounter, GroupReviewSummary,
+    DailyActivity, StudyRollup, WordSchedule,
+]
+VOCABULARY_MODELS = [
+    WordGroup.words.through, WordGroup.categories.through,
+    Words.categories.through, WordGroup, Words,
+]
+
+
+class ResetInProgress(Exception):
+    def __init__(self, job):
+        super().__init__(f"Reset {job.id} is still {job.status}")
+        self.job = job
+
+
+def reset_models(kind):
+    if kind == 'history':
+        return HISTORY_MODELS + DERIVED_MODELS
+    return HISTORY_MODELS + DERIVED_MODELS + VOCABULARY_MODELS
+
+
+def _table(model):
+    quote = connection.ops.quote_name
+    return quote(model._meta.db_table), quote(model._meta.pk.column)
+
+
+def last_pk(model):
+    """The highest primary key, the end of the range a reset deletes."""
+    table, pk = _table(model)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MAX({pk}) FROM {table}')
+        return cursor.fetchone()[0]
+
+
+def _cascades(model):
+    """(model, column) of each foreign key that cascades from ``model``, through tables included."""
+    return [
+        (related, field.column)
+        for related in apps.get_models(include_auto_created=True)
+        for field in related._meta.local_fields
+        if field.is_relation and field.related_model is model
+        and field.remote_field.on_delete is models.CASCADE
+    ]
+
+
+def _delete_referencing(cursor, model, where, params):
+    """
+    Deletes the rows that reference the rows of ``model`` matching
+    ``where``, and the rows that reference those, as CASCADE would.
+    """
+    table, pk = _table(model)
+    for related, column in _cascades(model):
+        related_table, _ = _table(related)
+        related_where = (
+            f'{connection.ops.quote_name(column)} IN (SELECT {pk} FROM {table} WHERE {where})')
+        _delete_referencing(cursor, related, related_where, params)
+        cursor.execute(f'DELETE FROM {related_table} WHERE {related_where}', params)
+
+
+def delete_in_chunks(model, upto, chunk_size=RESET_CHUNK_SIZE, progress=None):
+    """
+    Deletes the rows of ``model`` with a primary key up to ``upto``, and
+    whatever references them, ``chunk_size`` at a time, each chunk in its
+    own transaction. Calls ``progress(rows deleted so far)`` after each
+    chunk.
+    """
+    table, pk = _table(model)
+    deleted = 0
+    while upto is not None:
+        with transaction.atomic(), connection.cursor() as cursor:
+            # The key chunk_size rows in, or None once fewer are left
+            cursor.execute(
+                f'SELECT {pk} FROM {table} WHERE {pk} <= %s ORDER BY {pk} '
+                f'LIMIT 1 OFFSET %s', [upto, chunk_size - 1])
+            row = cursor.fetchone()
+            boundary = row[0] if row else upto
+            # Usually nothing: the referencing tables went first, but rows
+            # can have been added to them since
+            _delete_referencing(cursor, model, f'{pk} <= %s', [boundary])
+            cursor.execute(f'DELETE FROM {table} WHERE {pk} <= %s', [boundary])
+            deleted += cursor.rowcount
+        if progress:
+            progress(deleted)
+        if boundary == upto:
+            break
+    return deleted
+
+
+def archive_rows(path, ranges, progress=None):
+    """
+    Writes the rows of each (model, upto) in ``ranges`` to a gzipped JSON
+    Lines file. Calls ``progress(model, rows archived so far)`` every
+    RESET_CHUNK_SIZE rows and at the end of each table.
+    """
+    progress = progress or (lambda model, archived: None)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, 'wt', encoding='utf-8') as archive:
+        for model, upto in ranges:
+            if upto is None:
+                continue
+            rows = model.objects.filter(pk__lte=upto).order_by('pk').values().iterator(
+                chunk_size=RESET_CHUNK_SIZE)
+            archived = 0
+            for row in rows:
+                archive.write(json.dumps(
+                    {'table': model._meta.db_table, 'row': row}, cls=DjangoJSONEncoder) + '\n')
+                archived += 1
+                if not archived % RESET_CHUNK_SIZE:
+                    progress(model, archived)
+            progress(model, archived)
+
+
+def reset_portal(models, archive_path=None, progress=None, chunk_size=RESET_CHUNK_SIZE):
+    """
+    Archives (if ``archive_path`` is given) and deletes the rows of
+    ``models`` that exist now, then rebuilds the counters and schedules.
+    Calls ``progress(table, deleted, total)`` as it goes, with
+    ``archived=rows`` while archiving.
+    """
+    ranges = [(model, last_pk(model)) for model in models]
+    totals = {
+        model._meta.db_table: model.objects.filter(pk__lte=upto).count() if upto else 0
+        for model, upto in ranges
+    }
+    progress = progress or (lambda table, deleted, total, archived=None: None)
+    for table, total in totals.items():
+        progress(table, 0, total)
+
+    if archive_path:
+        archive_rows(archive_path, [
+            (model, upto) for model, upto in ranges if model not in DERIVED_MODELS
+        ], lambda model, archived: progress(
+            model._meta.db_table, 0, totals[model._meta.db_table], archived=archived))
+
+    try:
+        for model, upto in ranges:
+            table = model._meta.db_table
+            delete_in_chunks(
+                model, upto, chunk_size,
+                lambda deleted: progress(table, deleted, totals[table]))
+    finally:
+        # Small now, and puts back the counts of anything added meanwhile.
+        # After a failure too, so the counters match the rows that are left.
+        rebuild_counters()
+        rebuild_schedules()
+        invalidate_on_write()
+
+
+def run_reset_job(job):
+    job.status = 'running'
+    job.save(update_fields=['status', 'updated_at'])
+
+    def progress(table, deleted, total, archived=None):
+        # Every call counts as a sign of life, see RESET_STALE_AFTER
+        entry = job.progress.setdefault(table, {})
+        entry.update(deleted=deleted, total=total)
+        if archived is not None:
+            entry['archived'] = archived
+        ResetJob.objects.filter(pk=job.pk).update(
+            progress=job.progress, updated_at=timezone.now())
+
+    try:
+        reset_portal(
+            reset_models(job.kind),
+            archive_path=settings.PORTAL_ARCHIVE_DIR / job.archive_path if job.archive_path else None,
+            progress=progress)
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+    else:
+        job.status = 'finished'
+    job.finished_at = timezone.now()
+    job.active = None
+    job.save(update_fields=['status', 'error', 'finished_at', 'active', 'updated_at'])
+    return job
+
+
+def _run_in_thread(job_id):
+    try:
+        run_reset_job(ResetJob.objects.get(pk=job_id))
+    finally:
+        connections.close_all()
+
+
+def start_reset(kind, archive=False):
+    """
+    Creates a ResetJob and runs it, in a background thread unless
+    settings.PORTAL_RESET_IN_BACKGROUND is off. Returns the running job,
+    or raises ResetInProgress when another one hasn't finished.
+    """
+    with transaction.atomic():
+        # A job that stopped reporting progress died with its process
+        ResetJob.objects.filter(
+            active=True, updated_at__lte=timezone.now() - RESET_STALE_AFTER
+        ).update(status='failed', error='Stopped reporting progress',
+                 finished_at=timezone.now(), active=None)
+        try:
+            # ResetJob.active is unique, so of two requests racing here
+            # only one creates its job
+            with transaction.atomic():
+                job = ResetJob.objects.create(kind=kind, active=True)
+        except IntegrityError:
+            active = ResetJob.objects.filter(active=True).first()
+            if active is None:
+                raise
+            raise ResetInProgress(active)
+        if archive:
+            job.archive_path = f"{kind}-reset-{job.id}-{timezone.now():%Y%m%d%H%M%S}.jsonl.gz"
+            job.save(update_fields=['archive_path'])
+
+    if not settings.PORTAL_RESET_IN_BACKGROUND:
+        return run_reset_job(job)
+    # Started after the job is committed so the thread's connection sees it
+    thread = threading.Thread(
+        target=_run_in_thread, args=(job.id,), name=f'portal-reset-{job.id}', daemon=True)
+    transaction.on_commit(thread.start)
+    return job
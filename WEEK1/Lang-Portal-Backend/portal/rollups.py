@@ -0,0 +1,221 @@
+"""
+Daily and weekly study rollups (StudyRollup) behind /api/dashboard/timeseries/.
+
+Every session, and every review made in it, counts towards the day and
+the week (from Monday) the session started in: once for its group, once
+for its activity and once in the "all" totals. So a trend over any range
+reads one row per day or week instead of scanning the reviews.
+
+Session, review and correct counts add up, and portal.counters keeps
+them exact as sessions and reviews are written. Distinct words and
+session minutes don't add up that way, so writes that can change them
+mark their rollups stale, and compact_rollups() recomputes the stale
+rows from the sessions and reviews they cover. Run it periodically with
+``manage.py compact_rollups``; rebuild_counters() recomputes every rollup.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .cache import invalidate_on_write
+from .models import Study_Sessions, StudyRollup, Word_Review
+
+PERIODS = ('day', 'week')
+# The Study_Sessions field each scope's rollups are keyed by
+SCOPE_FIELDS = {
+    'all': None,
+    'group': 'Group_id',
+    'activity': 'study_activity_id',
+}
+ROLLUP_KEY = ('period', 'start', 'scope', 'scope_id')
+ROLLUP_COUNTS = ('sessions_count', 'reviews_count', 'correct_count')
+COMPACT_BATCH = 200
+
+
+def period_start(period, day):
+    return day - timedelta(days=day.weekday()) if period == 'week' else day
+
+
+def period_length(period):
+    return timedelta(days=7 if period == 'week' else 1)
+
+
+def rollup_keys(started, group_id, activity_id):
+    """The keys of every rollup a session started at ``started`` counts towards."""
+    day = timezone.localdate(started) if started else timezone.localdate()
+    scope_ids = {'all': 0, 'group': group_id, 'activity': activity_id}
+    return [
+        (period, period_start(period, day), scope, scope_ids[scope])
+        for period in PERIODS for scope in SCOPE_FIELDS
+    ]
+
+
+def rollup_filter(keys):
+    lookup = Q()
+    for key in keys:
+        lookup |= Q(**dict(zip(ROLLUP_KEY, key)))
+    return lookup
+
+
+def mark_stale(keys):
+    keys = list(dict.fromkeys(keys))
+    for start in range(0, len(keys), COMPACT_BATCH):
+        StudyRollup.objects.filter(
+            rollup_filter(keys[start:start + COMPACT_BATCH])).update(stale=True)
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _bucket_sessions(period, scope, start, scope_id):
+    sessions = Study_Sessions.objects.filter(
+        creation_time__gte=_local_midnight(start),
+        creation_time__lt=_local_midnight(start + period_length(period)))
+    if SCOPE_FIELDS[scope]:
+        sessions = sessions.filter(**{SCOPE_FIELDS[scope]: scope_id})
+    return sessions
+
+
+def compute_rollup(period, start, scope, scope_id):
+    """The counts of one rollup, straight from its sessions and reviews."""
+    sessions = _bucket_sessions(period, scope, start, scope_id)
+    row = {'sessions_count': 0, 'session_seconds': 0}
+    for creation_time, end_time in sessions.values_list('creation_time', 'end_time'):
+        row['sessions_count'] += 1
+        if end_time:
+            row['session_seconds'] += (end_time - creation_time).total_seconds()
+    row.update(Word_Review.objects.filter(
+        study_session_id__in=sessions.values('id')
+    ).aggregate(
+        reviews_count=Count('id'),
+        correct_count=Count('id', filter=Q(correct=True)),
+        distinct_words=Count('word_id', distinct=True),
+    ))
+    return row
+
+
+def compact_rollups(batch_size=COMPACT_BATCH):
+    """Recomputes the stale rollups and returns how many there were."""
+    compacted = 0
+    while True:
+        with transaction.atomic():
+            stale = list(StudyRollup.objects.select_for_update().filter(
+                stale=True).order_by('period', 'start')[:batch_size])
+            if not stale:
+                break
+            empty = []
+            for rollup in stale:
+                for field, value in compute_rollup(
+                        rollup.period, rollup.start, rollup.scope, rollup.scope_id).items():
+                    setattr(rollup, field, value)
+                rollup.stale = False
+                if not rollup.sessions_count:
+                    empty.append(rollup.pk)
+            StudyRollup.objects.bulk_update(
+                stale, [*ROLLUP_COUNTS, 'distinct_words', 'session_seconds', 'stale'])
+            StudyRollup.objects.filter(pk__in=empty).delete()
+            compacted += len(stale)
+    if compacted:
+        invalidate_on_write()
+    return compacted
+
+
+def expected_rollups():
+    """Every rollup computed from scratch, as rows for StudyRollup(**row)."""
+    # Bucketed in Python: Trunc on SQLite is a Python function called per
+    # review, where this reads each session once and each review's
+    # (session, word) pair once
+    keys = {}
+    rows = defaultdict(lambda: {
+        'sessions_count': 0, 'reviews_count': 0, 'correct_count': 0,
+        'distinct_words': set(), 'session_seconds': 0,
+    })
+    sessions = Study_Sessions.objects.values_list(
+        'id', 'Group_id', 'study_activity_id', 'creation_time', 'end_time')
+    for pk, group_id, activity_id, creation_time, end_time in sessions.iterator(chunk_size=5000):
+        keys[pk] = rollup_keys(creation_time, group_id, activity_id)
+        seconds = (end_time - creation_time).total_seconds() if end_time else 0
+        for key in keys[pk]:
+            rows[key]['sessions_count'] += 1
+            rows[key]['session_seconds'] += seconds
+
+    reviews = Word_Review.objects.values('study_session_id').annotate(
+        reviews_count=Count('id'),
+        correct_count=Count('id', filter=Q(correct=True)),
+    ).order_by()
+    for row in reviews:
+        for key in keys[row['study_session_id']]:
+            rows[key]['reviews_count'] += row['reviews_count']
+            rows[key]['correct_count'] += row['correct_count']
+
+    pairs = Word_Review.objects.values_list('study_session_id', 'word_id').distinct().order_by()
+    for session_id, word_id in pairs.iterator(chunk_size=5000):
+        for key in keys[session_id]:
+            rows[key]['distinct_words'].add(word_id)
+
+    for counts in rows.values():
+        counts['distinct_words'] = len(counts['distinct_words'])
+    return [dict(zip(ROLLUP_KEY, key), **counts) for key, counts in rows.items()]
+
+
+def timeseries(period, scope, scope_id, first, last):
+    """
+    One point per day or week from ``first`` to ``last`` (dates, both
+    included), zeros where nothing was studied.
+    """
+    first, last = period_start(period, first), period_start(period, last)
+    rollups = {
+        rollup.start: rollup
+        for rollup in StudyRollup.objects.filter(
+            period=period, scope=scope, scope_id=scope_id, start__range=(first, last))
+    }
+    points = []
+    start = first
+    while start <= last:
+        rollup = rollups.get(start)
+        points.append(_point(start, rollup))
+        start += period_length(period)
+    return points
+
+
+def leaderboard(period, scope, first, last, limit):
+    """The groups or activities with the most reviews over the range."""
+    rows = StudyRollup.objects.filter(
+        period=period, scope=scope,
+        start__range=(period_start(period, first), period_start(period, last)),
+    ).values('scope_id').annotate(
+        sessions_count=Sum('sessions_count'),
+        reviews_count=Sum('reviews_count'),
+        correct_count=Sum('correct_count'),
+        session_seconds=Sum('session_seconds'),
+    ).order_by('-reviews_count', 'scope_id')[:limit]
+    return [{'id': row.pop('scope_id'), **_totals(row)} for row in rows]
+
+
+def _totals(row):
+    reviews = row['reviews_count']
+    return {
+        'sessions': row['sessions_count'],
+        'reviews': reviews,
+        'correct': row['correct_count'],
+        'accuracy': round(row['correct_count'] / reviews * 100, 2) if reviews else 0,
+        'session_minutes': round(row['session_seconds'] / 60, 1),
+    }
+
+
+def _point(start, rollup):
+    if rollup is None:
+        return {
+            'start': start, 'sessions': 0, 'reviews': 0, 'correct': 0,
+            'accuracy': 0, 'session_minutes': 0, 'distinct_words': 0, 'stale': False,
+        }
+    return {
+        'start': start,
+        **_totals({field: getattr(rollup, field) for field in (*ROLLUP_COUNTS, 'session_seconds')}),
+        'distinct_words': rollup.distinct_words,
+        'stale': rollup.stale,
+    }
@@ -0,0 +1,126 @@
+"""
+SM-2 spaced-repetition scheduling of words within a group.
+
+Every review moves the (word, group) WordSchedule row forward: a correct
+answer grows the interval by the word's ease, a wrong one starts it over.
+The group of a review is the group of its study session, as for the
+review counters. Reviews written through the ORM one at a time are
+scheduled by portal.signals; bulk writers call schedule_reviews().
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Study_Sessions, Word_Review, WordSchedule, Words
+
+MIN_EASE = 1.3
+MAX_INTERVAL_DAYS = 36500
+# Answers are only right or wrong, mapped onto SM-2's 0-5 quality scale
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 1
+BATCH_SIZE = 1000
+
+
+def advance(schedule, correct, reviewed_at):
+    """Applies one answer to ``schedule`` in place."""
+    quality = CORRECT_QUALITY if correct else WRONG_QUALITY
+    if correct:
+        if schedule.repetitions == 0:
+            schedule.interval_days = 1
+        elif schedule.repetitions == 1:
+            schedule.interval_days = 6
+        else:
+            schedule.interval_days = min(
+                round(schedule.interval_days * schedule.ease), MAX_INTERVAL_DAYS)
+        schedule.repetitions += 1
+    else:
+        schedule.repetitions = 0
+        schedule.interval_days = 1
+    schedule.ease = max(
+        MIN_EASE,
+        schedule.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    schedule.last_reviewed = reviewed_at
+    schedule.due = reviewed_at + timedelta(days=schedule.interval_days)
+
+
+def schedule_reviews(reviews):
+    """Advances the schedules of the words in ``reviews`` (Word_Review instances)."""
+    reviews = sorted(reviews, key=lambda review: (review.creation_time, review.id or 0))
+    if not reviews:
+        return
+    session_groups = dict(Study_Sessions.objects.filter(
+        id__in={review.study_session_id_id for review in reviews}
+    ).values_list('id', 'Group_id'))
+
+    answers = defaultdict(list)
+    for review in reviews:
+        group_id = session_groups.get(review.study_session_id_id)
+        if group_id is not None:
+            answers[(review.word_id_id, group_id)].append(review)
+
+    with transaction.atomic():
+        keys = list(answers)
+        for start in range(0, len(keys), BATCH_SIZE):
+            _advance_batch({key: answers[key] for key in keys[start:start + BATCH_SIZE]})
+
+
+def _advance_batch(answers):
+    existing = {
+        (schedule.word_id, schedule.group_id): schedule
+        for schedule in WordSchedule.objects.select_for_update().filter(
+            word_id__in={word_id for word_id, _ in answers},
+            group_id__in={group_id for _, group_id in answers})
+    }
+    new, changed = [], []
+    for (word_id, group_id), reviews in answers.items():
+        schedule = existing.get((word_id, group_id))
+        if schedule is None:
+            schedule = WordSchedule(word_id=word_id, group_id=group_id)
+            new.append(schedule)
+        else:
+            changed.append(schedule)
+        for review in reviews:
+            advance(schedule, review.correct, review.creation_time)
+
+    WordSchedule.objects.bulk_create(new)
+    WordSchedule.objects.bulk_update(
+        changed, ['repetitions', 'ease', 'interval_days', 'due', 'last_reviewed'])
+
+
+def rebuild_schedules():
+    """Replays every review, oldest first, into fresh schedules."""
+    with transaction.atomic():
+        WordSchedule.objects.all().delete()
+        # Held in memory and written once: there is one schedule per
+        # reviewed (word, group) pair, far fewer than there are reviews.
+        schedules = {}
+        reviews = Word_Review.objects.order_by('creation_time', 'id').values_list(
+            'word_id', 'study_session_id__Group_id', 'correct', 'creation_time')
+        for word_id, group_id, correct, reviewed_at in reviews.iterator(chunk_size=BATCH_SIZE * 10):
+            schedule = schedules.get((word_id, group_id))
+            if schedule is None:
+                schedule = schedules[(word_id, group_id)] = WordSchedule(
+                    word_id=word_id, group_id=group_id)
+            advance(schedule, correct, reviewed_at)
+        WordSchedule.objects.bulk_create(schedules.values(), batch_size=BATCH_SIZE)
+
+
+def next_words(group_id, count, now=None):
+    """
+    Up to ``count`` words of the group to study next: the most overdue
+    scheduled words first, then words the group hasn't reviewed yet.
+    Returns (word, schedule) pairs, with ``schedule`` None for new words.
+    """
+    now = now or timezone.now()
+    due = list(WordSchedule.objects.filter(
+        group_id=group_id, due__lte=now
+    ).select_related('word').order_by('due')[:count])
+    picked = [(schedule.word, schedule) for schedule in due]
+
+    if len(picked) < count:
+        unseen = Words.objects.filter(word_groups__id=group_id).exclude(
+            schedules__group_id=group_id).order_by('id')[:count - len(picked)]
+        picked += [(word, None) for word in unseen]
+    return picked
@@ -0,0 +1,106 @@
+"""
+Indexed, ranked word search for WordListView.
+
+On SQLite the words are mirrored into the ``portal_words_fts`` FTS5 table
+(trigram tokenizer), kept in sync by triggers created in migration 0005.
+On PostgreSQL the same migration adds pg_trgm GIN indexes. Any other
+database falls back to icontains.
+
+Terms shorter than MIN_INDEXED_LENGTH can't use either index: they match
+by prefix with istartswith, which scans the words table.
+"""
+from django.db import connections
+from django.db.models import BooleanField, F, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+SEARCH_FIELDS = ['Swahili', 'English', 'Pronounciation']
+FTS_TABLE = 'portal_words_fts'
+# bm25 column weights, in the order of SEARCH_FIELDS
+FTS_WEIGHTS = (3.0, 3.0, 1.0)
+# Trigram indexes can't serve anything shorter
+MIN_INDEXED_LENGTH = 3
+
+
+def trigrams(term):
+    term = term.lower()
+    return list(dict.fromkeys(term[i:i + 3] for i in range(len(term) - 2)))
+
+
+def fts_query(term, fuzzy=False):
+    """
+    Builds the FTS5 MATCH expression for ``term``: the term as a substring,
+    or with ``fuzzy`` any of its trigrams, so near misses still match and
+    bm25 ranks the closest ones first.
+    """
+    if fuzzy:
+        return ' OR '.join('"{}"'.format(gram.replace('"', '""')) for gram in trigrams(term))
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+class WordSearchFilter(filters.BaseFilterBackend):
+    """
+    ``?search=`` matches Swahili, English and Pronounciation by substring
+    (so prefixes too) and orders results by relevance. ``?fuzzy=1``
+    tolerates typos.
+    """
+    search_param = 'search'
+    fuzzy_param = 'fuzzy'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        fuzzy = request.query_params.get(self.fuzzy_param) in ('1', 'true')
+
+        if len(term) < MIN_INDEXED_LENGTH:
+            # Unindexed, a scan of the words. Alphabetical puts an exact match before the longer words it
+            # starts, and gives pages a stable order
+            return queryset.filter(self._prefix_lookup(term)).order_by('Swahili', 'id')
+
+        vendor = connections[queryset.db].vendor
+        if vendor == 'sqlite':
+            return self._sqlite_search(queryset, term, fuzzy)
+        if vendor == 'postgresql':
+            return self._postgres_search(queryset, term, fuzzy)
+        return queryset.filter(self._substring_lookup(term))
+
+    def _prefix_lookup(self, term):
+        lookup = Q()
+        for field in SEARCH_FIELDS:
+            lookup |= Q(**{f'{field}__istartswith': term})
+        return lookup
+
+    def _substring_lookup(self, term):
+        lookup = Q()
+        for field in SEARCH_FIELDS:
+            lookup |= Q(**{f'{field}__icontains': term})
+        return lookup
+
+    def _sqlite_search(self, queryset, term, fuzzy):
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        # Joined to the index so a single MATCH both finds the words and
+        # scores them. bm25 is lower for better matches.
+        return queryset.filter(
+            RawSQL(f'{FTS_TABLE} MATCH %s', [fts_query(term, fuzzy)],
+                   output_field=BooleanField()),
+            search_entry__isnull=False,
+        ).annotate(
+            search_rank=RawSQL(f'bm25({FTS_TABLE}, {weights})', [])
+        ).order_by('search_rank', 'id')
+
+    def _postgres_search(self, queryset, term, fuzzy):
+        from django.contrib.postgres.lookups import TrigramSimilar
+        from django.contrib.postgres.search import TrigramSimilarity
+        from django.db.models.functions import Greatest
+
+        if fuzzy:
+            # The % operator, which the GIN trigram indexes can serve
+            lookup = Q()
+            for field in SEARCH_FIELDS:
+                lookup |= Q(TrigramSimilar(F(field), Value(term)))
+        else:
+            lookup = self._substring_lookup(term)
+        return queryset.filter(lookup).annotate(search_similarity=Greatest(
+            *[TrigramSimilarity(field, term) for field in SEARCH_FIELDS])
+        ).order_by('-search_similarity', 'id')
@@ -0,0 +1,214 @@
+"""
+Synthetic study data at scale, for ``manage.py seed``.
+
+Every table is written with bulk_create in batches, inside one
+transaction, and the counters, daily rollup and schedules are rebuilt once
+at the end rather than row by row. The data is shaped like real use: a
+few popular categories, groups and activities account for most of the
+traffic, recent days are busier than old ones and some words are harder
+than others.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_on_write
+from .counters import rebuild_counters
+from .models import (
+    Study_Activities,
+    Study_Sessions,
+    Word_Review,
+    WordCategory,
+    WordGroup,
+    Words)
+from .reset import reset_models, reset_portal
+from .scheduler import rebuild_schedules
+
+DEFAULT_VOLUMES = {
+    'categories': 20,
+    'words': 5000,
+    'groups': 100,
+    'sessions': 20000,
+    'reviews': 1000000,
+}
+# Rows built in memory before each bulk_create
+CHUNK_SIZE = 50000
+HISTORY_DAYS = 365
+ACTIVITY_KINDS = 5
+# Share of words that belong to a second group
+SHARED_WORDS = 0.2
+
+SYLLABLES = ['ba', 'ha', 'ja', 'ka', 'la', 'ma', 'na', 'pa', 'sa', 'ta', 'wa',
+             'ri', 'mbo', 'nte', 'zi', 'ku', 'shi', 'ngu', 'vi', 'chu']
+
+
+def random_word(rng, syllables=3):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(syllables))
+
+
+def zipf_weights(count, exponent=1.0):
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """
+    Lets bulk_create store the creation times it is given instead of now.
+    Changes the model fields for the whole process, so only for commands.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _chunked_create(model, rows, keep=False):
+    """
+    bulk_creates ``rows`` CHUNK_SIZE at a time. Only returns the created
+    instances, which hold their ids, with ``keep``; otherwise each chunk is
+    let go once written, so memory stays bounded however many rows there are.
+    """
+    created = []
+    rows = iter(rows)
+    while batch := list(islice(rows, CHUNK_SIZE)):
+        batch = model.objects.bulk_create(batch)
+        if keep:
+            created += batch
+    return created
+
+
+def clear_portal_data():
+    """Deletes everything the seeder creates, a chunk at a time."""
+    reset_portal(reset_models('full') + [WordCategory])
+
+
+def seed_portal(volumes=None, seed=0, schedules=True, log=None):
+    """
+    Adds ``volumes`` ({table: row count}, see DEFAULT_VOLUMES) of random
+    data and returns the seconds spent on each step.
+    """
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    rng = random.Random(seed)
+    now = timezone.now()
+    timings = {}
+    log = log or (lambda message: None)
+
+    @contextmanager
+    def step(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = round(time.perf_counter() - start, 2)
+        log(f'{name}: {timings[name]}s')
+
+    with transaction.atomic(), historical_timestamps(
+            Study_Sessions, Study_Activities, Word_Review):
+        with step('vocabulary'):
+            categories = WordCategory.objects.bulk_create([
+                WordCategory(name=f'Category {i}') for i in range(volumes['categories'])
+            ])
+            words = _chunked_create(Words, (
+                Words(
+                    Swahili=random_word(rng, rng.randint(2, 4)),
+                    Pronounciation=random_word(rng, 2),
+                    English=random_word(rng, rng.randint(1, 3)))
+                for _ in range(volumes['words'])
+            ), keep=True)
+            category_weights = zipf_weights(len(categories))
+            _chunked_create(Words.categories.through, (
+                Words.categories.through(words_id=word.id, wordcategory_id=category.id)
+                for word in words
+                for category in set(rng.choices(
+                    categories, category_weights, k=1 + int(rng.expovariate(2))))
+            ) if categories else ())
+
+        with step('groups'):
+            groups = WordGroup.objects.bulk_create([
+                WordGroup(name=f'Group {i}', description=random_word(rng, 6))
+                for i in range(volumes['groups'])
+            ])
+            group_words = {group.id: [] for group in groups}
+            group_weights = zipf_weights(len(groups), 0.5)
+            for word in words if groups else ():
+                for group in set(rng.choices(
+                        groups, group_weights, k=2 if rng.random() < SHARED_WORDS else 1)):
+                    group_words[group.id].append(word.id)
+            _chunked_create(WordGroup.words.through, (
+                WordGroup.words.through(wordgroup_id=group_id, words_id=word_id)
+                for group_id, word_ids in group_words.items() for word_id in word_ids
+            ))
+
+        with step('sessions'):
+            # Only groups with words get studied, popular ones most
+            studied = [group for group in groups if group_words[group.id]]
+            studied_weights = zipf_weights(len(studied))
+            activity_weights = zipf_weights(ACTIVITY_KINDS)
+            sessions = []
+            for group in rng.choices(studied, studied_weights, k=volumes['sessions']) if studied else ():
+                started = now - timedelta(
+                    days=min(rng.expovariate(4 / HISTORY_DAYS), HISTORY_DAYS),
+                    seconds=rng.randrange(86400))
+                sessions.append(Study_Sessions(
+                    Group=group,
+                    creation_time=started,
+                    end_time=started + timedelta(minutes=rng.randint(3, 30)),
+                    study_activity_id=rng.choices(
+                        range(1, ACTIVITY_KINDS + 1), activity_weights)[0]))
+            # Oldest first, so ids follow time like they do in real use and
+            # the reviews below go into their indexes in order
+            sessions.sort(key=lambda session: session.creation_time)
+            sessions = _chunked_create(Study_Sessions, sessions, keep=True)
+            _chunked_create(Study_Activities, (
+                Study_Activities(
+                    study_session_id=session,
+                    Group_id=session.Group_id,
+                    creation_time=session.creation_time)
+                for session in sessions
+            ))
+
+        with step('reviews'):
+            # The chance of answering each word right
+            ease = {word.id: rng.betavariate(5, 2) for word in words}
+            _chunked_create(Word_Review, _random_reviews(
+                rng, sessions, volumes['reviews'], group_words, ease))
+
+    with step('counters'):
+        rebuild_counters()
+    if schedules:
+        with step('schedules'):
+            rebuild_schedules()
+    invalidate_on_write()
+    return timings
+
+
+def _random_reviews(rng, sessions, count, group_words, ease):
+    """``count`` reviews spread over ``sessions``, some much longer than others."""
+    if not sessions:
+        return
+    lengths = [rng.lognormvariate(0, 0.75) for _ in sessions]
+    scale = count / sum(lengths)
+    counts = [int(length * scale) for length in lengths]
+    for index in range(count - sum(counts)):
+        counts[index % len(counts)] += 1
+
+    for session, session_count in zip(sessions, counts):
+        words = group_words[session.Group_id]
+        duration = (session.end_time - session.creation_time).total_seconds()
+        for offset in sorted(rng.random() * duration for _ in range(session_count)):
+            word_id = rng.choice(words)
+            yield Word_Review(
+                word_id_id=word_id,
+                study_session_id_id=session.id,
+                correct=rng.random() < ease[word_id],
+                creation_time=session.creation_time + timedelta(seconds=offset))
@@ -1,12 +1,23 @@
+from django.db.models import Count, F
+
 from .models import (
+    ResetJob,
     Word_Review,
     WordGroup,
+    WordGroupReviewCounter,
+    WordReviewCounter,
     Words,
     Study_Activities,
     Study_Sessions,
     WordCategory)
 from rest_framework import serializers
 
+from .instrumentation import TimedSerializerMixin
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
 
 class WordCategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,7 +25,19 @@ class WordCategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description']
 
 
-class WordsSerializer(serializers.ModelSerializer):
+class WordsListSerializer(TimedListSerializer):
+    """
+    Loads review stats for the whole page in one grouped query so each
+    word doesn't recount its reviews.
+    """
+
+    def to_representation(self, data):
+        words = list(data.all() if hasattr(data, 'all') else data)
+        self.context['review_stats'] = Words.bulk_review_stats(words)
+        return super().to_representation(words)
+
+
+class WordsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     correct_count = serializers.SerializerMethodField()
     wrong_count = serializers.SerializerMethodField()
     categories = WordCategorySerializer(many=True, read_only=True)
@@ -31,18 +54,25 @@ class WordsSerializer(serializers.ModelSerializer):
             'Pronounciation': {'help_text': 'Provide phonetic guidance'},
             'English': {'help_text': 'English translation'}
         }
+        list_serializer_class = WordsListSerializer
+
+    def _review_stats(self, obj):
+        review_stats = self.context.setdefault('review_stats', {})
+        if obj.id not in review_stats:
+            review_stats[obj.id] = obj.review_stats
+        return review_stats[obj.id]
 
     def get_correct_count(self, obj):
-        return obj.review_stats['correct_count']
+        return self._review_stats(obj)['correct_count']
 
     def get_wrong_count(self, obj):
-        return obj.review_stats['wrong_count']
+        return self._review_stats(obj)['wrong_count']
 
     def get_groups(self, obj):
         return [{
             'id': group.id,
             'name': group.name,
-            'stats': obj.review_stats['by_group'].get(group.id, {
+            'stats': self._review_stats(obj)['by_group'].get(group.id, {
                 'correct_count': 0,
                 'wrong_count': 0
             })
@@ -75,9 +105,22 @@ class WordsSerializer(serializers.ModelSerializer):
         return value.strip()
 
 
-class WordGroupSerializer(serializers.ModelSerializer):
-    word_count = serializers.IntegerField(
-        source='total_word_count', read_only=True)
+class WordGroupListSerializer(TimedListSerializer):
+    """
+    Loads progress stats, session counts and category distributions for
+    the whole page in one go so each group doesn't count them on its own.
+    """
+
+    def to_representation(self, data):
+        groups = list(data.all() if hasattr(data, 'all') else data)
+        self.context['progress_stats'] = WordGroup.bulk_progress_stats(groups)
+        self.context['sessions_count'] = WordGroup.bulk_sessions_count(groups)
+        self.context['category_distribution'] = WordGroup.bulk_category_distribution(groups)
+        return super().to_representation(groups)
+
+
+class WordGroupSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    word_count = serializers.SerializerMethodField()
     stats = serializers.SerializerMethodField()
     categories = WordCategorySerializer(many=True, read_only=True)
 
@@ -85,22 +128,33 @@ class WordGroupSerializer(serializers.ModelSerializer):
         model = WordGroup
         fields = ['id', 'name', 'description', 'word_count', 'stats',
                   'categories', 'created_at']
+        list_serializer_class = WordGroupListSerializer
+
+    def _progress(self, obj):
+        progress_stats = self.context.setdefault('progress_stats', {})
+        if obj.id not in progress_stats:
+            progress_stats[obj.id] = obj.get_progress_stats()
+        return progress_stats[obj.id]
+
+    def get_word_count(self, obj):
+        return self._progress(obj)['total_words']
 
     def get_stats(self, obj):
+        progress = self._progress(obj)
+        sessions_count = self.context.get('sessions_count', {})
+        if obj.id not in sessions_count:
+            sessions_count = WordGroup.bulk_sessions_count([obj])
+
         base_stats = {
-            'total_word_count': obj.total_word_count,
-            'sessions_count': obj.study_sessions_count,
-            'progress': obj.get_progress_stats()
+            'total_word_count': progress['total_words'],
+            'sessions_count': sessions_count[obj.id],
+            'progress': progress
         }
 
-        # Add category distribution
-        category_counts = {}
-        for word in obj.words.all():
-            for category in word.categories.all():
-                category_counts[category.name] = category_counts.get(
-                    category.name, 0) + 1
-
-        base_stats['category_distribution'] = category_counts
+        category_distribution = self.context.get('category_distribution', {})
+        if obj.id not in category_distribution:
+            category_distribution = WordGroup.bulk_category_distribution([obj])
+        base_stats['category_distribution'] = category_distribution[obj.id]
         return base_stats
 
     def validate_name(self, value):
@@ -109,7 +163,7 @@ class WordGroupSerializer(serializers.ModelSerializer):
         return value.strip()
 
 
-class WordReviewSerializer(serializers.ModelSerializer):
+class WordReviewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     word_details = WordsSerializer(source='word_id', read_only=True)
 
     class Meta:
@@ -117,6 +171,7 @@ class WordReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'word_id', 'word_details',
                   'study_session_id', 'correct', 'creation_time']
         read_only_fields = ['creation_time']
+        list_serializer_class = TimedListSerializer
 
     def validate_correct(self, value):
         if not isinstance(value, bool):
@@ -125,7 +180,29 @@ class WordReviewSerializer(serializers.ModelSerializer):
         return value
 
 
-class SessionsSerializer(serializers.ModelSerializer):
+class WordReviewBatchItemSerializer(serializers.Serializer):
+    word_id = serializers.IntegerField()
+    correct = serializers.BooleanField()
+
+
+class WordReviewBatchSerializer(serializers.Serializer):
+    MAX_REVIEWS = 10000
+
+    reviews = WordReviewBatchItemSerializer(
+        many=True, allow_empty=False, max_length=MAX_REVIEWS)
+    finish_session = serializers.BooleanField(default=False)
+
+    def validate_reviews(self, value):
+        word_ids = {item['word_id'] for item in value}
+        missing = word_ids - set(
+            Words.objects.filter(id__in=word_ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                f"Unknown word ids: {sorted(missing)}")
+        return value
+
+
+class SessionsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     activity_name = serializers.CharField(
         source='study_activity_id', read_only=True)
     group_name = serializers.CharField(source='Group.name', read_only=True)
@@ -139,6 +216,7 @@ class SessionsSerializer(serializers.ModelSerializer):
             'end_time', 'review_items_count', 'duration'
         ]
         read_only_fields = ['creation_time', 'end_time']
+        list_serializer_class = TimedListSerializer
 
     def validate_study_activity_id(self, value):
         if value < 0:
@@ -146,8 +224,177 @@ class SessionsSerializer(serializers.ModelSerializer):
         return value
 
 
-class ActivitiesSerializer(serializers.ModelSerializer):
+class ActivitiesSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Study_Activities
         fields = ['id', 'study_session_id', 'Group', 'creation_time']
         read_only_fields = ['creation_time']
+        list_serializer_class = TimedListSerializer
+
+
+class ResetJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    percent_done = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ResetJob
+        fields = ['id', 'kind', 'status', 'percent_done', 'progress',
+                  'archive_path', 'error', 'created_at', 'finished_at']
+        list_serializer_class = TimedListSerializer
+
+    def get_percent_done(self, obj):
+        if obj.status == 'finished':
+            return 100
+        total = sum(table['total'] for table in obj.progress.values())
+        deleted = sum(table['deleted'] for table in obj.progress.values())
+        return round(deleted / total * 100, 1) if total else 0
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path for list pages: builds plain dicts from .values()
+    rows instead of model instances and ModelSerializer fields, and only
+    for the ``fields`` the client asked for.
+
+    ``columns`` maps output names to .values() lookups. Every name in
+    ``related`` is filled in for the whole page by ``load_<name>(rows)``,
+    after loading the columns listed for it in ``requires``.
+    """
+    columns = {}
+    related = ()
+    requires = {}
+
+    def __init__(self, fields=None):
+        available = list(self.columns) + list(self.related)
+        self.fields = list(dict.fromkeys(fields or available))
+        unknown = [field for field in self.fields if field not in available]
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': f"Unknown fields: {', '.join(unknown)}. "
+                          f"Choose from: {', '.join(available)}"
+            })
+
+    def values(self, queryset, ordering=()):
+        needed = {'id'}
+        for field in self.fields:
+            needed.update(self.requires.get(field, [field]))
+        # Keep the ordering fields so cursor pagination can read them
+        for field in (*queryset.query.order_by, *ordering):
+            if isinstance(field, str) and field.lstrip('-') in self.columns:
+                needed.add(field.lstrip('-'))
+        lookups = {name: F(self.columns[name])
+                   for name in needed if self.columns.get(name, name) != name}
+        return queryset.prefetch_related(None).values(
+            *[name for name in needed if name not in lookups], **lookups)
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        for field in self.related:
+            if field in self.fields:
+                getattr(self, f'load_{field}')(rows)
+        return [{field: row[field] for field in self.fields} for row in rows]
+
+
+class WordsValuesSerializer(ValuesSerializer):
+    columns = {
+        'id': 'id',
+        'Swahili': 'Swahili',
+        'Pronounciation': 'Pronounciation',
+        'English': 'English',
+    }
+    related = ('correct_count', 'wrong_count', 'categories', 'groups')
+    requires = {field: [] for field in related}
+
+    def _load_counts(self, rows):
+        counts = dict.fromkeys((row['id'] for row in rows), (0, 0))
+        counts.update({
+            word_id: (correct_count, wrong_count)
+            for word_id, correct_count, wrong_count in WordReviewCounter.objects.filter(
+                word_id__in=list(counts)).values_list('word_id', 'correct_count', 'wrong_count')
+        })
+        for row in rows:
+            row['correct_count'], row['wrong_count'] = counts[row['id']]
+
+    def load_correct_count(self, rows):
+        self._load_counts(rows)
+
+    def load_wrong_count(self, rows):
+        if rows and 'wrong_count' not in rows[0]:
+            self._load_counts(rows)
+
+    def load_categories(self, rows):
+        categories = {row['id']: [] for row in rows}
+        for link in Words.categories.through.objects.filter(
+                words_id__in=list(categories)).values(
+                'words_id', 'wordcategory_id', 'wordcategory__name',
+                'wordcategory__description').order_by('wordcategory_id'):
+            categories[link['words_id']].append({
+                'id': link['wordcategory_id'],
+                'name': link['wordcategory__name'],
+                'description': link['wordcategory__description']
+            })
+        for row in rows:
+            row['categories'] = categories[row['id']]
+
+    def load_groups(self, rows):
+        word_ids = [row['id'] for row in rows]
+        stats = {
+            (counter['word_id'], counter['group_id']): {
+                'group_name': counter['group__name'],
+                'correct_count': counter['correct_count'],
+                'wrong_count': counter['wrong_count']
+            }
+            for counter in WordGroupReviewCounter.objects.filter(
+                word_id__in=word_ids
+            ).exclude(correct_count=0, wrong_count=0).values(
+                'word_id', 'group_id', 'group__name', 'correct_count', 'wrong_count')
+        }
+        groups = {word_id: [] for word_id in word_ids}
+        for link in WordGroup.words.through.objects.filter(
+                words_id__in=word_ids).values(
+                'words_id', 'wordgroup_id', 'wordgroup__name').order_by('wordgroup_id'):
+            groups[link['words_id']].append({
+                'id': link['wordgroup_id'],
+                'name': link['wordgroup__name'],
+                'stats': stats.get((link['words_id'], link['wordgroup_id']), {
+                    'correct_count': 0,
+                    'wrong_count': 0
+                })
+            })
+        for row in rows:
+            row['groups'] = groups[row['id']]
+
+
+class SessionsValuesSerializer(ValuesSerializer):
+    columns = {
+        'id': 'id',
+        'activity_name': 'study_activity_id',
+        'group_name': 'Group__name',
+        'creation_time': 'creation_time',
+        'end_time': 'end_time',
+    }
+    related = ('review_items_count', 'duration')
+    requires = {
+        'review_items_count': [],
+        'duration': ['creation_time', 'end_time'],
+    }
+
+    def to_representation(self, rows):
+        rows = super().to_representation(rows)
+        if 'activity_name' in self.fields:
+            for row in rows:
+                row['activity_name'] = str(row['activity_name'])
+        return rows
+
+    def load_review_items_count(self, rows):
+        counts = dict(Word_Review.objects.filter(
+            study_session_id__in=[row['id'] for row in rows]
+        ).values('study_session_id').annotate(
+            count=Count('id')).values_list('study_session_id', 'count'))
+        for row in rows:
+            row['review_items_count'] = counts.get(row['id'], 0)
+
+    def load_duration(self, rows):
+        for row in rows:
+            row['duration'] = int(
+                (row['end_time'] - row['creation_time']).total_seconds()
+            ) if row['end_time'] else None
@@ -0,0 +1,96 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_on_write
+from .counters import (
+    counters_are_suspended, record_finished_sessions, record_reviews, record_sessions)
+from .db import configure_connection
+from .instrumentation import install_query_recorder
+from .models import (
+    Study_Sessions,
+    Word_Review,
+    WordCategory,
+    WordGroup,
+    Words,
+    forget_category_distributions,
+    groups_of_words)
+from .scheduler import schedule_reviews
+
+connection_created.connect(configure_connection, dispatch_uid='portal.configure_connection')
+connection_created.connect(install_query_recorder, dispatch_uid='portal.install_query_recorder')
+
+
+@receiver(post_save, sender=Word_Review)
+def count_new_review(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not counters_are_suspended():
+        record_reviews([instance])
+        schedule_reviews([instance])
+
+
+@receiver(post_delete, sender=Word_Review)
+def uncount_deleted_review(sender, instance, **kwargs):
+    if not counters_are_suspended():
+        record_reviews([instance], sign=-1)
+
+
+@receiver(post_save, sender=Study_Sessions)
+def count_new_session(sender, instance, created, raw=False, **kwargs):
+    if raw or counters_are_suspended():
+        return
+    if created:
+        record_sessions([instance])
+    elif instance.end_time:
+        record_finished_sessions([instance])
+
+
+@receiver(post_delete, sender=Study_Sessions)
+def uncount_deleted_session(sender, instance, **kwargs):
+    if not counters_are_suspended():
+        record_sessions([instance], sign=-1)
+
+
+@receiver([post_save, post_delete], sender=Word_Review)
+@receiver([post_save, post_delete], sender=Study_Sessions)
+@receiver([post_save, post_delete], sender=WordGroup)
+@receiver([post_save, post_delete], sender=Words)
+@receiver(m2m_changed, sender=WordGroup.words.through)
+def invalidate_cached_responses(sender, **kwargs):
+    invalidate_on_write()
+
+
+@receiver(m2m_changed, sender=WordGroup.words.through)
+def group_words_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        forget_category_distributions([instance.id])
+    elif action == 'pre_clear':
+        forget_category_distributions(groups_of_words([instance.id]))
+    else:
+        forget_category_distributions(pk_set)
+
+
+@receiver(m2m_changed, sender=Words.categories.through)
+def word_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        word_ids = [instance.id]
+    elif action == 'pre_clear':
+        word_ids = instance.words.values_list('id', flat=True)
+    else:
+        word_ids = pk_set
+    forget_category_distributions(groups_of_words(word_ids))
+
+
+@receiver(pre_delete, sender=Words)
+def word_deleted(sender, instance, **kwargs):
+    forget_category_distributions(groups_of_words([instance.id]))
+
+
+@receiver(post_save, sender=WordCategory)
+@receiver(pre_delete, sender=WordCategory)
+def category_changed(sender, instance, **kwargs):
+    forget_category_distributions(
+        groups_of_words(instance.words.values_list('id', flat=True)))
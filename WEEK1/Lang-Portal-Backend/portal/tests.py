@@ -1,3 +1,1167 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.test import (
+    AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .benchmarks import seed_groups
+from . import counters
+from .counters import rebuild_counters, verify_counters
+from .db import (
+    PRODUCTION_PRAGMAS,
+    REPLICA_ALIAS,
+    ReadReplicaRouter,
+    configure_connection,
+    replica_reads,
+    sqlite_pragmas)
+from .endpoint_benchmarks import run_endpoint_benchmarks
+from .instrumentation import registry
+from .reset import reset_models, reset_portal
+from .rollups import compact_rollups
+from .scheduler import rebuild_schedules
+from .seeding import clear_portal_data, seed_portal
+from .vocabulary import import_words
+from .models import (
+    DailyActivity,
+    GroupReviewSummary,
+    ResetJob,
+    StudyRollup,
+    Word_Review,
+    WordGroup,
+    WordGroupReviewCounter,
+    WordCategory,
+    WordSchedule,
+    Words,
+    Study_Activities,
+    Study_Sessions)
+
+
+def timed_queries(response):
+    """The query count InstrumentationMiddleware put in the Server-Timing header."""
+    return int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+
+class PortalAPITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='tester'))
+
+    def assertQueryBudget(self, path, budget):
+        """GETs ``path`` and fails if serving it took more than ``budget`` queries."""
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        queries = timed_queries(response)
+        self.assertLessEqual(
+            queries, budget, f'{path} ran {queries} queries, over its budget of {budget}')
+        return response
+
+
+class ProgressStatsTests(PortalAPITestCase):
+    def test_bulk_stats_match_reviews(self):
+        group = WordGroup.objects.create(name='Greetings')
+        other = WordGroup.objects.create(name='Empty')
+        jambo = Words.objects.create(
+            Swahili='jambo', Pronounciation='jahm-boh', English='hello')
+        asante = Words.objects.create(
+            Swahili='asante', Pronounciation='ah-sahn-teh', English='thanks')
+        group.words.add(jambo, asante)
+        session = Study_Sessions.objects.create(Group=group, study_activity_id=1)
+        Word_Review.objects.create(
+            word_id=jambo, study_session_id=session, correct=True)
+        Word_Review.objects.create(
+            word_id=jambo, study_session_id=session, correct=False)
+
+        stats = WordGroup.bulk_progress_stats()
+
+        self.assertEqual(stats[group.id]['total_words'], 2)
+        self.assertEqual(stats[group.id]['words_studied'], 1)
+        self.assertEqual(stats[group.id]['total_reviews'], 2)
+        self.assertEqual(stats[group.id]['correct_reviews'], 1)
+        self.assertEqual(stats[group.id]['accuracy'], 50)
+        self.assertEqual(stats[other.id]['total_reviews'], 0)
+        self.assertEqual(group.get_progress_stats(), stats[group.id])
+
+    def test_study_progress_query_count_is_constant(self):
+        seed_groups(3)
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/dashboard/study_progress/')
+        self.assertEqual(response.status_code, 200)
+
+        seed_groups(30)
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/dashboard/study_progress/')
+        self.assertEqual(len(response.data['all_groups_progress']), 33)
+
+    def test_group_list_uses_page_progress_stats(self):
+        seed_groups(2)
+        response = self.client.get('/api/groups/')
+        self.assertEqual(response.status_code, 200)
+        progress = response.data['results'][0]['stats']['progress']
+        self.assertEqual(progress['total_words'], 5)
+        self.assertEqual(progress['total_reviews'], 10)
+
+
+class WordReviewStatsTests(PortalAPITestCase):
+    def test_bulk_stats_split_by_member_group(self):
+        group, other = seed_groups(2, words_per_group=2, reviews_per_group=4)
+        word = group.words.order_by('id').first()
+        # A review of the word from a session of a group it doesn't belong to.
+        session = Study_Sessions.objects.create(Group=other, study_activity_id=1)
+        Word_Review.objects.create(
+            word_id=word, study_session_id=session, correct=True)
+
+        stats = Words.bulk_review_stats([word])[word.id]
+
+        self.assertEqual(stats['correct_count'], 2)
+        self.assertEqual(stats['wrong_count'], 1)
+        self.assertEqual(list(stats['by_group']), [group.id])
+        self.assertEqual(stats['by_group'][group.id]['correct_count'], 1)
+        self.assertEqual(word.review_stats, stats)
+
+    def test_word_list_query_count_is_constant(self):
+        seed_groups(2)
+        with self.assertNumQueries(6):
+            response = self.client.get('/api/words/')
+        self.assertEqual(response.status_code, 200)
+
+        seed_groups(40)
+        with self.assertNumQueries(6):
+            response = self.client.get('/api/words/')
+        self.assertEqual(len(response.data['results']), 100)
+        self.assertEqual(
+            response.data['results'][0]['groups'][0]['stats']['wrong_count'], 1)
+
+
+class ReviewCounterTests(PortalAPITestCase):
+    def test_counters_follow_review_writes(self):
+        group, = seed_groups(1, words_per_group=2, reviews_per_group=4)
+        word = group.words.order_by('id').first()
+        session = group.study_sessions.get()
+
+        review = Word_Review.objects.create(
+            word_id=word, study_session_id=session, correct=True)
+        self.assertEqual(verify_counters(), [])
+        review.delete()
+        self.assertEqual(verify_counters(), [])
+
+        session.delete()
+        self.assertEqual(verify_counters(), [])
+        summary = GroupReviewSummary.objects.get(group=group)
+        self.assertEqual(
+            (summary.words_studied, summary.total_reviews, summary.correct_reviews),
+            (0, 0, 0))
+
+    def test_rebuild_repairs_counters(self):
+        seed_groups(2)
+        GroupReviewSummary.objects.update(total_reviews=0)
+        self.assertEqual(len(verify_counters()), 2)
+        rebuild_counters()
+        self.assertEqual(verify_counters(), [])
+
+    def test_rows_created_concurrently_are_counted_onto(self):
+        group, = seed_groups(1, words_per_group=1, reviews_per_group=1)
+        word = group.words.get()
+        session = group.study_sessions.get()
+        locked_counts = counters._locked_counts
+
+        def miss_once(model, *args):
+            # As if another writer created the row after it was looked up
+            if model is WordGroupReviewCounter and not miss_once.missed:
+                miss_once.missed = True
+                return {}
+            return locked_counts(model, *args)
+        miss_once.missed = False
+
+        with mock.patch.object(counters, '_locked_counts', miss_once):
+            Word_Review.objects.create(word_id=word, study_session_id=session, correct=True)
+
+        self.assertTrue(miss_once.missed)
+        self.assertEqual(verify_counters(), [])
+
+    @override_settings(PORTAL_RESET_IN_BACKGROUND=False)
+    def test_reset_history_clears_counters(self):
+        seed_groups(2)
+        response = self.client.post('/api/reset_history/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(GroupReviewSummary.objects.exists())
+        self.assertEqual(verify_counters(), [])
+
+
+class ReviewBatchTests(PortalAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.group, = seed_groups(1, words_per_group=3, reviews_per_group=0)
+        self.word_ids = list(self.group.words.values_list('id', flat=True))
+        self.session = self.group.study_sessions.get()
+
+    def test_batch_creates_reviews_and_updates_counters(self):
+        response = self.client.post(
+            f'/api/study_sessions/{self.session.id}/review/batch/',
+            {'reviews': [
+                {'word_id': self.word_ids[0], 'correct': True},
+                {'word_id': self.word_ids[0], 'correct': False},
+                {'word_id': self.word_ids[1], 'correct': True},
+            ], 'finish_session': True},
+            format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['reviews_created'], 3)
+        self.assertIsNotNone(response.data['end_time'])
+        self.assertEqual(self.session.word_review_set.count(), 3)
+        self.assertEqual(verify_counters(), [])
+        self.assertEqual(
+            self.group.get_progress_stats()['words_studied'], 2)
+
+    def test_batch_rejects_unknown_words(self):
+        response = self.client.post(
+            f'/api/study_sessions/{self.session.id}/review/batch/',
+            {'reviews': [{'word_id': 0, 'correct': True}]},
+            format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Word_Review.objects.exists())
+
+    def test_batch_unknown_session(self):
+        response = self.client.post(
+            '/api/study_sessions/0/review/batch/',
+            {'reviews': [{'word_id': self.word_ids[0], 'correct': True}]},
+            format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class QuickStatsTests(PortalAPITestCase):
+    def test_quick_stats_totals(self):
+        seed_groups(3)
+        WordGroup.objects.create(name='Never studied')
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/dashboard/quick-stats/')
+
+        self.assertEqual(response.data['total_study_sessions'], 3)
+        self.assertEqual(response.data['total_active_groups'], 3)
+        self.assertEqual(response.data['success_rate'], 60.0)
+        self.assertEqual(response.data['study_streak_days'], 1)
+
+    async def test_served_by_the_async_handler(self):
+        await sync_to_async(seed_groups)(2)
+        client = AsyncClient()
+        response = await client.get('/api/dashboard/quick-stats/')
+        self.assertEqual(response.status_code, 401)
+
+        await client.aforce_login(await User.objects.aget(username='tester'))
+        response = await client.get('/api/dashboard/quick-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_study_sessions'], 2)
+
+    def test_streak_is_not_capped(self):
+        group, = seed_groups(1)
+        now = timezone.now()
+        for days_ago in range(1, 12):
+            session = Study_Sessions.objects.create(Group=group, study_activity_id=1)
+            Study_Sessions.objects.filter(id=session.id).update(
+                creation_time=now - timedelta(days=days_ago))
+        rebuild_counters()
+
+        response = self.client.get('/api/dashboard/quick-stats/')
+        self.assertEqual(response.data['study_streak_days'], 12)
+
+    def test_streak_follows_session_writes(self):
+        group, = seed_groups(1)
+        yesterday = timezone.now() - timedelta(days=1)
+        old = Study_Sessions.objects.create(Group=group, study_activity_id=1)
+        Study_Sessions.objects.filter(id=old.id).update(creation_time=yesterday)
+        rebuild_counters()
+        self.assertEqual(
+            DailyActivity.objects.get(date=timezone.localdate()).streak, 2)
+
+        group.study_sessions.exclude(id=old.id).delete()
+        self.assertEqual(verify_counters(), [])
+        response = self.client.get('/api/dashboard/quick-stats/')
+        self.assertEqual(response.data['study_streak_days'], 0)
+
+        Study_Sessions.objects.create(Group=group, study_activity_id=1)
+        self.assertEqual(verify_counters(), [])
+        response = self.client.get('/api/dashboard/quick-stats/')
+        self.assertEqual(response.data['study_streak_days'], 2)
+
+
+class ResponseCacheTests(PortalAPITestCase):
+    def test_cached_until_a_write(self):
+        group, = seed_groups(1)
+        self.client.get('/api/dashboard/quick-stats/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/dashboard/quick-stats/')
+        self.assertEqual(response.data['total_study_sessions'], 1)
+
+        Study_Sessions.objects.create(Group=group, study_activity_id=2)
+        response = self.client.get('/api/dashboard/quick-stats/')
+        self.assertEqual(response.data['total_study_sessions'], 2)
+
+        stats = self.client.get('/api/dashboard/cache-stats/').data
+        self.assertEqual(stats['quick-stats'], {
+            'hits': 1, 'misses': 2, 'hit_rate': 33.33})
+
+    def test_if_none_match_returns_304(self):
+        seed_groups(1)
+        response = self.client.get('/api/dashboard/last_study_session/')
+        etag = response['ETag']
+
+        response = self.client.get(
+            '/api/dashboard/last_study_session/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_errors_are_not_cached(self):
+        response = self.client.get('/api/dashboard/last_study_session/')
+        self.assertEqual(response.status_code, 404)
+        seed_groups(1)
+        response = self.client.get('/api/dashboard/last_study_session/')
+        self.assertEqual(response.status_code, 200)
+
+
+class CursorPaginationTests(PortalAPITestCase):
+    def test_session_cursor_walks_every_session_once(self):
+        group, = seed_groups(1)
+        for _ in range(4):
+            Study_Sessions.objects.create(Group=group, study_activity_id=1)
+
+        seen = []
+        url = '/api/study_sessions/?pagination=cursor&items_per_page=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen += [session['id'] for session in response.data['results']]
+            url = response.data['next']
+
+        expected = list(Study_Sessions.objects.order_by(
+            '-creation_time', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_group_words_cursor(self):
+        group, _ = seed_groups(2)
+        response = self.client.get(
+            f'/api/groups/{group.id}/words/?pagination=cursor&items_per_page=3')
+        ids = [word['id'] for word in response.data['results']]
+        self.assertEqual(ids, sorted(group.words.values_list('id', flat=True))[:3])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+    def test_page_numbers_stay_the_default(self):
+        seed_groups(1)
+        response = self.client.get('/api/study_sessions/')
+        self.assertEqual(response.data['count'], 1)
+
+
+class WordSearchTests(PortalAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for swahili, pronounciation, english in [
+            ('habari', 'hah-bah-ree', 'news'),
+            ('habari za asubuhi', 'hah-bah-ree zah ah-soo-boo-hee', 'good morning'),
+            ('asante', 'ah-sahn-teh', 'thank you'),
+            ('ha', 'hah', 'no'),
+        ]:
+            Words.objects.create(
+                Swahili=swahili, Pronounciation=pronounciation, English=english)
+
+    def search(self, query):
+        response = self.client.get(f'/api/words/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [word['Swahili'] for word in response.data['results']]
+
+    def test_substring_search_is_ranked(self):
+        self.assertEqual(self.search('search=habari'), ['habari', 'habari za asubuhi'])
+        self.assertEqual(self.search('search=MORN'), ['habari za asubuhi'])
+        self.assertEqual(self.search('search=sahn'), ['asante'])
+
+    def test_short_terms_match_prefixes(self):
+        self.assertEqual(self.search('search=ha'), [
+            'ha', 'habari', 'habari za asubuhi'])
+
+    def test_fuzzy_search_tolerates_typos(self):
+        self.assertEqual(self.search('search=habri'), [])
+        self.assertIn('habari', self.search('search=habri&fuzzy=1'))
+
+    def test_index_follows_word_writes(self):
+        word = Words.objects.get(Swahili='asante')
+        word.Swahili = 'asante sana'
+        word.save()
+        self.assertEqual(self.search('search=sana'), ['asante sana'])
+        word.delete()
+        self.assertEqual(self.search('search=sana'), [])
+
+
+class SparseFieldsTests(PortalAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.group, other = seed_groups(2)
+        category = WordCategory.objects.create(name='Noun')
+        for word in self.group.words.all()[:2]:
+            word.categories.add(category)
+        self.session = self.group.study_sessions.get()
+        self.session.finish_session()
+
+    def assert_matches_serializer(self, url, fields):
+        full = self.client.get(url).json()['results']
+        response = self.client.get(f"{url}?fields={','.join(fields)}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'],
+            [{field: row[field] for field in fields} for row in full])
+
+    def test_words_values_match_serializer(self):
+        fields = ['id', 'Swahili', 'Pronounciation', 'English',
+                  'correct_count', 'wrong_count', 'categories', 'groups']
+        self.assert_matches_serializer('/api/words/', fields)
+        self.assert_matches_serializer(f'/api/groups/{self.group.id}/words/', fields)
+        self.assert_matches_serializer(
+            f'/api/study_sessions/{self.session.id}/words/', fields)
+
+    def test_sessions_values_match_serializer(self):
+        fields = ['id', 'activity_name', 'group_name', 'creation_time',
+                  'end_time', 'review_items_count', 'duration']
+        self.assert_matches_serializer('/api/study_sessions/', fields)
+        self.assert_matches_serializer(
+            f'/api/groups/{self.group.id}/study_sessions/', fields)
+
+    def test_sparse_fields_cost_only_what_is_asked(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/words/?fields=id,Swahili')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'Swahili'})
+
+    def test_sparse_fields_with_cursor_and_search(self):
+        response = self.client.get(
+            '/api/words/?fields=Swahili&pagination=cursor&items_per_page=3')
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.get('/api/words/?fields=English&search=word 1')
+        self.assertEqual(response.data['results'][0], {'English': 'word 1'})
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/words/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+
+
+class CategoryDistributionTests(PortalAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.groups = seed_groups(3)
+        self.noun = WordCategory.objects.create(name='Noun')
+        self.verb = WordCategory.objects.create(name='Verb')
+        for group in self.groups:
+            words = list(group.words.order_by('id'))
+            self.noun.words.add(*words[:3])
+            self.verb.words.add(words[0])
+
+    def distribution(self, group):
+        response = self.client.get(f'/api/groups/{group.id}/')
+        return response.data['stats']['category_distribution']
+
+    def test_distribution_counts_words_per_category(self):
+        self.assertEqual(self.distribution(self.groups[0]), {'Noun': 3, 'Verb': 1})
+
+    def test_page_is_counted_in_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            distributions = WordGroup.bulk_category_distribution(self.groups)
+        self.assertEqual(distributions[self.groups[1].id], {'Noun': 3, 'Verb': 1})
+        with self.assertNumQueries(0):
+            WordGroup.bulk_category_distribution(self.groups)
+
+    def test_cache_follows_membership_and_category_changes(self):
+        group = self.groups[0]
+        self.distribution(group)
+        words = list(group.words.order_by('id'))
+
+        words[4].categories.add(self.verb)
+        self.assertEqual(self.distribution(group), {'Noun': 3, 'Verb': 2})
+        group.words.remove(words[0])
+        self.assertEqual(self.distribution(group), {'Noun': 2, 'Verb': 1})
+        self.verb.words.clear()
+        self.assertEqual(self.distribution(group), {'Noun': 2})
+        words[1].word_groups.clear()
+        self.assertEqual(self.distribution(group), {'Noun': 1})
+        self.noun.name = 'Nomino'
+        self.noun.save()
+        self.assertEqual(self.distribution(group), {'Nomino': 1})
+        words[2].delete()
+        self.assertEqual(self.distribution(group), {})
+
+
+class SchedulerTests(PortalAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.group, = seed_groups(1, words_per_group=4, reviews_per_group=0)
+        self.words = list(self.group.words.order_by('id'))
+        self.session = self.group.study_sessions.get()
+
+    def review(self, word, correct):
+        return Word_Review.objects.create(
+            word_id=word, study_session_id=self.session, correct=correct)
+
+    def test_sm2_intervals(self):
+        for correct in (True, True, True):
+            review = self.review(self.words[0], correct)
+        schedule = WordSchedule.objects.get(word=self.words[0], group=self.group)
+        self.assertEqual(
+            (schedule.repetitions, schedule.interval_days, schedule.ease), (3, 15, 2.5))
+        self.assertEqual(schedule.due, review.creation_time + timedelta(days=15))
+
+        self.review(self.words[0], False)
+        schedule.refresh_from_db()
+        self.assertEqual((schedule.repetitions, schedule.interval_days), (0, 1))
+        self.assertAlmostEqual(schedule.ease, 1.96)
+
+    def test_next_words_puts_due_before_new(self):
+        self.review(self.words[1], True)
+        self.review(self.words[2], False)
+        WordSchedule.objects.filter(word=self.words[2]).update(
+            due=timezone.now() - timedelta(hours=1))
+
+        response = self.client.get(f'/api/groups/{self.group.id}/next_words/?n=3')
+
+        self.assertEqual(response.status_code, 200)
+        words = response.data['words']
+        self.assertEqual([word['id'] for word in words],
+                         [self.words[2].id, self.words[0].id, self.words[3].id])
+        self.assertEqual([word['is_new'] for word in words], [False, True, True])
+
+    def test_batch_and_rebuild_agree(self):
+        self.client.post(
+            f'/api/study_sessions/{self.session.id}/review/batch/',
+            {'reviews': [
+                {'word_id': self.words[0].id, 'correct': True},
+                {'word_id': self.words[0].id, 'correct': True},
+                {'word_id': self.words[1].id, 'correct': False},
+            ]},
+            format='json')
+        scheduled = list(WordSchedule.objects.order_by('word_id').values_list(
+            'word_id', 'repetitions', 'interval_days', 'ease', 'due'))
+
+        rebuild_schedules()
+
+        self.assertEqual(scheduled, list(WordSchedule.objects.order_by(
+            'word_id').values_list('word_id', 'repetitions', 'interval_days', 'ease', 'due')))
+        self.assertEqual(scheduled[0][1:3], (2, 6))
+
+    def test_invalid_requests(self):
+        response = self.client.get(f'/api/groups/{self.group.id}/next_words/?n=0')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/groups/0/next_words/')
+        self.assertEqual(response.status_code, 404)
+
+
+class DatabaseProfileTests(TransactionTestCase):
+    def test_production_pragmas_applied_on_connect(self):
+        with override_settings(PORTAL_DB_PROFILE='production'):
+            configure_connection(None, connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], PRODUCTION_PRAGMAS['cache_size'])
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], PRODUCTION_PRAGMAS['busy_timeout'])
+
+    def test_read_only_replica_keeps_journal_mode(self):
+        with override_settings(PORTAL_DB_PROFILE='production'):
+            self.assertNotIn('journal_mode', sqlite_pragmas(REPLICA_ALIAS))
+        with override_settings(PORTAL_DB_PROFILE='development'):
+            self.assertEqual(sqlite_pragmas('default'), {})
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    def test_only_marked_reads_go_to_replica(self):
+        router = ReadReplicaRouter(replica_alias='default')
+        self.assertIsNone(router.db_for_read(Words))
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Words), 'default')
+        self.assertIsNone(router.db_for_read(Words))
+
+    def test_missing_replica_falls_back_to_default(self):
+        router = ReadReplicaRouter(replica_alias='unconfigured')
+        with replica_reads():
+            self.assertIsNone(router.db_for_read(Words))
+            self.assertEqual(router.db_for_write(Words), 'default')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans')
+class QueryPlanTests(PortalAPITestCase):
+    """
+    Fails when a read endpoint reaches one of the tables that grow with
+    every study session through a full table scan instead of an index.
+    """
+    HISTORY_TABLES = [
+        model._meta.db_table for model in (
+            Word_Review, Study_Sessions, Study_Activities,
+            WordGroupReviewCounter, WordSchedule)
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        groups = seed_groups(50, words_per_group=20, reviews_per_group=200)
+        cls.group_id = groups[0].id
+        cls.session_id = Study_Sessions.objects.filter(Group_id=cls.group_id).first().id
+        cls.word_id = groups[0].words.first().id
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[3] for row in cursor.fetchall()]
+        return [
+            detail for detail in details
+            if any(detail == f'SCAN {table}' for table in self.HISTORY_TABLES)
+        ]
+
+    def test_read_endpoints_use_indexes(self):
+        paths = [
+            '/api/dashboard/study_progress/',
+            '/api/dashboard/quick-stats/',
+            '/api/dashboard/last_study_session/',
+            '/api/words/',
+            '/api/words/?search=neno',
+            f'/api/words/{self.word_id}/stats/',
+            '/api/groups/',
+            f'/api/groups/{self.group_id}/words/',
+            f'/api/groups/{self.group_id}/study_sessions/',
+            f'/api/groups/{self.group_id}/study_sessions/?pagination=cursor',
+            f'/api/groups/{self.group_id}/next_words/',
+            '/api/study_activities/1/study_sessions/',
+            '/api/study_sessions/',
+            '/api/study_sessions/?fields=id,group_name',
+            f'/api/study_sessions/{self.session_id}/words/',
+        ]
+        for path in paths:
+            with self.subTest(path=path), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                for query in queries.captured_queries:
+                    if query['sql'].startswith('SELECT'):
+                        self.assertEqual(self.full_scans(query['sql']), [], query['sql'])
+
+
+class InstrumentationTests(PortalAPITestCase):
+    def test_server_timing_counts_every_query(self):
+        group, = seed_groups(1)
+        for path in [f'/api/groups/{group.id}/words/', '/api/dashboard/study_progress/']:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(path)
+            self.assertEqual(timed_queries(response), len(queries), path)
+            self.assertIn('render;dur=', response['Server-Timing'])
+            self.assertIn('serialize;dur=', response['Server-Timing'])
+            self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_metrics_histograms_per_url_name(self):
+        registry.reset()
+        seed_groups(1)
+        self.client.get('/api/dashboard/quick-stats/')
+        self.client.get('/api/dashboard/quick-stats/')
+
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        metrics = response.content.decode()
+        self.assertIn('portal_responses_total{view="quick-stats",code="200"} 2', metrics)
+        self.assertIn('portal_request_queries_bucket{view="quick-stats",le="+Inf"} 2', metrics)
+        # The first request counted the stats, the second was cached
+        self.assertIn('portal_request_queries_sum{view="quick-stats"} 3', metrics)
+        self.assertIn('# TYPE portal_request_duration_seconds histogram', metrics)
+        self.assertIn('portal_request_serialize_seconds_count{view="quick-stats"} 2', metrics)
+
+    def test_serialization_is_timed(self):
+        seed_groups(3)
+        response = self.client.get('/api/groups/')
+        serialize = float(re.search(r'serialize;dur=([\d.]+)', response['Server-Timing']).group(1))
+        self.assertGreater(serialize, 0)
+
+    def test_scrapers_need_no_account(self):
+        scraper = APIClient()
+        # Nothing is allowed in until a token or addresses are configured
+        self.assertEqual(scraper.get('/api/metrics/').status_code, 401)
+        with self.settings(PORTAL_METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(scraper.get('/api/metrics/').status_code, 200)
+        with self.settings(PORTAL_METRICS_TOKEN='s3cret'):
+            self.assertEqual(scraper.get('/api/metrics/').status_code, 401)
+            response = scraper.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, 401)
+            response = scraper.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer s3cret')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('portal_responses_total', response.content.decode())
+
+
+class QueryBudgetTests(PortalAPITestCase):
+    """
+    Query budgets per endpoint, checked against enough rows that an N+1
+    query blows through them.
+    """
+    QUERY_BUDGETS = {
+        'study-progress': 5,
+        'quick-stats': 3,
+        'last-session': 1,
+        'cache-stats': 0,
+        'word-list': 6,
+        'word-detail': 6,
+        'word-stats': 2,
+        'group-list': 6,
+        'group-detail': 4,
+        'group-words': 6,
+        'group-sessions': 4,
+        'group-next-words': 3,
+        'session-detail': 3,
+        'session-words': 6,
+        'session-list': 2,
+        'activity-sessions': 2,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        groups = seed_groups(30, words_per_group=10, reviews_per_group=20)
+        cls.ids = {
+            'id': groups[0].id,
+            'word_id': groups[0].words.first().id,
+            'session_id': Study_Sessions.objects.filter(Group=groups[0]).first().id,
+        }
+
+    def path(self, url_name):
+        kwargs = {
+            'word-detail': {'id': self.ids['word_id']},
+            'word-stats': {'word_id': self.ids['word_id']},
+            'session-detail': {'id': self.ids['session_id']},
+            'session-words': {'id': self.ids['session_id']},
+            'activity-sessions': {'id': 1},
+        }.get(url_name)
+        if kwargs is None and url_name.startswith('group-') and url_name != 'group-list':
+            kwargs = {'id': self.ids['id']}
+        return reverse(url_name, kwargs=kwargs)
+
+    def test_endpoints_stay_within_budget(self):
+        for url_name, budget in self.QUERY_BUDGETS.items():
+            with self.subTest(url_name=url_name):
+                self.assertQueryBudget(self.path(url_name), budget)
+
+    def test_session_pages_dont_query_per_session(self):
+        session = Study_Sessions.objects.get(pk=self.ids['session_id'])
+        session.finish_session()
+        for page in (1, 2, 3):
+            with self.subTest(page=page):
+                response = self.assertQueryBudget(
+                    f'/api/study_sessions/?items_per_page=12&page={page}', 2)
+                self.assertEqual(len(response.data['results']), 12 if page < 3 else 6)
+
+        rows = {row['id']: row for row in self.client.get(
+            '/api/study_sessions/?items_per_page=30').data['results']}
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[session.id]['review_items_count'], 20)
+        self.assertEqual(rows[session.id]['duration'], int(session.duration))
+        self.assertEqual(rows[session.id]['group_name'], session.Group.name)
+
+
+class SeedingTests(PortalAPITestCase):
+    VOLUMES = {'categories': 3, 'words': 60, 'groups': 4, 'sessions': 25, 'reviews': 500}
+
+    def test_seed_fills_tables_and_counters(self):
+        seed_portal(self.VOLUMES, seed=1)
+
+        self.assertEqual(Words.objects.count(), 60)
+        self.assertEqual(Study_Sessions.objects.count(), 25)
+        self.assertEqual(Study_Activities.objects.count(), 25)
+        self.assertEqual(Word_Review.objects.count(), 500)
+        # Reviews only use words of their session's group
+        self.assertFalse(Word_Review.objects.exclude(
+            word_id__word_groups=F('study_session_id__Group')).exists())
+        self.assertEqual(verify_counters(), [])
+        self.assertTrue(WordSchedule.objects.exists())
+
+    def test_seed_is_repeatable(self):
+        def reviews():
+            return list(Word_Review.objects.order_by('id').values_list(
+                'word_id__Swahili', 'correct', 'creation_time'))
+
+        seed_portal(self.VOLUMES, seed=2, schedules=False)
+        first = reviews()
+        clear_portal_data()
+        seed_portal(self.VOLUMES, seed=2, schedules=False)
+        self.assertEqual(
+            [review[:2] for review in first], [review[:2] for review in reviews()])
+
+    def test_endpoint_report_covers_get_endpoints(self):
+        seed_portal(self.VOLUMES, seed=3)
+
+        report = run_endpoint_benchmarks(repeat=1)
+
+        self.assertEqual(report['rows']['Word_Review'], 500)
+        names = {result['name'] for result in report['endpoints'].values()}
+        self.assertIn('group-words', names)
+        self.assertNotIn('full-reset', names)
+        self.assertEqual(
+            {path: result['status'] for path, result in report['endpoints'].items()
+             if result['status'] != 200}, {})
+
+
+class BenchmarkTests(TestCase):
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_session_pages_at_default_sizes(self):
+        out = io.StringIO()
+        call_command('benchmark', 'session_pages', '--json', stdout=out)
+
+        rows = json.loads(out.getvalue())
+        self.assertEqual([row['sessions'] for row in rows], [10, 100, 1000])
+        self.assertTrue(all(row['cursor_queries'] for row in rows))
+
+
+class VocabularyTransferTests(PortalAPITestCase):
+    CSV = (
+        'Swahili,Pronounciation,English,categories,groups\n'
+        'jambo,jahm-boh,hello,Greetings,Basics|Travel\n'
+        'asante,ah-sahn-teh,thank you,Greetings,Basics\n'
+        'jambo,jahm-boh,hello,Phrases,\n'
+        ',x,blank,,\n'
+    )
+
+    def upload(self, name, content):
+        return self.client.post(
+            '/api/words/import/',
+            {'file': SimpleUploadedFile(name, content.encode())},
+            format='multipart')
+
+    def test_import_dedupes_and_links(self):
+        response = self.upload('words.csv', self.CSV)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.data[key] for key in ('rows', 'created', 'duplicates', 'error_count')},
+            {'rows': 4, 'created': 2, 'duplicates': 1, 'error_count': 1})
+        self.assertEqual(response.data['errors'][0]['line'], 5)
+        jambo = Words.objects.get(Swahili='jambo')
+        self.assertEqual(
+            sorted(jambo.categories.values_list('name', flat=True)), ['Greetings', 'Phrases'])
+        self.assertEqual(
+            sorted(jambo.word_groups.values_list('name', flat=True)), ['Basics', 'Travel'])
+
+        # Importing again adds nothing new
+        response = self.upload('words.csv', self.CSV)
+        self.assertEqual((response.data['created'], response.data['existing']), (0, 2))
+        self.assertEqual(Words.objects.count(), 2)
+        self.assertEqual(WordGroup.objects.filter(name='Basics').count(), 1)
+        self.assertEqual(jambo.categories.count(), 2)
+
+    def test_import_in_chunks(self):
+        rows = [
+            {'Swahili': f'neno {i}', 'Pronounciation': 'neh-no', 'English': f'word {i}',
+             'groups': ['Numbers']}
+            for i in range(25)
+        ]
+        stream = io.StringIO(''.join(json.dumps(row) + '\n' for row in rows) + 'not json\n')
+
+        with CaptureQueriesContext(connection) as queries:
+            summary = import_words(stream, 'jsonl', chunk_size=10)
+
+        self.assertEqual((summary['created'], summary['error_count']), (25, 1))
+        self.assertEqual(WordGroup.objects.get(name='Numbers').words.count(), 25)
+        # The same handful of queries per chunk, not per row
+        self.assertLess(len(queries), 40)
+
+    def test_export_round_trip(self):
+        self.upload('words.csv', self.CSV)
+
+        response = self.client.get('/api/words/export/?export_format=jsonl')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['Swahili'] for row in rows], ['jambo', 'asante'])
+        self.assertEqual(rows[0]['groups'], ['Basics', 'Travel'])
+
+        response = self.client.get('/api/words/export/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,Swahili,Pronounciation,English,categories,groups')
+        self.assertTrue(lines[1].endswith(',jambo,jahm-boh,hello,Greetings|Phrases,Basics|Travel'))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.post('/api/words/import/', {}, format='multipart').status_code, 400)
+        self.assertEqual(self.upload('words.txt', self.CSV).status_code, 400)
+        self.assertEqual(self.client.get('/api/words/export/?export_format=xml').status_code, 400)
+
+
+@override_settings(PORTAL_RESET_IN_BACKGROUND=False)
+class ResetTests(PortalAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.groups = seed_groups(3, words_per_group=4, reviews_per_group=7)
+        Words.objects.first().categories.add(WordCategory.objects.create(name='Nouns'))
+
+    def test_chunked_full_reset(self):
+        progress = []
+        reset_portal(
+            reset_models('full'), chunk_size=5,
+            progress=lambda table, deleted, total: progress.append((table, deleted, total)))
+
+        for model in reset_models('full'):
+            self.assertFalse(model.objects.exists(), model)
+        self.assertTrue(WordCategory.objects.exists())
+        self.assertEqual(verify_counters(), [])
+        reviews = [row for row in progress if row[0] == Word_Review._meta.db_table]
+        self.assertEqual(reviews, [
+            ('portal_word_review', 0, 21), ('portal_word_review', 5, 21),
+            ('portal_word_review', 10, 21), ('portal_word_review', 15, 21),
+            ('portal_word_review', 20, 21), ('portal_word_review', 21, 21)])
+
+    def test_rows_added_to_deleted_parents_go_with_them(self):
+        session = Study_Sessions.objects.first()
+        word = Words.objects.first()
+
+        def add_review(table, deleted, total):
+            # A review for an old session, recorded once the reviews are gone
+            if table == Word_Review._meta.db_table and deleted == total:
+                Word_Review.objects.create(
+                    word_id=word, study_session_id=session, correct=True)
+
+        reset_portal(reset_models('history'), chunk_size=5, progress=add_review)
+
+        self.assertFalse(Word_Review.objects.exists())
+        self.assertFalse(Study_Sessions.objects.exists())
+        self.assertEqual(verify_counters(), [])
+
+    def test_failed_reset_leaves_counters_consistent(self):
+        def fail(table, deleted, total):
+            if table == Word_Review._meta.db_table and deleted:
+                raise RuntimeError('disk full')
+
+        with self.assertRaises(RuntimeError):
+            reset_portal(reset_models('history'), chunk_size=5, progress=fail)
+
+        # One chunk of reviews went before the failure
+        self.assertEqual(Word_Review.objects.count(), 16)
+        self.assertEqual(verify_counters(), [])
+
+    def test_history_reset_with_archive(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                PORTAL_ARCHIVE_DIR=Path(directory)):
+            response = self.client.post('/api/reset_history/', {'archive': True}, format='json')
+
+            self.assertEqual(response.status_code, 200)
+            job = response.data['job']
+            self.assertEqual((job['status'], job['percent_done']), ('finished', 100))
+            with gzip.open(Path(directory) / job['archive_path'], 'rt') as archive:
+                tables = Counter(json.loads(line)['table'] for line in archive)
+        self.assertEqual(tables, {
+            'portal_word_review': 21, 'portal_study_sessions': 3})
+        self.assertFalse(Word_Review.objects.exists())
+        self.assertEqual(Words.objects.count(), 12)
+        self.assertFalse(WordSchedule.objects.exists())
+
+        response = self.client.get(response.data['progress_url'])
+        self.assertEqual(response.data['progress']['portal_word_review'],
+                         {'deleted': 21, 'total': 21, 'archived': 21})
+
+    def test_one_reset_at_a_time(self):
+        running = ResetJob.objects.create(kind='full', status='running', active=True)
+
+        response = self.client.post('/api/full_reset/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['job']['id'], running.id)
+
+        # Until it stops reporting progress
+        ResetJob.objects.filter(pk=running.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1))
+        response = self.client.post('/api/full_reset/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(WordGroup.objects.exists())
+        running.refresh_from_db()
+        self.assertEqual((running.status, running.active), ('failed', None))
+
+    def test_database_allows_one_active_job(self):
+        ResetJob.objects.create(kind='full', active=True)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ResetJob.objects.create(kind='history', active=True)
+
+
+class BackgroundResetTests(TransactionTestCase):
+    def test_reset_runs_in_background(self):
+        seed_groups(2)
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='tester'))
+
+        response = client.post('/api/reset_history/')
+
+        self.assertEqual(response.status_code, 202)
+        for _ in range(100):
+            job = client.get(response.data['progress_url']).data
+            if job['status'] not in ('pending', 'running'):
+                break
+            time.sleep(0.05)
+        self.assertEqual(job['status'], 'finished')
+        self.assertFalse(Word_Review.objects.exists())
+
+
+class RollupTests(PortalAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.groups = seed_groups(2, words_per_group=3, reviews_per_group=6)
+        self.today = timezone.localdate()
+
+    def rollup(self, period='day', scope='all', scope_id=0):
+        start = self.today - timedelta(days=self.today.weekday() if period == 'week' else 0)
+        return StudyRollup.objects.get(
+            period=period, start=start, scope=scope, scope_id=scope_id)
+
+    def test_counts_follow_writes(self):
+        rollup = self.rollup()
+        self.assertEqual(
+            (rollup.sessions_count, rollup.reviews_count, rollup.correct_count), (2, 12, 8))
+        self.assertEqual(StudyRollup.objects.filter(period='week', scope='group').count(), 2)
+
+        session = self.groups[0].study_sessions.get()
+        word = self.groups[0].words.first()
+        Word_Review.objects.create(word_id=word, study_session_id=session, correct=True)
+        self.assertEqual(self.rollup('week', 'group', self.groups[0].id).reviews_count, 7)
+        self.assertTrue(self.rollup().stale)
+        self.assertEqual(verify_counters(), [])
+
+        session.delete()
+        self.assertEqual(self.rollup().sessions_count, 1)
+        self.assertEqual(verify_counters(), [])
+
+    def test_compaction_recomputes_stale_rollups(self):
+        session = self.groups[0].study_sessions.get()
+        session.end_time = session.creation_time + timedelta(minutes=12)
+        session.save()
+        self.assertTrue(self.rollup('week', 'activity', 1).stale)
+
+        self.assertEqual(compact_rollups(), StudyRollup.objects.count())
+        self.assertFalse(StudyRollup.objects.filter(stale=True).exists())
+        rollup = self.rollup()
+        self.assertEqual((rollup.distinct_words, rollup.session_seconds), (6, 720))
+        self.assertEqual(compact_rollups(), 0)
+
+    def test_timeseries_fills_gaps(self):
+        compact_rollups()
+        start = self.today - timedelta(days=2)
+        response = self.client.get(
+            f'/api/dashboard/timeseries/?start={start}&end={self.today}')
+
+        self.assertEqual(response.status_code, 200)
+        points = response.data['points']
+        self.assertEqual([point['start'] for point in points], [
+            start, start + timedelta(days=1), self.today])
+        self.assertEqual(points[0]['reviews'], 0)
+        self.assertEqual(
+            {key: points[-1][key] for key in ('sessions', 'reviews', 'correct', 'distinct_words')},
+            {'sessions': 2, 'reviews': 12, 'correct': 8, 'distinct_words': 6})
+
+        response = self.client.get(
+            f'/api/dashboard/timeseries/?period=week&scope=group&id={self.groups[1].id}')
+        self.assertEqual(len(response.data['points']), 12)
+        self.assertEqual(response.data['points'][-1]['reviews'], 6)
+
+    def test_leaderboard(self):
+        session = self.groups[1].study_sessions.get()
+        Word_Review.objects.create(
+            word_id=self.groups[1].words.first(), study_session_id=session, correct=False)
+
+        response = self.client.get('/api/dashboard/timeseries/?scope=group&limit=1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['leaderboard'], [{
+            'id': self.groups[1].id, 'sessions': 1, 'reviews': 7, 'correct': 4,
+            'accuracy': 57.14, 'session_minutes': 0.0,
+        }])
+
+    def test_bad_parameters(self):
+        for query in ['period=month', 'scope=word', 'start=yesterday',
+                      'start=2020-01-01', 'scope=group&limit=0']:
+            response = self.client.get(f'/api/dashboard/timeseries/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn('error', response.data)
+
+
+class UpgradeBackfillTests(TransactionTestCase):
+    """Upgrades a database with history from before the derived tables existed."""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate(target)
+        executor.loader.build_graph()
+        return executor.loader.project_state(target).apps
+
+    def setUp(self):
+        self.latest = MigrationExecutor(connection).loader.graph.leaf_nodes('portal')
+        self.addCleanup(self.migrate, self.latest)
+        apps = self.migrate([('portal', '0001_initial')])
+        WordGroup = apps.get_model('portal', 'WordGroup')
+        Words = apps.get_model('portal', 'Words')
+        Study_Sessions = apps.get_model('portal', 'Study_Sessions')
+        Word_Review = apps.get_model('portal', 'Word_Review')
+
+        self.group = WordGroup.objects.create(name='Group')
+        words = [
+            Words.objects.create(Swahili=f'neno {i}', Pronounciation='neh-no', English=f'word {i}')
+            for i in range(3)]
+        self.group.words.set(words)
+        started = timezone.now() - timedelta(days=3)
+        for day in range(3):
+            session = Study_Sessions.objects.create(Group=self.group, study_activity_id=1)
+            for i, word in enumerate(words):
+                Word_Review.objects.create(
+                    word_id=word, study_session_id=session, correct=i != day)
+            Study_Sessions.objects.filter(id=session.id).update(
+                creation_time=started + timedelta(days=day))
+            Word_Review.objects.filter(study_session_id=session).update(
+                creation_time=started + timedelta(days=day))
+
+        self.migrate(self.latest)
+
+    def test_counters_are_backfilled(self):
+        summary = GroupReviewSummary.objects.get(group_id=self.group.id)
+        self.assertEqual(
+            (summary.words_studied, summary.total_reviews, summary.correct_reviews),
+            (3, 9, 6))
+        self.assertEqual(WordGroupReviewCounter.objects.count(), 3)
+        self.assertEqual(verify_counters(), [])
+
+    def test_daily_activity_is_backfilled(self):
+        self.assertEqual(
+            list(DailyActivity.objects.order_by('date').values_list(
+                'sessions_count', 'reviews_count', 'correct_reviews', 'streak')),
+            [(1, 3, 2, 1), (1, 3, 2, 2), (1, 3, 2, 3)])
+
+    def test_rollups_are_backfilled(self):
+        self.assertEqual(
+            StudyRollup.objects.filter(period='day', scope='group', scope_id=self.group.id).count(), 3)
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='tester'))
+        response = client.get('/api/dashboard/timeseries/?scope=group&period=week')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['leaderboard'][0]['reviews'], 9)
+
+    def test_schedules_are_backfilled(self):
+        backfilled = set(WordSchedule.objects.values_list(
+            'word_id', 'repetitions', 'interval_days', 'due'))
+        rebuild_schedules()
+        self.assertEqual(len(backfilled), 3)
+        self.assertEqual(backfilled, set(WordSchedule.objects.values_list(
+            'word_id', 'repetitions', 'interval_days', 'due')))
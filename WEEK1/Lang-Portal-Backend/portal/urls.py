@@ -16,11 +16,28 @@ urlpatterns = [
      path('dashboard/quick-stats/',
           views.DashboardQuickStatsView.as_view(),
           name='quick-stats'),
+     path('dashboard/timeseries/',
+          views.DashboardTimeseriesView.as_view(),
+          name='timeseries'),
+     path('dashboard/cache-stats/',
+          views.DashboardCacheStatsView.as_view(),
+          name='cache-stats'),
+
+     # Instrumentation
+     path('metrics/',
+          views.MetricsView.as_view(),
+          name='metrics'),
 
      # Word endpoints
      path('words/',
           views.WordListView.as_view(),
           name='word-list'),
+     path('words/import/',
+          views.WordImportView.as_view(),
+          name='word-import'),
+     path('words/export/',
+          views.WordExportView.as_view(),
+          name='word-export'),
      path('words/<int:id>/',
           views.WordDetailView.as_view(),
           name='word-detail'),
@@ -41,6 +58,9 @@ urlpatterns = [
      path('groups/<int:id>/study_sessions/',
           views.GroupStudySessionsView.as_view(),
           name='group-sessions'),
+     path('groups/<int:id>/next_words/',
+          views.GroupNextWordsView.as_view(),
+          name='group-next-words'),
 
      # Study activities endpoints
      path('study_activities/',
@@ -63,6 +83,9 @@ urlpatterns = [
      path('study_sessions/<int:id>/words/',
           views.SessionWordsView.as_view(),
           name='session-words'),
+     path('study_sessions/<int:id>/review/batch/',
+          views.SessionReviewBatchView.as_view(),
+          name='session-review-batch'),
 
      # System reset endpoints
      path('reset_history/',
@@ -71,4 +94,7 @@ urlpatterns = [
      path('full_reset/',
           views.FullResetView.as_view(),
           name='full-reset'),
+     path('reset_jobs/<int:id>/',
+          views.ResetJobView.as_view(),
+          name='reset-job'),
 ]
@@ -1,28 +1,56 @@
+import asyncio
+import inspect
+import io
+from contextlib import nullcontext
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.parsers import MultiPartParser
 from rest_framework.decorators import api_view
-from rest_framework import generics, filters
-from django.db.models import Count
+from rest_framework.reverse import reverse
+from rest_framework import generics, serializers
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 
+from .cache import cache_stats, cached_response, invalidate_on_write
+from .counters import record_reviews
+from .db import replica_reads
+from .instrumentation import CanScrapeMetrics, registry, timed_serialization
 from .models import (
+    DailyActivity,
+    ResetJob,
     Word_Review,
     WordGroup,
+    WordReviewCounter,
     Words,
     Study_Activities,
     Study_Sessions)
+from .reset import ResetInProgress, start_reset
+from .rollups import PERIODS, SCOPE_FIELDS, leaderboard, period_length, timeseries
+from .scheduler import next_words, schedule_reviews
+from .search import WordSearchFilter
 from .serializers import (
+    ResetJobSerializer,
     WordGroupSerializer,
+    WordReviewBatchSerializer,
     WordReviewSerializer,
     WordsSerializer,
+    WordsValuesSerializer,
     SessionsSerializer,
+    SessionsValuesSerializer,
     ActivitiesSerializer
 )
+from .vocabulary import FORMATS, export_words, format_for, import_words
 
 # Create your views here.
 
@@ -33,22 +61,149 @@ class ResultsSetPagination(PageNumberPagination):
     max_page_size = 500
 
 
-class StudyProgressView(APIView):
-    def get(self, request):
+class SessionCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (creation_time, id) session indexes, newest
+    first. Deep pages cost the same as the first and skip the COUNT(*).
+    """
+    page_size = 100
+    page_size_query_param = 'items_per_page'
+    max_page_size = 500
+    ordering = ('-creation_time', '-id')
+
+
+class WordCursorPagination(CursorPagination):
+    """
+    Keyset pagination over word ids
+    """
+    page_size = 100
+    page_size_query_param = 'items_per_page'
+    max_page_size = 500
+    ordering = 'id'
+
+
+class CursorPaginationMixin:
+    """
+    Lets a list view switch to ``cursor_pagination_class`` when the client
+    asks for ``?pagination=cursor`` or follows a cursor link.
+    """
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if self.cursor_pagination_class and (
+                    'cursor' in params or params.get('pagination') == 'cursor'):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+
+class SparseFieldsMixin:
+    """
+    Serves list pages through ``values_serializer_class`` when the client
+    names the columns it wants with ``?fields=a,b``, skipping model
+    instances and ModelSerializer fields entirely.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        fields = request.query_params.get('fields')
+        if not fields or self.values_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            serializer = self.values_serializer_class(
+                [field.strip() for field in fields.split(',') if field.strip()])
+        except serializers.ValidationError as e:
+            return Response({
+                "error": e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        ordering = getattr(self.paginator, 'ordering', ())
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        queryset = serializer.values(
+            self.filter_queryset(self.get_queryset()), ordering)
+        page = self.paginate_queryset(queryset)
+        with timed_serialization():
+            data = serializer.to_representation(queryset if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutine functions, so that under ASGI the
+    request doesn't tie up a worker thread while it waits on the database.
+
+    Authentication, permissions and throttling are synchronous in DRF (and
+    may query the database), so they run in a worker thread first.
+
+    With ``read_from_replica`` the view's reads go to the read-only replica
+    connection when one is configured (see portal.db).
+    """
+    read_from_replica = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            with replica_reads() if self.read_from_replica else nullcontext():
+                await sync_to_async(self.initial)(request, *args, **kwargs)
+                if request.method.lower() in self.http_method_names:
+                    handler = getattr(self, request.method.lower(),
+                                      self.http_method_not_allowed)
+                else:
+                    handler = self.http_method_not_allowed
+                response = handler(request, *args, **kwargs)
+                if inspect.isawaitable(response):
+                    response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+class StudyProgressView(AsyncAPIView):
+    read_from_replica = True
+
+    @cached_response('study-progress')
+    async def get(self, request):
         group_id = request.query_params.get('group_id')
         try:
             if group_id:
-                current_group = WordGroup.objects.get(id=group_id)
+                current_group = WordGroup.objects.aget(id=group_id)
             else:
-                current_group = WordGroup.objects.earliest('id')
-
-            current_group_stats = current_group.get_progress_stats()
-
-            all_groups = WordGroup.objects.all()
+                current_group = WordGroup.objects.aearliest('id')
+
+            # Independent reads, awaited together
+            (current_group, all_groups, progress_stats, total_available_words,
+             total_words_studied) = await asyncio.gather(
+                current_group,
+                _alist(WordGroup.objects.all()),
+                WordGroup.abulk_progress_stats(),
+                Words.objects.acount(),
+                WordReviewCounter.objects.exclude(
+                    correct_count=0, wrong_count=0).acount(),
+            )
+            current_group_stats = progress_stats[current_group.id]
             groups_progress = []
 
             for group in all_groups:
-                stats = group.get_progress_stats()
+                stats = progress_stats[group.id]
                 groups_progress.append({
                     'group_id': group.id,
                     'group_name': group.name,
@@ -57,9 +212,6 @@ class StudyProgressView(APIView):
                     'progress_percentage': round(stats['progress_percentage'], 2),
                     'accuracy': round(stats['accuracy'], 2)
                 })
-            total_available_words = Words.objects.count()
-            total_words_studied = Word_Review.objects.values(
-                'word_id').distinct().count()
 
             data = {
                 "current_group": {
@@ -92,15 +244,17 @@ class StudyProgressView(APIView):
             )
 
 
-class DashboardLastSessionView(APIView):
+class DashboardLastSessionView(AsyncAPIView):
     """
     Returns information about the most recent study session
     """
+    read_from_replica = True
 
-    def get(self, request):
+    @cached_response('last-session')
+    async def get(self, request):
         try:
-            last_session = Study_Sessions.objects.select_related(
-                'Group').latest('creation_time')
+            last_session = await Study_Sessions.objects.select_related(
+                'Group').alatest('creation_time')
 
             return Response({
                 "id": last_session.id,
@@ -115,51 +269,127 @@ class DashboardLastSessionView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
-class DashboardQuickStatsView(APIView):
-    def get(self, request):
-        # Get total reviews and correct reviews
-        total_reviews = Word_Review.objects.count()
-        correct_reviews = Word_Review.objects.filter(correct=True).count()
-        success_rate = (correct_reviews / total_reviews *
+class DashboardQuickStatsView(AsyncAPIView):
+    """
+    Returns overall success rate, session and group totals and the current
+    study streak, served from the DailyActivity rollup
+    """
+    read_from_replica = True
+
+    @cached_response('quick-stats')
+    async def get(self, request):
+        totals, active_groups, streak_days = await asyncio.gather(
+            DailyActivity.objects.aaggregate(
+                total_reviews=Coalesce(Sum('reviews_count'), 0),
+                correct_reviews=Coalesce(Sum('correct_reviews'), 0),
+                total_sessions=Coalesce(Sum('sessions_count'), 0),
+            ),
+            Study_Sessions.objects.values('Group').distinct().acount(),
+            # The rollup carries the streak ending on each day, so any
+            # streak length is a single lookup.
+            DailyActivity.objects.filter(
+                date=timezone.localdate(), sessions_count__gt=0
+            ).values_list('streak', flat=True).afirst(),
+        )
+        total_reviews = totals['total_reviews']
+        success_rate = (totals['correct_reviews'] / total_reviews *
                         100) if total_reviews > 0 else 0
-        total_sessions = Study_Sessions.objects.count()
-        active_groups = WordGroup.objects.filter(
-            student_study_groups__isnull=False
-        ).distinct().count()
-        today = timezone.now().date()
-        sessions_by_date = Study_Sessions.objects.values(
-            'creation_time__date').distinct()
-        streak_days = 0
-
-        for i in range(7):
-            check_date = today - timezone.timedelta(days=i)
-            if not sessions_by_date.filter(creation_time__date=check_date).exists():
-                break
-            streak_days += 1
 
         return Response({
             "success_rate": round(success_rate, 1),
-            "total_study_sessions": total_sessions,
+            "total_study_sessions": totals['total_sessions'],
             "total_active_groups": active_groups,
-            "study_streak_days": streak_days
+            "study_streak_days": streak_days or 0
         })
 
 
+class DashboardTimeseriesView(AsyncAPIView):
+    """
+    Sessions, reviews, accuracy, distinct words and minutes studied per day
+    or week, for everything, one group or one activity, served from the
+    StudyRollup tables. Without an id, ranks the groups or activities by
+    reviews over the range instead.
+    """
+    read_from_replica = True
+    default_points = {'day': 30, 'week': 12}
+    max_points = {'day': 366, 'week': 260}
+    default_limit = 10
+    max_limit = 100
+
+    @cached_response('timeseries')
+    async def get(self, request):
+        params = request.query_params
+        period = params.get('period', 'day')
+        scope = params.get('scope', 'all')
+        if period not in PERIODS:
+            return self._bad_request(f"period must be one of: {', '.join(PERIODS)}")
+        if scope not in SCOPE_FIELDS:
+            return self._bad_request(f"scope must be one of: {', '.join(SCOPE_FIELDS)}")
+        try:
+            end = date.fromisoformat(params['end']) if 'end' in params else timezone.localdate()
+            start = (date.fromisoformat(params['start']) if 'start' in params else
+                     end - (self.default_points[period] - 1) * period_length(period))
+            scope_id = int(params['id']) if 'id' in params else None
+            limit = int(params.get('limit', self.default_limit))
+        except ValueError:
+            return self._bad_request("start and end must be YYYY-MM-DD dates, id and limit numbers")
+        if start > end or (end - start) // period_length(period) >= self.max_points[period]:
+            return self._bad_request(
+                f"start must be before end and at most {self.max_points[period]} "
+                f"{period}s apart")
+
+        data = {"period": period, "scope": scope, "start": start, "end": end}
+        if scope != 'all' and scope_id is None:
+            if not 0 < limit <= self.max_limit:
+                return self._bad_request(f"limit must be between 1 and {self.max_limit}")
+            data["leaderboard"] = await sync_to_async(leaderboard)(period, scope, start, end, limit)
+        else:
+            data["id"] = scope_id or 0
+            data["points"] = await sync_to_async(timeseries)(
+                period, scope, scope_id or 0, start, end)
+        return Response(data)
+
+    def _bad_request(self, error):
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DashboardCacheStatsView(AsyncAPIView):
+    """
+    Returns hit/miss counters for the cached dashboard endpoints
+    """
+
+    async def get(self, request):
+        return Response(cache_stats())
+
+
+class MetricsView(APIView):
+    """
+    Request latency, database time and query count histograms per URL
+    name, in the Prometheus text format
+    """
+    permission_classes = [CanScrapeMetrics]
+
+    def get(self, request):
+        return HttpResponse(
+            registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 class StudyActivityDetailView(generics.RetrieveAPIView):
     queryset = Study_Activities.objects.all()
     serializer_class = ActivitiesSerializer
     lookup_field = 'id'
 
 
-class StudyActivitySessionsView(generics.ListAPIView):
+class StudyActivitySessionsView(SparseFieldsMixin, generics.ListAPIView):
     serializer_class = SessionsSerializer
     pagination_class = ResultsSetPagination
+    values_serializer_class = SessionsValuesSerializer
 
     def get_queryset(self):
         activity_id = self.kwargs['id']
-        return Study_Sessions.objects.filter(
+        return Study_Sessions.with_review_stats().filter(
             study_activity_id=activity_id
-        ).order_by('-creation_time')
+        ).order_by('-creation_time', '-id')
 
 
 class StudyActivityCreateView(APIView):
@@ -189,12 +419,59 @@ class StudyActivityCreateView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class WordListView(generics.ListCreateAPIView):
-    queryset = Words.objects.all()
+class WordListView(SparseFieldsMixin, CursorPaginationMixin, generics.ListCreateAPIView):
+    queryset = Words.objects.prefetch_related('categories', 'word_groups')
     serializer_class = WordsSerializer
     pagination_class = ResultsSetPagination
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['Swahili', 'English']
+    values_serializer_class = WordsValuesSerializer
+    cursor_pagination_class = WordCursorPagination
+    filter_backends = [WordSearchFilter]
+
+
+class WordImportView(APIView):
+    """
+    Add words in bulk from an uploaded CSV or JSON Lines file
+    """
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({
+                "error": "Upload the words as a 'file' field"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('import_format') or format_for(upload.name)
+        if file_format not in FORMATS:
+            return Response({
+                "error": f"Unknown file format, use one of: {', '.join(FORMATS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Large uploads are spooled to disk and read back a chunk at a time
+        stream = io.TextIOWrapper(upload.open('rb'), encoding='utf-8-sig', newline='')
+        try:
+            summary = import_words(stream, file_format)
+        except UnicodeDecodeError:
+            return Response({
+                "error": "The file must be UTF-8 text"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
+
+
+class WordExportView(APIView):
+    """
+    Download every word as CSV or JSON Lines (?export_format=jsonl)
+    """
+
+    def get(self, request):
+        file_format = request.query_params.get('export_format', 'csv')
+        if file_format not in FORMATS:
+            return Response({
+                "error": f"Unknown file format, use one of: {', '.join(FORMATS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(
+            export_words(file_format), content_type=FORMATS[file_format])
+        response['Content-Disposition'] = f'attachment; filename="words.{file_format}"'
+        return response
 
 
 class WordDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -206,17 +483,58 @@ class WordDetailView(generics.RetrieveUpdateDestroyAPIView):
     lookup_field = 'id'
 
 
-class GroupWordsView(generics.ListAPIView):
+class GroupWordsView(SparseFieldsMixin, CursorPaginationMixin, generics.ListAPIView):
     """
     List words in a specific group
     """
     serializer_class = WordsSerializer
     pagination_class = ResultsSetPagination
+    values_serializer_class = WordsValuesSerializer
+    cursor_pagination_class = WordCursorPagination
     permission_classes = []  # Temporarily disable authentication requirement
 
     def get_queryset(self):
         group_id = self.kwargs['id']
-        return Words.objects.filter(word_groups__id=group_id)
+        return Words.objects.filter(word_groups__id=group_id).prefetch_related(
+            'categories', 'word_groups')
+
+
+class GroupNextWordsView(APIView):
+    """
+    Words of a group to study next, most overdue first, followed by words
+    the group hasn't reviewed yet
+    """
+    default_count = 10
+    max_count = 100
+
+    def get(self, request, id):
+        try:
+            count = int(request.query_params.get('n', self.default_count))
+        except ValueError:
+            count = 0
+        if not 0 < count <= self.max_count:
+            return Response({
+                "error": f"n must be a number between 1 and {self.max_count}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not WordGroup.objects.filter(id=id).exists():
+            return Response({
+                "error": "Word group not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            "group_id": id,
+            "words": [{
+                "id": word.id,
+                "swahili": word.Swahili,
+                "pronounciation": word.Pronounciation,
+                "english": word.English,
+                "is_new": schedule is None,
+                "due": schedule.due if schedule else None,
+                "interval_days": schedule.interval_days if schedule else 0,
+                "ease": round(schedule.ease, 2) if schedule else None,
+                "repetitions": schedule.repetitions if schedule else 0
+            } for word, schedule in next_words(id, count)]
+        })
 
 
 class WordGroupDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -228,25 +546,30 @@ class WordGroupDetailView(generics.RetrieveUpdateDestroyAPIView):
     lookup_field = 'id'
 
 
-class GroupStudySessionsView(generics.ListAPIView):
+class GroupStudySessionsView(SparseFieldsMixin, CursorPaginationMixin, generics.ListAPIView):
     """
     List study sessions for a specific group
     """
     serializer_class = SessionsSerializer
     pagination_class = ResultsSetPagination
+    values_serializer_class = SessionsValuesSerializer
+    cursor_pagination_class = SessionCursorPagination
 
     def get_queryset(self):
         group_id = self.kwargs['id']
-        return Study_Sessions.objects.filter(Group_id=group_id).order_by('-creation_time')
+        return Study_Sessions.with_review_stats().filter(
+            Group_id=group_id).order_by('-creation_time', '-id')
 
 
-class StudySessionListView(generics.ListCreateAPIView):
+class StudySessionListView(SparseFieldsMixin, CursorPaginationMixin, generics.ListCreateAPIView):
     """
     List all study sessions or create a new one
     """
-    queryset = Study_Sessions.objects.all().order_by('-creation_time')
+    queryset = Study_Sessions.with_review_stats().order_by('-creation_time', '-id')
     serializer_class = SessionsSerializer
     pagination_class = ResultsSetPagination
+    values_serializer_class = SessionsValuesSerializer
+    cursor_pagination_class = SessionCursorPagination
 
 
 class StudySessionDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -258,58 +581,105 @@ class StudySessionDetailView(generics.RetrieveUpdateDestroyAPIView):
     lookup_field = 'id'
 
 
-class SessionWordsView(generics.ListAPIView):
+class SessionWordsView(SparseFieldsMixin, generics.ListAPIView):
     """
     List words reviewed in a specific study session
     """
     serializer_class = WordsSerializer
     pagination_class = ResultsSetPagination
+    values_serializer_class = WordsValuesSerializer
 
     def get_queryset(self):
         session_id = self.kwargs['id']
-        return Words.objects.filter(word_review__study_session_id=session_id).distinct()
+        return Words.objects.filter(
+            word_review__study_session_id=session_id
+        ).distinct().prefetch_related('categories', 'word_groups')
 
 
-class ResetHistoryView(APIView):
+class SessionReviewBatchView(APIView):
     """
-    Reset study history
+    Record a whole session's answers in one request
     """
 
-    def post(self, request):
+    def post(self, request, id):
         try:
-            Word_Review.objects.all().delete()
-            Study_Sessions.objects.all().delete()
-            Study_Activities.objects.all().delete()
+            session = Study_Sessions.objects.get(id=id)
+        except Study_Sessions.DoesNotExist:
             return Response({
-                "success": True,
-                "message": "Study history has been reset"
-            })
-        except Exception as e:
+                "error": "Study session not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = WordReviewBatchSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response({
-                "error": str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                "error": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            reviews = Word_Review.objects.bulk_create([
+                Word_Review(
+                    word_id_id=item['word_id'],
+                    study_session_id=session,
+                    correct=item['correct'])
+                for item in serializer.validated_data['reviews']
+            ], batch_size=1000)
+            record_reviews(reviews)
+            schedule_reviews(reviews)
+            if serializer.validated_data['finish_session']:
+                session.finish_session()
+            invalidate_on_write()
+
+        return Response({
+            "session_id": session.id,
+            "reviews_created": len(reviews),
+            "end_time": session.end_time
+        }, status=status.HTTP_201_CREATED)
 
 
-class FullResetView(APIView):
+class ResetHistoryView(APIView):
     """
-    Full system reset
+    Reset study history
     """
+    kind = 'history'
+    message = "Study history is being reset"
 
     def post(self, request):
         try:
-            Word_Review.objects.all().delete()
-            Study_Sessions.objects.all().delete()
-            Study_Activities.objects.all().delete()
-            WordGroup.objects.all().delete()
-            Words.objects.all().delete()
+            job = start_reset(self.kind, archive=bool(request.data.get('archive')))
+        except ResetInProgress as e:
             return Response({
-                "success": True,
-                "message": "System has been fully reset"
-            })
-        except Exception as e:
+                "error": str(e),
+                "job": ResetJobSerializer(e.job).data
+            }, status=status.HTTP_409_CONFLICT)
+
+        if job.status == 'failed':
             return Response({
-                "error": str(e)
+                "error": job.error,
+                "job": ResetJobSerializer(job).data
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({
+            "success": True,
+            "message": self.message,
+            "job": ResetJobSerializer(job).data,
+            "progress_url": reverse('reset-job', kwargs={'id': job.id}, request=request)
+        }, status=status.HTTP_200_OK if job.status == 'finished' else status.HTTP_202_ACCEPTED)
+
+
+class FullResetView(ResetHistoryView):
+    """
+    Full system reset
+    """
+    kind = 'full'
+    message = "System is being fully reset"
+
+
+class ResetJobView(generics.RetrieveAPIView):
+    """
+    Progress of a history or full reset
+    """
+    queryset = ResetJob.objects.all()
+    serializer_class = ResetJobSerializer
+    lookup_field = 'id'
 
 
 class WordReviewStatsView(APIView):
@@ -317,10 +687,11 @@ class WordReviewStatsView(APIView):
     def get(self, request, word_id):
         try:
             word = get_object_or_404(Words, id=word_id)
-            reviews = Word_Review.objects.filter(word_id=word)
+            counter = WordReviewCounter.objects.filter(word=word).first()
 
-            total_reviews = reviews.count()
-            correct_reviews = reviews.filter(correct=True).count()
+            correct_reviews = counter.correct_count if counter else 0
+            total_reviews = correct_reviews + \
+                (counter.wrong_count if counter else 0)
             accuracy = (correct_reviews / total_reviews *
                         100) if total_reviews > 0 else 0
 
@@ -352,16 +723,12 @@ class WordGroupListView(generics.ListCreateAPIView):
     pagination_class = ResultsSetPagination
 
     def get_queryset(self):
-        queryset = WordGroup.objects.all()
+        queryset = WordGroup.objects.prefetch_related('categories')
         # Add category filter if provided
         category = self.request.query_params.get('category', None)
         if category:
             queryset = queryset.filter(categories__name=category)
-        return queryset.annotate(
-            total_words=Count('words'),
-            studied_words=Count(
-                'student_study_groups__word_review__word_id', distinct=True)
-        )
+        return queryset
 
     def perform_create(self, serializer):
         group = serializer.save()
@@ -0,0 +1,244 @@
+"""
+Bulk vocabulary import and export as CSV or JSON Lines, for the
+/api/words/import/ and /api/words/export/ endpoints and
+``manage.py vocabulary``.
+
+Both stream. Export reads the words with iterator() and yields each chunk
+of rows as it is written. Import validates, deduplicates and saves one
+chunk of rows at a time, each in its own transaction, so neither holds
+more than a chunk in memory however large the file.
+
+A row has Swahili, Pronounciation and English, plus the names of its
+categories and groups: lists in JSON Lines, joined with "|" in CSV.
+Unknown category and group names are created. A word is the same word
+when Swahili and English match; importing it again only adds the
+categories and groups it didn't have.
+"""
+import csv
+import json
+import os
+from collections import defaultdict
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .cache import invalidate_on_write
+from .models import (
+    WordCategory, WordGroup, Words, forget_category_distributions, groups_of_words)
+from .serializers import WordsSerializer
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+WORD_COLUMNS = ['Swahili', 'Pronounciation', 'English']
+EXPORT_COLUMNS = ['id', *WORD_COLUMNS, 'categories', 'groups']
+LIST_SEPARATOR = '|'
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+# Rows with errors listed in the import summary, the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+def format_for(filename, default=None):
+    """The format of a file by its extension, or ``default``."""
+    return EXTENSIONS.get(os.path.splitext(filename or '')[1].lower(), default)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _names(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        value = value.split(LIST_SEPARATOR)
+    if not isinstance(value, list):
+        raise serializers.ValidationError('Expected a list of names')
+    return list(dict.fromkeys(str(name).strip() for name in value if str(name).strip()))
+
+
+def read_rows(stream, file_format):
+    """
+    Yields (line number, row) for each row of a text ``stream``. A row that
+    can't be parsed is yielded as None so the import can report it.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+class VocabularyImporter:
+    """Imports rows from read_rows(); see the module docstring."""
+
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        # Built once and reused to validate every row
+        self.validator = WordsSerializer()
+        self.category_ids = {}
+        self.group_ids = {}
+        self.summary = {
+            'rows': 0,
+            'created': 0,
+            'existing': 0,
+            'duplicates': 0,
+            'categories_created': 0,
+            'groups_created': 0,
+            'error_count': 0,
+            'errors': [],
+        }
+
+    def run(self, rows):
+        for chunk in _chunks(rows, self.chunk_size):
+            self.import_chunk(chunk)
+        return self.summary
+
+    def _error(self, line_number, error):
+        self.summary['error_count'] += 1
+        if len(self.summary['errors']) < MAX_REPORTED_ERRORS:
+            self.summary['errors'].append({'line': line_number, 'error': error})
+
+    def _validate(self, chunk):
+        """{(Swahili, English): (fields, category names, group names)} of the valid rows."""
+        words = {}
+        for line_number, row in chunk:
+            self.summary['rows'] += 1
+            if row is None:
+                self._error(line_number, 'Not a JSON object')
+                continue
+            try:
+                fields = self.validator.run_validation(
+                    {column: row.get(column) or '' for column in WORD_COLUMNS})
+                categories = _names(row.get('categories'))
+                groups = _names(row.get('groups'))
+            except serializers.ValidationError as e:
+                self._error(line_number, e.detail)
+                continue
+            key = (fields['Swahili'], fields['English'])
+            if key in words:
+                # Repeated in the file: one word with the names of both rows
+                self.summary['duplicates'] += 1
+                words[key][1].extend(categories)
+                words[key][2].extend(groups)
+            else:
+                words[key] = (fields, categories, groups)
+        return words
+
+    def _ids_for(self, model, names, known, created_key):
+        """Ids of the ``model`` rows with these names, creating the missing ones."""
+        missing = {name for name in names if name not in known}
+        if missing:
+            for name, pk in model.objects.filter(name__in=missing).order_by(
+                    '-id').values_list('name', 'id'):
+                known[name] = pk
+            new = [model(name=name) for name in sorted(missing) if name not in known]
+            for row in model.objects.bulk_create(new):
+                known[row.name] = row.id
+            self.summary[created_key] += len(new)
+        return known
+
+    def import_chunk(self, chunk):
+        words = self._validate(chunk)
+        if not words:
+            return
+        with transaction.atomic():
+            word_ids = {}
+            for pk, swahili, english in Words.objects.filter(
+                    Swahili__in={swahili for swahili, _ in words}).order_by(
+                    '-id').values_list('id', 'Swahili', 'English'):
+                if (swahili, english) in words:
+                    word_ids[(swahili, english)] = pk
+            self.summary['existing'] += len(word_ids)
+
+            new = [key for key in words if key not in word_ids]
+            created = Words.objects.bulk_create([Words(**words[key][0]) for key in new])
+            word_ids.update(zip(new, (word.id for word in created)))
+            self.summary['created'] += len(created)
+
+            category_ids = self._ids_for(
+                WordCategory, {name for _, names, _ in words.values() for name in names},
+                self.category_ids, 'categories_created')
+            group_ids = self._ids_for(
+                WordGroup, {name for _, _, names in words.values() for name in names},
+                self.group_ids, 'groups_created')
+
+            # Links the word already has are skipped by ignore_conflicts
+            category_links = [
+                Words.categories.through(words_id=word_ids[key], wordcategory_id=category_ids[name])
+                for key, (_, categories, _) in words.items() for name in set(categories)
+            ]
+            group_links = [
+                WordGroup.words.through(wordgroup_id=group_ids[name], words_id=word_ids[key])
+                for key, (_, _, groups) in words.items() for name in set(groups)
+            ]
+            Words.categories.through.objects.bulk_create(category_links, ignore_conflicts=True)
+            WordGroup.words.through.objects.bulk_create(group_links, ignore_conflicts=True)
+
+            forget_category_distributions(
+                {link.wordgroup_id for link in group_links} |
+                groups_of_words({link.words_id for link in category_links}))
+            invalidate_on_write()
+
+
+def import_words(stream, file_format, chunk_size=IMPORT_CHUNK_SIZE):
+    """Imports a CSV or JSON Lines text stream and returns the summary."""
+    return VocabularyImporter(chunk_size).run(read_rows(stream, file_format))
+
+
+class _Echo:
+    """A file for csv.writer that returns what is written instead of keeping it."""
+
+    def write(self, value):
+        return value
+
+
+def export_words(file_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields the whole vocabulary as CSV or JSON Lines text, a chunk at a time."""
+    writer = csv.writer(_Echo())
+    if file_format == 'csv':
+        yield writer.writerow(EXPORT_COLUMNS)
+
+    rows = Words.objects.order_by('id').values_list(
+        'id', *WORD_COLUMNS).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(rows, chunk_size):
+        ids = [row[0] for row in chunk]
+        categories = defaultdict(list)
+        for word_id, name in Words.categories.through.objects.filter(
+                words_id__in=ids).order_by('wordcategory_id').values_list(
+                'words_id', 'wordcategory__name'):
+            categories[word_id].append(name)
+        groups = defaultdict(list)
+        for word_id, name in WordGroup.words.through.objects.filter(
+                words_id__in=ids).order_by('wordgroup_id').values_list(
+                'words_id', 'wordgroup__name'):
+            groups[word_id].append(name)
+
+        if file_format == 'csv':
+            yield ''.join(
+                writer.writerow([
+                    *row,
+                    LIST_SEPARATOR.join(categories[row[0]]),
+                    LIST_SEPARATOR.join(groups[row[0]]),
+                ])
+                for row in chunk)
+        else:
+            yield ''.join(
+                json.dumps(dict(
+                    zip(EXPORT_COLUMNS, (*row, categories[row[0]], groups[row[0]]))),
+                    ensure_ascii=False) + '\n'
+                for row in chunk)
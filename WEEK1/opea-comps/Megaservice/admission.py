@@ -0,0 +1,208 @@
+"""
+Admission control for the megaservice, so an overloaded LLM backend
+slows requests down instead of timing them all out at once.
+
+Each API key (the bearer token or X-API-Key, else the client address)
+gets a token bucket of RATE_LIMIT_BURST requests refilled at
+RATE_LIMIT_RPS; past it requests are refused with 429.
+
+At most MAX_CONCURRENT_REQUESTS calls to the LLM are in flight at a
+time; a call answering identical requests or a batch (see batching.py)
+takes one slot, as does a streamed request. The rest queue by priority
+(X-Priority: high, normal or low), first come first served within one.
+A full queue (MAX_QUEUE_DEPTH) turns away the lowest priority call,
+queued or new, and a call that has waited MAX_QUEUE_WAIT seconds gives
+up; the requests waiting on it get 503. Refusals carry a Retry-After
+estimated from how long calls hold their slot.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter, Gauge, Histogram
+
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", 64))
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", 256))
+MAX_QUEUE_WAIT = float(os.getenv("MAX_QUEUE_WAIT", 30))
+# 0 turns rate limiting off
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", 0))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 20))
+# {"<api key>": [rps, burst]} for keys with their own limits
+RATE_LIMIT_OVERRIDES = json.loads(os.getenv("RATE_LIMIT_OVERRIDES", "{}"))
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+# Buckets kept, the least recently used are forgotten (and start full again)
+MAX_RATE_LIMIT_KEYS = 10000
+
+ACTIVE_REQUESTS = Gauge(
+    "example_service_active_requests", "Calls to the LLM holding a slot")
+QUEUE_DEPTH = Gauge(
+    "example_service_queue_depth", "Calls to the LLM waiting for a slot")
+QUEUE_WAIT = Histogram(
+    "example_service_queue_wait_seconds", "Time calls waited for a slot to the LLM")
+REJECTED_REQUESTS = Counter(
+    "example_service_rejected_requests_total", "Requests turned away, by why", ["reason"])
+
+
+class Rejected(Exception):
+    def __init__(self, status, retry_after, reason, message):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+        REJECTED_REQUESTS.labels(reason=reason).inc()
+
+
+def api_key_of(headers, client_host):
+    authorization = headers.get("Authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[len("bearer "):].strip()
+    return headers.get("X-API-Key") or f"client:{client_host}"
+
+
+def priority_of(headers):
+    return PRIORITIES.get(headers.get("X-Priority", "normal").lower(), PRIORITIES["normal"])
+
+
+class RateLimiter:
+    def __init__(self, rate=RATE_LIMIT_RPS, burst=RATE_LIMIT_BURST,
+                 overrides=RATE_LIMIT_OVERRIDES):
+        self.rate = rate
+        self.burst = burst
+        self.overrides = overrides
+        # key -> (tokens, when they were counted)
+        self.buckets = OrderedDict()
+
+    def check(self, key):
+        """Takes a token from ``key``'s bucket, or raises Rejected (429)."""
+        rate, burst = self.overrides.get(key, (self.rate, self.burst))
+        if not rate:
+            return
+        now = time.monotonic()
+        tokens, counted = self.buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - counted) * rate)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            raise Rejected(
+                429, (1 - tokens) / rate, "rate_limit",
+                f"Rate limit of {rate} requests per second exceeded")
+        self.buckets[key] = (tokens - 1, now)
+        while len(self.buckets) > MAX_RATE_LIMIT_KEYS:
+            self.buckets.popitem(last=False)
+
+
+class Slot:
+    """A held place among the calls to the LLM; release() once done."""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller.release(time.monotonic() - self.started)
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=MAX_CONCURRENT_REQUESTS,
+                 max_queue=MAX_QUEUE_DEPTH, max_wait=MAX_QUEUE_WAIT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        # Heap of (priority, arrival, future); futures done early are skipped
+        self.queue = []
+        self.waiting = 0
+        self.arrivals = itertools.count()
+        # Moving average of how long a slot is held, for Retry-After
+        self.hold_time = 1.0
+        self.counts = {"admitted": 0, "queued": 0, "shed": 0, "timed_out": 0, "queue_full": 0}
+
+    def retry_after(self):
+        return self.hold_time * (self.waiting + 1) / self.max_concurrent
+
+    async def acquire(self, priority=PRIORITIES["normal"]):
+        """A Slot, once one is free; raises Rejected (503) when there's no room."""
+        if self.active < self.max_concurrent and not self.waiting:
+            self._admit()
+            return Slot(self)
+        if self.waiting >= self.max_queue:
+            self._shed(priority)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (priority, next(self.arrivals), future))
+        self.waiting += 1
+        self.counts["queued"] += 1
+        QUEUE_DEPTH.set(self.waiting)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self._left_queue()
+            self.counts["timed_out"] += 1
+            raise Rejected(
+                503, self.retry_after(), "queue_timeout",
+                f"No LLM capacity within {self.max_wait} seconds")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Handed a slot just as the client went away
+                Slot(self).release()
+            else:
+                self._left_queue()
+            raise
+        finally:
+            QUEUE_WAIT.observe(time.monotonic() - started)
+        return Slot(self)
+
+    def _admit(self):
+        self.active += 1
+        self.counts["admitted"] += 1
+        ACTIVE_REQUESTS.set(self.active)
+
+    def _left_queue(self):
+        self.waiting -= 1
+        QUEUE_DEPTH.set(self.waiting)
+
+    def _shed(self, priority):
+        """Makes room for a request of ``priority`` in the full queue, or raises Rejected."""
+        waiting = [entry for entry in self.queue if not entry[2].done()]
+        # The lowest priority, and the latest to arrive among those
+        worst = max(waiting, key=lambda entry: (entry[0], entry[1]), default=None)
+        if worst is None or worst[0] <= priority:
+            self.counts["queue_full"] += 1
+            raise Rejected(
+                503, self.retry_after(), "queue_full", "Too many calls waiting for the LLM")
+        self.counts["shed"] += 1
+        self._left_queue()
+        worst[2].set_exception(Rejected(
+            503, self.retry_after(), "shed", "Turned away for higher priority requests"))
+
+    def release(self, held_for):
+        self.hold_time = 0.9 * self.hold_time + 0.1 * held_for
+        while self.queue:
+            _, _, future = heapq.heappop(self.queue)
+            if not future.done():
+                # The slot passes straight to the next request in line
+                self._left_queue()
+                self.counts["admitted"] += 1
+                future.set_result(None)
+                return
+        self.active -= 1
+        ACTIVE_REQUESTS.set(self.active)
+
+    def stats(self):
+        return {
+            **self.counts,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_wait": self.max_wait,
+            "hold_time": round(self.hold_time, 3),
+        }
@@ -1,15 +1,32 @@
-from fastapi import HTTPException
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from comps.cores.proto.api_protocol import (
     ChatCompletionRequest,
     ChatCompletionResponse,
     ChatCompletionResponseChoice,
+    ChatCompletionResponseStreamChoice,
+    ChatCompletionStreamResponse,
     ChatMessage,
+    DeltaMessage,
     UsageInfo
 )
 from comps.cores.mega.constants import ServiceType, ServiceRoleType
-from comps import MicroService, ServiceOrchestrator
+from comps import MicroService
+from admission import AdmissionController, RateLimiter, Rejected, api_key_of, priority_of
+from batching import LLM_BATCH_ENDPOINT, BatchScheduler
+from downstream import DownstreamPool
+from metrics import FIRST_TOKEN_LATENCY, REQUEST_LATENCY
+from response_cache import (
+    CACHE_ENABLED,
+    CACHE_SEMANTIC,
+    ResponseCache,
+    bypass_requested,
+    request_key
+)
 import os
 import json
+import time
 
 EMBEDDING_SERVICE_HOST_IP = os.getenv("EMBEDDING_SERVICE_HOST_IP", "0.0.0.0")
 EMBEDDING_SERVICE_PORT = os.getenv("EMBEDDING_SERVICE_PORT", 6000)
@@ -23,18 +40,28 @@ class ExampleService:
         self.host = host
         self.port = port
         self.endpoint = "/v1/example-service"
-        self.megaservice = ServiceOrchestrator()
+        # One keep-alive connection pool for every downstream hop, which
+        # are called over it directly rather than through a
+        # ServiceOrchestrator (see downstream.py)
+        self.pool = DownstreamPool()
+        self.cache = None
+        # Per-key rate limits, then a bounded queue for the LLM
+        self.rate_limiter = RateLimiter()
+        self.admission = AdmissionController()
 
     def add_remote_service(self):
 
-        # embedding = MicroService(
-        #    name="embedding",
-        #    host=EMBEDDING_SERVICE_HOST_IP,
-        #    port=EMBEDDING_SERVICE_PORT,
-        #    endpoint="/v1/embeddings",
-        #    use_remote_service=True,
-        #    service_type=ServiceType.EMBEDDING,
-        # )
+        if CACHE_SEMANTIC:
+            # Only used to look up similar prompts in the response cache
+            embedding = MicroService(
+               name="embedding",
+               host=EMBEDDING_SERVICE_HOST_IP,
+               port=EMBEDDING_SERVICE_PORT,
+               endpoint="/v1/embeddings",
+               use_remote_service=True,
+               service_type=ServiceType.EMBEDDING,
+            )
+            self.embedding_url = embedding.endpoint_path()
         llm = MicroService(
             name="llm",
             host=LLM_SERVICE_HOST_IP,
@@ -48,7 +75,28 @@ class ExampleService:
         print(f"- Port: {LLM_SERVICE_PORT}")
         print(f"- Endpoint: {llm.endpoint}")
         print(f"- Full URL: http://{LLM_SERVICE_HOST_IP}:{LLM_SERVICE_PORT}{llm.endpoint}") 
-        self.megaservice.add(llm)
+        print(f"- Max connections: {self.pool.max_connections} "
+              f"({self.pool.max_connections_per_host or 'no limit'} per host), "
+              f"keep-alive {self.pool.keepalive_timeout}s")
+        self.llm_url = llm.endpoint_path()
+        # Identical requests share one call, and with a batch endpoint
+        # compatible ones are sent together
+        self.llm_batch_url = None
+        if LLM_BATCH_ENDPOINT:
+            self.llm_batch_url = f"http://{LLM_SERVICE_HOST_IP}:{LLM_SERVICE_PORT}{LLM_BATCH_ENDPOINT}"
+        self.batcher = BatchScheduler(
+            self.complete, self.complete_batch if self.llm_batch_url else None,
+            admission=self.admission)
+        print(f"- Batching: {self.llm_batch_url or 'off'}")
+
+        # The cache stage in front of the LLM
+        if CACHE_ENABLED:
+            self.cache = ResponseCache(embed=self.embed if CACHE_SEMANTIC else None)
+            print(f"- Response cache: {self.cache.max_entries} entries, "
+                  f"{self.cache.ttl}s TTL, semantic {'on' if CACHE_SEMANTIC else 'off'}")
+        print(f"- Admission: {self.admission.max_concurrent} at once, "
+              f"{self.admission.max_queue} queued for up to {self.admission.max_wait}s, "
+              f"rate limit {self.rate_limiter.rate or 'off'} per second per key")
 
     def start(self):
 
@@ -64,11 +112,19 @@ class ExampleService:
 
         self.service.add_route(
             self.endpoint, self.handle_request, methods=["POST"])
+        self.service.add_route(
+            f"{self.endpoint}/stats", self.handle_stats, methods=["GET"])
+        self.service.app.router.on_shutdown.append(self.pool.close)
         print(f"Service configured with endpoint: {self.endpoint}")
         self.service.start()
 
-    async def handle_request(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
+    async def handle_request(
+            self, request: ChatCompletionRequest, http_request: Request,
+            response: Response) -> ChatCompletionResponse:
         try:
+            client = http_request.client.host if http_request.client else None
+            self.rate_limiter.check(api_key_of(http_request.headers, client))
+
             # Ensure messages is properly formatted
             messages = (
                 [{"role": "user", "content": request.messages}]
@@ -80,29 +136,50 @@ class ExampleService:
             ollama_request = {
                 "model": request.model or "llama2",  # Changed default model name
                 "messages": messages,
-                "stream": False
+                "stream": bool(request.stream)
             }
 
-            # Schedule the request through the orchestrator
-            result = await self.megaservice.schedule(ollama_request)
-
-            # Improved response handling
-            if not result:
-                raise ValueError("No response received from LLM service")
+            # Keyed on what the LLM is sent, so streamed and whole answers
+            # are cached apart: a streamed one has no token usage for a
+            # non-streaming client
+            lookup = request_key(ollama_request)
+            use_cache = self.cache is not None
+            cache_status = "off"
+            if use_cache and bypass_requested(http_request.headers):
+                self.cache.count("bypass")
+                use_cache = False
+                cache_status = "bypass"
+            elif use_cache:
+                await self.cache.get(lookup)
+                cache_status = f"hit-{lookup.tier}" if lookup.answer else "miss"
 
-            llm_response = result[0].get('llm/MicroService')
-            if not llm_response:
-                raise ValueError("Invalid response format from LLM service")
+            # Only calls to the LLM wait for a slot: a streamed request's
+            # own, or the batcher's one per call it makes
+            priority = priority_of(http_request.headers)
+            if request.stream:
+                slot = None if lookup.answer else await self.admission.acquire(priority)
+                return StreamingResponse(
+                    self.stream_completion(ollama_request, lookup if use_cache else None, slot),
+                    media_type="text/event-stream",
+                    headers={
+                        "Cache-Control": "no-cache",
+                        "X-Accel-Buffering": "no",
+                        "X-Cache": cache_status,
+                    },
+                    # Also frees the slot if the stream never started
+                    background=BackgroundTask(slot.release) if slot else None)
 
-            # Extract content from response
-            content = ""
-            if hasattr(llm_response, 'body'):
-                response_body = b""
-                async for chunk in llm_response.body_iterator:
-                    response_body += chunk
-                content = response_body.decode('utf-8')
+            started = time.perf_counter()
+            if lookup.answer:
+                answer = lookup.answer
             else:
-                raise ValueError("No response content available")
+                answer = await self.batcher.submit(
+                    lookup.key, lookup.partition, ollama_request, priority)
+                if use_cache:
+                    self.cache.put(lookup, answer)
+            usage = answer["usage"]
+            REQUEST_LATENCY.labels(stream="false").observe(time.perf_counter() - started)
+            response.headers["X-Cache"] = cache_status
 
             return ChatCompletionResponse(
                 model=request.model or "llama2",
@@ -111,24 +188,158 @@ class ExampleService:
                         index=0,
                         message=ChatMessage(
                             role="assistant",
-                            content=content
+                            content=answer["content"]
                         ),
                         finish_reason="stop"
                     )
                 ],
                 usage=UsageInfo(
-                    prompt_tokens=0,
-                    completion_tokens=0,
-                    total_tokens=0
+                    prompt_tokens=usage.get('prompt_tokens', 0),
+                    completion_tokens=usage.get('completion_tokens', 0),
+                    total_tokens=usage.get('total_tokens', 0)
                 )
             )
 
+        except Rejected as e:
+            # Turned away before reaching the LLM; try again later
+            raise HTTPException(
+                status_code=e.status, detail=str(e),
+                headers={"Retry-After": str(e.retry_after)})
+        except HTTPException:
+            raise
         except Exception as e:
             # More detailed error handling
             error_msg = f"Error processing request: {str(e)}"
             print(error_msg)  # Log the error
             raise HTTPException(status_code=500, detail=error_msg)
 
+    async def complete(self, ollama_request):
+        """The LLM's answer as {"content", "usage"}."""
+        return parse_completion(await self.pool.post_json(self.llm_url, ollama_request))
+
+    async def complete_batch(self, ollama_requests):
+        """The LLM's answers to ``ollama_requests``, from one call to its batch endpoint."""
+        data = await self.pool.post_json(self.llm_batch_url, {"requests": ollama_requests})
+        answers = []
+        for llm_response in data["responses"]:
+            try:
+                answers.append(parse_completion(llm_response))
+            except ValueError as e:
+                answers.append(e)
+        return answers
+
+    async def embed(self, text):
+        """The embedding of ``text``, from the embedding microservice."""
+        data = await self.pool.post_json(self.embedding_url, {"input": text})
+        # OpenAI format, or TEI's own /embed format
+        if isinstance(data, dict):
+            return data["data"][0]["embedding"]
+        return data[0]
+
+    async def stream_completion(self, ollama_request, lookup=None, slot=None):
+        """
+        Relays the LLM's tokens to the client as chat.completion.chunk
+        server-sent events as they arrive, and records the time to the
+        first one. A cached answer is sent as a single chunk. The
+        admission ``slot`` is released once the stream ends.
+        """
+        started = time.perf_counter()
+        first_token = True
+        finished = False
+        pieces = []
+        chunk_id = ChatCompletionStreamResponse(model="", choices=[]).id
+
+        def event(content=None, finish_reason=None):
+            delta = DeltaMessage(role="assistant" if first_token else None, content=content)
+            chunk = ChatCompletionStreamResponse(
+                id=chunk_id,
+                model=ollama_request["model"],
+                choices=[ChatCompletionResponseStreamChoice(
+                    index=0, delta=delta, finish_reason=finish_reason)])
+            return f"data: {chunk.model_dump_json(exclude_none=True)}\n\n"
+
+        async def tokens():
+            if lookup is not None and lookup.answer:
+                yield lookup.answer["content"], "stop"
+                return
+            async for line in self.pool.stream_lines(self.llm_url, ollama_request):
+                yield parse_stream_line(line)
+
+        try:
+            async for content, finish_reason in tokens():
+                if content:
+                    pieces.append(content)
+                    yield event(content)
+                    if first_token:
+                        FIRST_TOKEN_LATENCY.observe(time.perf_counter() - started)
+                        first_token = False
+                if finish_reason:
+                    yield event(finish_reason=finish_reason)
+                    finished = True
+                    break
+            if not finished:
+                yield event(finish_reason="stop")
+            if lookup is not None and not lookup.answer and pieces:
+                self.cache.put(lookup, {"content": "".join(pieces), "usage": {}})
+        except Exception as e:
+            # The status line is already sent, so the error goes in the stream
+            error_msg = f"Error processing request: {str(e)}"
+            print(error_msg)
+            yield f"data: {json.dumps({'error': {'message': error_msg}})}\n\n"
+        finally:
+            if slot is not None:
+                slot.release()
+        yield "data: [DONE]\n\n"
+        REQUEST_LATENCY.labels(stream="true").observe(time.perf_counter() - started)
+
+    async def handle_stats(self):
+        return {
+            "downstream": self.pool.stats(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "batching": self.batcher.stats(),
+            "admission": self.admission.stats(),
+            "rate_limit": {
+                "rps": self.rate_limiter.rate,
+                "burst": self.rate_limiter.burst,
+                "keys": len(self.rate_limiter.buckets),
+            },
+        }
+
+
+def parse_completion(llm_response):
+    """{"content", "usage"} of an LLM answer."""
+    if not llm_response:
+        raise ValueError("No response received from LLM service")
+
+    # OpenAI format, or Ollama's own /api/chat format
+    if llm_response.get('choices'):
+        content = llm_response['choices'][0]['message']['content']
+    elif llm_response.get('message'):
+        content = llm_response['message']['content']
+    else:
+        raise ValueError(
+            llm_response.get('error') or "Invalid response format from LLM service")
+    return {"content": content, "usage": llm_response.get('usage') or {}}
+
+
+def parse_stream_line(line):
+    """
+    (content, finish reason) of one line of a streamed answer, in OpenAI
+    server-sent events or Ollama's own JSON lines.
+    """
+    if line.startswith("data:"):
+        line = line[len("data:"):].strip()
+    if not line.startswith("{"):
+        # [DONE], or an SSE comment or field other than data
+        return None, None
+    data = json.loads(line)
+    if data.get("choices"):
+        choice = data["choices"][0]
+        return (choice.get("delta") or {}).get("content"), choice.get("finish_reason")
+    if "message" in data:
+        return data["message"].get("content"), "stop" if data.get("done") else None
+    return None, None
+
 
 example = ExampleService()
 example.add_remote_service()
@@ -0,0 +1,133 @@
+"""
+Request coalescing and micro-batching for the megaservice's LLM calls.
+
+Identical requests (same model, messages and parameters) that arrive
+while one of them is still waiting on the LLM share its answer instead
+of sending their own: single-flight.
+
+When the backend takes batches (LLM_BATCH_ENDPOINT, which gets
+{"requests": [...]} and answers {"responses": [...]} in the same order),
+requests with the same model and parameters are also held for up to
+BATCH_WINDOW_MS, or until BATCH_MAX_SIZE of them are waiting, and sent
+together in one call. A request that ends up alone goes out on its own.
+
+With an AdmissionController each call to the LLM, whether it answers
+one request, several identical ones or a batch, waits for one slot.
+"""
+import asyncio
+import os
+
+from prometheus_client import Counter, Histogram
+
+from admission import PRIORITIES
+
+LLM_BATCH_ENDPOINT = os.getenv("LLM_BATCH_ENDPOINT", "")
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", 10))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 16))
+
+COALESCED_REQUESTS = Counter(
+    "example_service_coalesced_requests_total",
+    "Requests answered by an identical request already waiting on the LLM")
+BATCH_SIZE = Histogram(
+    "example_service_batch_size",
+    "Requests per call to the LLM",
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+
+
+class BatchScheduler:
+    def __init__(self, send_one, send_batch=None, window_ms=BATCH_WINDOW_MS,
+                 max_size=BATCH_MAX_SIZE, admission=None):
+        # Async functions from a request to its answer, and from a list of
+        # requests to their answers; without send_batch nothing is batched
+        self.send_one = send_one
+        self.send_batch = send_batch
+        self.admission = admission
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        # key -> future of the answer to the request being sent
+        self.in_flight = {}
+        # group -> [(request, future, priority)] waiting for their batch
+        self.pending = {}
+        self.timers = {}
+        self.counts = {"requests": 0, "coalesced": 0, "calls": 0, "batched_requests": 0}
+
+    async def submit(self, key, group, request, priority=PRIORITIES["normal"]):
+        """
+        The answer to ``request``. ``key`` is the same for identical
+        requests, ``group`` for requests that can share a batch. A call
+        waits for its admission slot at the best ``priority`` among the
+        requests it answers first sent (see admission.PRIORITIES).
+        """
+        self.counts["requests"] += 1
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.counts["coalesced"] += 1
+            COALESCED_REQUESTS.inc()
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+            if self.send_batch is None or self.max_size <= 1:
+                asyncio.ensure_future(self._send([(request, future, priority)]))
+            else:
+                self._enqueue(group, request, future, priority)
+        # A client that goes away mustn't cancel the answer the others wait for
+        return await asyncio.shield(future)
+
+    def _enqueue(self, group, request, future, priority):
+        batch = self.pending.setdefault(group, [])
+        batch.append((request, future, priority))
+        if len(batch) >= self.max_size:
+            self._flush(group)
+        elif len(batch) == 1:
+            self.timers[group] = asyncio.get_running_loop().call_later(
+                self.window, self._flush, group)
+
+    def _flush(self, group):
+        timer = self.timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self.pending.pop(group, None)
+        if batch:
+            asyncio.ensure_future(self._send(batch))
+
+    async def _send(self, batch):
+        slot = None
+        try:
+            if self.admission is not None:
+                # Rejected (no room, or waited too long) fails the whole batch
+                slot = await self.admission.acquire(min(item[2] for item in batch))
+            self.counts["calls"] += 1
+            BATCH_SIZE.observe(len(batch))
+            if len(batch) == 1:
+                answers = [await self.send_one(batch[0][0])]
+            else:
+                self.counts["batched_requests"] += len(batch)
+                answers = await self.send_batch([request for request, _, _ in batch])
+                if len(answers) != len(batch):
+                    raise ValueError(
+                        f"Batch of {len(batch)} requests got {len(answers)} answers")
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            if slot is not None:
+                slot.release()
+        for (_, future, _), answer in zip(batch, answers):
+            if future.done():
+                continue
+            if isinstance(answer, Exception):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
+
+    def stats(self):
+        return {
+            **self.counts,
+            "batching": self.send_batch is not None,
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "in_flight": len(self.in_flight),
+        }
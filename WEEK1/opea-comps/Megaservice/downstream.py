@@ -0,0 +1,98 @@
+"""
+A shared, pooled HTTP client for the megaservice's downstream hops (LLM,
+embedding).
+
+ServiceOrchestrator.schedule() opens a new aiohttp ClientSession for every
+request, so every hop pays for a fresh TCP connection and closes it again.
+The megaservice doesn't use an orchestrator: its hops are posted over this
+client, where one session lives as long as the service and keeps its
+connections alive between requests, with a cap on how many it opens in total and per
+backend host. aiohttp speaks HTTP/1.1 without pipelining, which is what
+Ollama and the OPEA LLM microservices serve; reusing warm connections is
+where the saving is.
+"""
+import os
+
+import aiohttp
+
+MAX_CONNECTIONS = int(os.getenv("DOWNSTREAM_MAX_CONNECTIONS", 256))
+# 0 means no limit per host beyond MAX_CONNECTIONS
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("DOWNSTREAM_MAX_CONNECTIONS_PER_HOST", 0))
+KEEPALIVE_TIMEOUT = float(os.getenv("DOWNSTREAM_KEEPALIVE_TIMEOUT", 60))
+CONNECT_TIMEOUT = float(os.getenv("DOWNSTREAM_CONNECT_TIMEOUT", 10))
+REQUEST_TIMEOUT = float(os.getenv("DOWNSTREAM_REQUEST_TIMEOUT", 600))
+
+
+class DownstreamError(Exception):
+    def __init__(self, url, status, body):
+        super().__init__(f"{url} answered {status}: {body[:200]}")
+        self.status = status
+
+
+class DownstreamPool:
+    def __init__(
+        self,
+        max_connections=MAX_CONNECTIONS,
+        max_connections_per_host=MAX_CONNECTIONS_PER_HOST,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        connect_timeout=CONNECT_TIMEOUT,
+        request_timeout=REQUEST_TIMEOUT,
+    ):
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(
+            total=request_timeout, sock_connect=connect_timeout)
+        self._session = None
+        self.requests = 0
+        self.errors = 0
+
+    def session(self):
+        """The shared session, created on first use in the server's event loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, trust_env=True)
+        return self._session
+
+    async def post_json(self, url, payload, headers=None):
+        """POSTs ``payload`` as JSON and returns the decoded JSON answer."""
+        session = self.session()
+        self.requests += 1
+        async with session.post(url, json=payload, headers=headers) as response:
+            if response.status >= 400:
+                self.errors += 1
+                raise DownstreamError(url, response.status, await response.text())
+            return await response.json(content_type=None)
+
+    async def stream_lines(self, url, payload, headers=None):
+        """POSTs ``payload`` as JSON and yields the answer's lines as they arrive."""
+        session = self.session()
+        self.requests += 1
+        async with session.post(url, json=payload, headers=headers) as response:
+            if response.status >= 400:
+                self.errors += 1
+                raise DownstreamError(url, response.status, await response.text())
+            async for line in response.content:
+                line = line.strip()
+                if line:
+                    yield line.decode("utf-8")
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "max_connections": self.max_connections,
+            "max_connections_per_host": self.max_connections_per_host,
+            "keepalive_timeout": self.keepalive_timeout,
+        }
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
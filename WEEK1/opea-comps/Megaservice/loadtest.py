@@ -0,0 +1,140 @@
+"""
+Sends chat completions from many concurrent clients and reports requests
+per second and latency percentiles.
+
+    python loadtest.py --url http://localhost:8000/v1/example-service \\
+        --concurrency 200 --requests 5000
+
+With ``--stream`` the answers are streamed and the time to the first token
+is reported too.
+
+Pointed straight at stub_llm.py, ``--fresh-connections`` opens a new
+session per request the way ServiceOrchestrator.schedule() does, against
+one pooled session without it: the difference is what the megaservice's
+DownstreamPool saves on every LLM hop.
+
+``--api-key`` and ``--priority`` set the key the megaservice rate limits
+by and where the requests wait in its queue; refused requests (429, 503)
+are counted under errors, and their client waits out the Retry-After
+before sending its next one.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run(url, concurrency, total, fresh_connections, body, headers=None, distinct=False):
+    latencies = []
+    first_tokens = []
+    errors = {}
+    remaining = iter(range(total))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    pooled = aiohttp.ClientSession(connector=connector)
+
+    async def send(session, number):
+        request = body
+        if distinct:
+            content = f"{body['messages'][0]['content']} ({number})"
+            request = {**body, "messages": [{"role": "user", "content": content}]}
+        start = time.perf_counter()
+        try:
+            async with session.post(url, json=request, headers=headers) as response:
+                if response.status != 200:
+                    await response.read()
+                    errors[response.status] = errors.get(response.status, 0) + 1
+                    return float(response.headers.get("Retry-After", 0))
+                if not body.get("stream"):
+                    await response.read()
+                else:
+                    first_token = None
+                    async for line in response.content:
+                        if first_token is None and b'"content"' in line:
+                            first_token = (time.perf_counter() - start) * 1000
+                    if first_token is not None:
+                        first_tokens.append(first_token)
+        except aiohttp.ClientError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            return
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    async def client():
+        for number in remaining:
+            if fresh_connections:
+                async with aiohttp.ClientSession() as session:
+                    retry_after = await send(session, number)
+            else:
+                retry_after = await send(pooled, number)
+            if retry_after:
+                await asyncio.sleep(retry_after)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await pooled.close()
+
+    latencies.sort()
+    first_tokens.sort()
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": total,
+        "fresh_connections": fresh_connections,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        **({
+            "first_token_p50_ms": round(percentile(first_tokens, 0.50), 2),
+            "first_token_p99_ms": round(percentile(first_tokens, 0.99), 2),
+        } if first_tokens else {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8000/v1/example-service")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--model", default="llama2")
+    parser.add_argument("--prompt", default="Translate 'good morning' into Swahili")
+    parser.add_argument("--stream", action="store_true", help="Stream the answers")
+    parser.add_argument("--distinct", action="store_true",
+                        help="Number each prompt so no two requests are the same")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ask the megaservice not to answer from its response cache")
+    parser.add_argument("--fresh-connections", action="store_true",
+                        help="Open a new connection for every request")
+    parser.add_argument("--api-key", help="Sent as the bearer token")
+    parser.add_argument("--priority", choices=["high", "normal", "low"],
+                        help="Sent as X-Priority")
+    args = parser.parse_args()
+
+    body = {
+        "model": args.model,
+        "messages": [{"role": "user", "content": args.prompt}],
+        "stream": args.stream,
+    }
+    headers = {}
+    if args.no_cache:
+        headers["X-Cache-Bypass"] = "1"
+    if args.api_key:
+        headers["Authorization"] = f"Bearer {args.api_key}"
+    if args.priority:
+        headers["X-Priority"] = args.priority
+    report = asyncio.run(run(
+        args.url, args.concurrency, args.requests, args.fresh_connections, body, headers or None,
+        args.distinct))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Prometheus metrics of the megaservice, served with comps' own metrics at
+/metrics on the service's port.
+"""
+from prometheus_client import Histogram
+
+REQUEST_LATENCY = Histogram(
+    "example_service_request_seconds",
+    "Time to answer a chat completion, to the last token when streamed",
+    ["stream"])
+FIRST_TOKEN_LATENCY = Histogram(
+    "example_service_first_token_seconds",
+    "Time from a streamed request to the first token sent to the client")
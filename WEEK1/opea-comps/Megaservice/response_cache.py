@@ -0,0 +1,251 @@
+"""
+A response cache in front of the megaservice's LLM call.
+
+Off unless CACHE_ENABLED is set: the LLM samples its answers, and a
+cached one gives every client asking the same thing the same answer.
+
+The exact tier keys an answer on the request body sent to the LLM, with
+whitespace in the messages collapsed: the model, the messages and
+whether it was streamed (a streamed answer has no token usage to give a
+non-streaming client). So the same prompt asked again is answered from
+memory. Fields of the client's request that aren't sent on, like its
+sampling parameters, can't change the answer and aren't part of the
+key. The optional semantic tier embeds the conversation through the
+embedding microservice and also answers prompts whose embedding is
+within CACHE_SIMILARITY_THRESHOLD (cosine) of a cached one sent with the
+same other fields.
+
+Entries expire after CACHE_TTL seconds, and the least recently used go
+first once there are more than CACHE_MAX_ENTRIES or their answers take
+more than CACHE_MAX_BYTES. Send ``X-Cache-Bypass: 1`` (or
+``Cache-Control: no-cache``) to skip the cache for a request.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "false").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_TTL = float(os.getenv("CACHE_TTL", 600))
+CACHE_SEMANTIC = os.getenv("CACHE_SEMANTIC", "false").lower() == "true"
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CACHE_SIMILARITY_THRESHOLD", 0.95))
+CACHE_BYPASS_HEADER = "X-Cache-Bypass"
+
+CACHE_REQUESTS = Counter(
+    "example_service_cache_requests_total",
+    "Chat completions by how the cache answered them",
+    ["result"])
+CACHE_EVICTIONS = Counter(
+    "example_service_cache_evictions_total",
+    "Cache entries dropped, by why",
+    ["reason"])
+CACHE_ENTRIES = Gauge("example_service_cache_entries", "Answers in the cache")
+CACHE_BYTES = Gauge("example_service_cache_bytes", "Size of the answers in the cache")
+
+
+def bypass_requested(headers):
+    return (headers.get(CACHE_BYPASS_HEADER, "").lower() in ("1", "true")
+            or "no-cache" in headers.get("Cache-Control", "").lower())
+
+
+def _normalize(content):
+    if isinstance(content, str):
+        return " ".join(content.split())
+    return content
+
+
+class CacheLookup:
+    """A request's place in the cache, from request_key()."""
+
+    def __init__(self, key, partition, text, prompt):
+        self.key = key
+        self.partition = partition
+        self.text = text
+        # What the semantic tier embeds
+        self.prompt = prompt
+        self.vector = None
+        self.answer = None
+        self.tier = None
+
+
+def request_key(llm_request):
+    """
+    The CacheLookup of ``llm_request``, the body sent to the LLM: the
+    same key for the same body, the same partition for the same fields
+    besides the messages.
+    """
+    conversation = [
+        {"role": message.get("role"), "content": _normalize(message.get("content"))}
+        for message in llm_request["messages"]
+    ]
+    partition = json.dumps(
+        {name: value for name, value in llm_request.items() if name != "messages"},
+        sort_keys=True, default=str)
+    text = json.dumps(conversation, sort_keys=True, ensure_ascii=False)
+    key = hashlib.sha256(f"{partition}\n{text}".encode()).hexdigest()
+    prompt = "\n".join(
+        f"{message['role']}: {message['content']}" for message in conversation)
+    return CacheLookup(key, partition, text, prompt)
+
+
+class VectorIndex:
+    """The unit vectors of one partition's entries, searched as one matrix."""
+
+    def __init__(self, dimensions):
+        self.keys = []
+        self.rows = {}
+        self.matrix = np.empty((16, dimensions), dtype=np.float32)
+
+    def add(self, key, vector):
+        if len(self.keys) == len(self.matrix):
+            self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+        self.rows[key] = len(self.keys)
+        self.matrix[len(self.keys)] = vector
+        self.keys.append(key)
+
+    def remove(self, key):
+        # The last row moves into the removed one's place
+        row = self.rows.pop(key)
+        last = self.keys.pop()
+        if last != key:
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last
+            self.rows[last] = row
+
+    def nearest(self, vector):
+        """(key, cosine similarity) of the closest vector, or (None, 0)."""
+        if not self.keys:
+            return None, 0
+        similarities = self.matrix[:len(self.keys)] @ vector
+        best = int(np.argmax(similarities))
+        return self.keys[best], float(similarities[best])
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries=CACHE_MAX_ENTRIES,
+        max_bytes=CACHE_MAX_BYTES,
+        ttl=CACHE_TTL,
+        embed=None,
+        similarity_threshold=CACHE_SIMILARITY_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # An async function from text to an embedding, for the semantic tier
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        # key -> (answer, size, expires, partition, unit vector or None)
+        self.entries = OrderedDict()
+        self.size = 0
+        # partition -> VectorIndex of its entries with an embedding
+        self.indexes = {}
+        self.counts = {"hit_exact": 0, "hit_semantic": 0, "miss": 0, "bypass": 0}
+        self._next_expiry = 0
+
+    async def get(self, lookup):
+        """``lookup`` with the cached answer and the tier that had it filled in, if any."""
+        self._expire()
+        entry = self.entries.get(lookup.key)
+        if entry is not None and entry[2] <= time.monotonic():
+            self._remove(lookup.key, "ttl")
+            entry = None
+        if entry is not None:
+            self.entries.move_to_end(lookup.key)
+            lookup.answer, lookup.tier = entry[0], "exact"
+        elif self.embed is not None:
+            await self._get_similar(lookup)
+        self.count("hit_" + lookup.tier if lookup.tier else "miss")
+        return lookup
+
+    async def _get_similar(self, lookup):
+        try:
+            vector = np.asarray(await self.embed(lookup.prompt), dtype=np.float32)
+        except Exception as e:
+            print(f"Semantic cache skipped, embedding failed: {e}")
+            return
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return
+        lookup.vector = vector / norm
+        now = time.monotonic()
+        while lookup.partition in self.indexes:
+            key, similarity = self.indexes[lookup.partition].nearest(lookup.vector)
+            if key is None or similarity < self.similarity_threshold:
+                return
+            if self.entries[key][2] > now:
+                self.entries.move_to_end(key)
+                lookup.answer, lookup.tier = self.entries[key][0], "semantic"
+                return
+            # Expired since the last sweep; the next nearest may still do
+            self._remove(key, "ttl")
+
+    def put(self, lookup, answer):
+        """Caches ``answer`` (a JSON-able dict) for the request of ``lookup``."""
+        size = len(json.dumps(answer, ensure_ascii=False).encode()) + len(lookup.text)
+        if size > self.max_bytes:
+            return
+        self._remove(lookup.key)
+        self.entries[lookup.key] = (
+            answer, size, time.monotonic() + self.ttl, lookup.partition, lookup.vector)
+        self.size += size
+        if lookup.vector is not None:
+            if lookup.partition not in self.indexes:
+                self.indexes[lookup.partition] = VectorIndex(len(lookup.vector))
+            self.indexes[lookup.partition].add(lookup.key, lookup.vector)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)), "lru")
+        self._update_gauges()
+
+    def count(self, result):
+        self.counts[result] += 1
+        CACHE_REQUESTS.labels(result=result).inc()
+
+    def _expire(self):
+        # Entries are in use order, not expiry order, so this scans them
+        # all; at most once a second
+        now = time.monotonic()
+        if now < self._next_expiry:
+            return
+        self._next_expiry = now + 1
+        for key in [key for key, entry in self.entries.items() if entry[2] <= now]:
+            self._remove(key, "ttl")
+        self._update_gauges()
+
+    def _remove(self, key, reason=None):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry[1]
+        if entry[4] is not None:
+            index = self.indexes[entry[3]]
+            index.remove(key)
+            if not index.keys:
+                del self.indexes[entry[3]]
+        if reason:
+            CACHE_EVICTIONS.labels(reason=reason).inc()
+
+    def _update_gauges(self):
+        CACHE_ENTRIES.set(len(self.entries))
+        CACHE_BYTES.set(self.size)
+
+    def stats(self):
+        lookups = sum(self.counts.values()) - self.counts["bypass"]
+        hits = self.counts["hit_exact"] + self.counts["hit_semantic"]
+        return {
+            **self.counts,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "semantic": self.embed is not None,
+        }
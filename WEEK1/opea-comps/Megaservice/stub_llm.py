@@ -0,0 +1,154 @@
+"""
+A stand-in for the LLM backend (Ollama's OpenAI compatible
+/v1/chat/completions) that answers after a fixed delay without a model,
+so the megaservice can be load tested on its own. With "stream": true the
+first token comes after the delay and the rest one per token interval,
+as server-sent chat.completion.chunk events. /v1/embeddings answers with
+bag-of-words vectors, so prompts with mostly the same words are similar,
+for trying the megaservice's semantic cache.
+
+With ``--slots`` it works on at most that many answers at once, like a
+GPU, and the rest wait their turn. /v1/chat/completions/batch answers
+{"requests": [...]} with {"responses": [...]} in one slot, taking
+``--batch-cost`` milliseconds longer per extra request.
+
+    python stub_llm.py --port 8008 --latency 50 --tokens 20 --token-interval 5 --slots 8
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import re
+import time
+import uuid
+
+from aiohttp import web
+
+
+def completion(model, content, prompt_tokens, completion_tokens):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def chunk(chunk_id, model, content, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def embedding(text, dimensions=256):
+    vector = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % dimensions] += 1
+    return vector
+
+
+def make_app(latency, tokens, token_interval=5, slots=0, batch_cost=2):
+    # At most ``slots`` answers are worked on at once
+    slot = asyncio.Semaphore(slots) if slots else contextlib.nullcontext()
+    words = [f" token{i}" for i in range(tokens)]
+
+    def answer(body):
+        prompt = " ".join(
+            str(message.get("content", "")) for message in body.get("messages", []))
+        return completion(
+            body.get("model", "stub"), "".join(words).lstrip(), len(prompt.split()), tokens)
+
+    async def stream(request, model):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        async with slot:
+            await asyncio.sleep(latency / 1000)
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(token_interval / 1000)
+                event = chunk(chunk_id, model, word if i else word.lstrip())
+                await response.write(f"data: {json.dumps(event)}\n\n".encode())
+        event = chunk(chunk_id, model, None, "stop")
+        await response.write(f"data: {json.dumps(event)}\n\ndata: [DONE]\n\n".encode())
+        await response.write_eof()
+        return response
+
+    async def chat_completions(request):
+        body = await request.json()
+        request.app["requests"] += 1
+        if body.get("stream"):
+            return await stream(request, body.get("model", "stub"))
+        async with slot:
+            await asyncio.sleep(latency / 1000)
+        return web.json_response(answer(body))
+
+    async def chat_completions_batch(request):
+        bodies = (await request.json())["requests"]
+        request.app["requests"] += 1
+        request.app["batched_requests"] += len(bodies)
+        async with slot:
+            await asyncio.sleep((latency + batch_cost * (len(bodies) - 1)) / 1000)
+        return web.json_response({"responses": [answer(body) for body in bodies]})
+
+    async def embeddings(request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return web.json_response({
+            "object": "list",
+            "model": body.get("model", "stub"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": embedding(text)}
+                for i, text in enumerate(inputs)
+            ],
+        })
+
+    async def stats(request):
+        return web.json_response({
+            "requests": request.app["requests"],
+            "batched_requests": request.app["batched_requests"],
+        })
+
+    app = web.Application()
+    app["requests"] = 0
+    app["batched_requests"] = 0
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/v1/chat/completions/batch", chat_completions_batch)
+    app.router.add_post("/v1/embeddings", embeddings)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--latency", type=float, default=50, help="Milliseconds per answer")
+    parser.add_argument("--tokens", type=int, default=20, help="Tokens per answer")
+    parser.add_argument("--token-interval", type=float, default=5,
+                        help="Milliseconds between streamed tokens")
+    parser.add_argument("--slots", type=int, default=0,
+                        help="Answers worked on at once (default: no limit)")
+    parser.add_argument("--batch-cost", type=float, default=2,
+                        help="Extra milliseconds per request in a batch")
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.tokens, args.token_interval,
+                         args.slots, args.batch_cost),
+                host=args.host, port=args.port,
+                backlog=4096, access_log=None)